@@ -7,21 +7,41 @@ import time
 import tempfile
 import threading
 import json
+import mimetypes
 import shutil
 import subprocess
-import zipfile
 import atexit
+import base64
+import hashlib
+import contextlib
+import select
+import socket
+import zlib
+import gzip
 from pathlib import Path
+from typing import Iterator
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
-from flask import Flask, render_template, request, jsonify, send_file, Response
+from flask import Flask, render_template, request, jsonify, send_file, Response, g
+from werkzeug.datastructures import FileStorage, ImmutableMultiDict, MultiDict
+from werkzeug.http import parse_options_header
 import yt_dlp
 from PIL import Image
 
 from sdexe import __version__
 from sdexe import tools
 
+try:
+    import brotli as _brotli
+except ImportError:
+    _brotli = None
+
+try:
+    import fcntl
+except ImportError:  # Windows, where there is no prefork mode either
+    fcntl = None
+
 
 def _ensure_ca_bundle():
     """Point OpenSSL at certifi's CA bundle when the interpreter has none.
@@ -76,21 +96,319 @@ def csrf_check():
             return jsonify({"error": "Forbidden"}), 403
 
 
+# ── Response compression ──
+# Registered before every other after_request hook, so Flask runs it last and
+# the hooks that save or re-store a response body still see it uncompressed.
+
+COMPRESS_MIN_BYTES = 1024
+# A streamed body is flushed to the client at least this often, so the
+# compressor holds back at most this much output.
+COMPRESS_FLUSH_BYTES = 64 * 1024
+_COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "application/xml",
+                       "application/yaml", "application/x-yaml", "application/x-ndjson",
+                       "application/x-subrip", "image/svg+xml"}
+
+
+def _compressible(mimetype: str) -> bool:
+    if mimetype == "text/event-stream":
+        # Each event has to reach the client the moment it is sent.
+        return False
+    return (mimetype.startswith("text/") or mimetype in _COMPRESSIBLE_TYPES
+            or mimetype.endswith(("+json", "+xml")))
+
+
+def _body_encoder(encoding: str):
+    """(compress, flush, finish) functions for one response body."""
+    if encoding == "br":
+        c = _brotli.Compressor(quality=5)
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def _compressed_chunks(source, chunks, encoder):
+    compress, flush, finish = encoder
+    pending = 0
+    try:
+        for chunk in chunks:
+            out = compress(chunk)
+            pending += len(chunk)
+            if pending >= COMPRESS_FLUSH_BYTES:
+                out += flush()
+                pending = 0
+            if out:
+                yield out
+        yield finish()
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+
+@app.after_request
+def compress_response(response):
+    """gzip, or brotli when installed, text-like bodies for clients that accept it.
+
+    Buffered bodies under COMPRESS_MIN_BYTES are left alone. Streamed and
+    file bodies are compressed chunk by chunk as they are sent.
+    """
+    if (request.method == "HEAD" or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers
+            or not _compressible(response.mimetype or "")):
+        return response
+    response.vary.add("Accept-Encoding")
+    accept = request.accept_encodings
+    if _brotli is not None and accept["br"] and accept["br"] >= accept["gzip"]:
+        encoding = "br"
+    elif accept["gzip"]:
+        encoding = "gzip"
+    else:
+        return response
+    length = response.content_length
+    if length is not None and length < COMPRESS_MIN_BYTES:
+        return response
+    encoder = _body_encoder(encoding)
+    if response.is_sequence:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(encoder[0](data) + encoder[2]())
+    else:
+        source = response.response
+        response.response = _compressed_chunks(source, response.iter_encoded(), encoder)
+        response.direct_passthrough = False
+        response.headers.pop("Content-Length", None)
+    response.headers["Content-Encoding"] = encoding
+    # Byte ranges and strong validators describe the uncompressed file.
+    response.headers.pop("Accept-Ranges", None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _peer_closed(sock) -> bool:
+    """True once the client has hung up on a request still being processed."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # Readable with nothing to peek at means EOF; pipelined request bytes
+        # would peek as data and are left in place.
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return True
+
+
+@app.before_request
+def start_av_job():
+    """Run each AV request as a tools job so its ffmpeg children can be killed.
+
+    The client may name the job with an X-Job-Id header and later POST
+    /api/av/cancel/<id>. The connection is also watched (the socket under the
+    development server, waitress's disconnect check under waitress), and the
+    job is cancelled if the client disconnects mid-request.
+    Batches run in the background priority class unless asked otherwise.
+    """
+    if request.method != "POST" or not request.path.startswith("/api/av/"):
+        return
+    try:
+        g.av_priority = _requested_priority(
+            "background" if request.path == "/api/av/batch" else "interactive")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job_id = re.sub(r"[^A-Za-z0-9_-]", "", request.headers.get("X-Job-Id", ""))[:64]
+    job_id = job_id or uuid.uuid4().hex
+    scope = contextlib.ExitStack()
+    scope.enter_context(tools.job_scope(job_id, kind="av:" + request.path.split("/")[3]))
+    scope.enter_context(tools.job_priority(g.av_priority))
+    tools.record_job_io(job_id, bytes_in=request.content_length or 0)
+    g.av_job = (job_id, scope, threading.Event())
+    sock = request.environ.get("werkzeug.socket")
+    disconnected = request.environ.get("waitress.client_disconnected")
+    if disconnected is None and sock is not None:
+        disconnected = lambda: _peer_closed(sock)
+    if disconnected is not None:
+        stop = g.av_job[2]
+
+        def watch():
+            while not stop.wait(0.5):
+                if disconnected():
+                    logger.info("client went away, cancelling AV job %s", job_id)
+                    tools.cancel_job(job_id, "Client disconnected")
+                    return
+
+        threading.Thread(target=watch, daemon=True).start()
+
+
+# Status for a request whose job was cancelled (nginx's "client closed request").
+CANCELLED_STATUS = 499
+
+
+@app.after_request
+def report_av_job(response):
+    """Tell the client its job id and what the request cost so far.
+
+    Routes report any exception as a 500; when the job was cancelled, by the
+    user or a disconnect, that becomes a distinct cancelled reply instead.
+    """
+    job = g.get("av_job")
+    if job:
+        reason = tools.job_cancelled(job[0])
+        if reason and response.status_code >= 500:
+            logger.info("AV job %s cancelled: %s", job[0], reason)
+            response.close()
+            response = jsonify({"error": reason, "cancelled": True})
+            response.status_code = CANCELLED_STATUS
+        tools.record_job_io(job[0], bytes_out=response.content_length or 0)
+        response.headers["X-Job-Id"] = job[0]
+        response.headers["X-Job-Usage"] = json.dumps(tools.job_usage(job[0]))
+        if response.is_streamed and not response.direct_passthrough:
+            # A generator body, such as ffmpeg output still being written:
+            # keep the job, and the disconnect watcher, until it has been sent.
+            g.pop("av_job")
+            response.call_on_close(lambda: _close_av_job(job))
+    return response
+
+
+def _close_av_job(job):
+    job[2].set()
+    job[1].close()
+
+
+@app.teardown_request
+def end_av_job(exc):
+    job = g.pop("av_job", None)
+    if job:
+        _close_av_job(job)
+
+
+def _requested_priority(default: str) -> str:
+    """Priority class from an X-Job-Priority header or a priority field."""
+    value = request.headers.get("X-Job-Priority")
+    if not value:
+        body = request.get_json(silent=True) if request.is_json else request.form
+        value = (body or {}).get("priority")
+    return tools.check_priority(value or default)
+
+
 @app.context_processor
 def inject_version():
     return {"version": __version__}
 
 @app.after_request
 def add_cache_headers(response):
-    if request.path.startswith("/static/"):
+    if request.path.startswith("/static/") and not response.cache_control.immutable:
         response.headers["Cache-Control"] = "public, max-age=3600"
     return response
 
+
+# ── Static assets ──
+# Each static file is also served under a name carrying a hash of its
+# contents (app.js -> app.3f2a9c41d07e.js). url_for("static", ...) emits those
+# names, so they can be cached for good: a new release means new names.
+
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+_static_assets_lock = threading.Lock()
+_static_assets_cache: tuple[dict, dict] | None = None
+
+
+def _static_assets() -> tuple[dict, dict]:
+    """({filename: fingerprinted}, {fingerprinted: (filename, digest)}), built once.
+
+    Text files also get .gz and .br (when brotli is installed) variants,
+    compressed at the highest levels once and kept in a cache shared by
+    every run and worker. Variants of files no longer shipped are removed.
+    """
+    global _static_assets_cache
+    with _static_assets_lock:
+        if _static_assets_cache is not None:
+            return _static_assets_cache
+        names, fingerprinted, compressed = {}, {}, set()
+        root = Path(app.static_folder)
+        cache_dir = CONFIG_DIR / "static-cache"
+        for path in sorted(p for p in root.rglob("*") if p.is_file()):
+            rel = path.relative_to(root).as_posix()
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, dot, ext = rel.rpartition(".")
+            hashed = f"{stem}.{digest}.{ext}" if dot else f"{rel}.{digest}"
+            names[rel] = hashed
+            fingerprinted[hashed] = (rel, digest)
+            if _compressible(mimetypes.guess_type(rel)[0] or ""):
+                _precompress_static(cache_dir, digest, data)
+                compressed.add(digest)
+        _prune_static_cache(cache_dir, compressed)
+        _static_assets_cache = (names, fingerprinted)
+        return _static_assets_cache
+
+
+def _prune_static_cache(cache_dir: Path, keep: set):
+    """Delete cached variants (and stray temp files) whose digest is not in keep."""
+    try:
+        entries = list(cache_dir.iterdir())
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.lstrip(".").split(".", 1)[0] not in keep:
+            try:
+                entry.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+def _precompress_static(cache_dir: Path, digest: str, data: bytes):
+    variants = {"gz": lambda: gzip.compress(data, 9, mtime=0)}
+    if _brotli is not None:
+        variants["br"] = lambda: _brotli.compress(data, quality=11)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for suffix, compress in variants.items():
+            dest = cache_dir / f"{digest}.{suffix}"
+            if not dest.exists():
+                tmp = dest.with_name(f".{dest.name}.{os.getpid()}")
+                tmp.write_bytes(compress())
+                os.replace(tmp, dest)
+    except OSError as e:
+        # compress_response still compresses these on the fly.
+        logger.warning("could not precompress static assets: %s", e)
+
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = _static_assets()[0].get(values["filename"], values["filename"])
+
+
+def static_file(filename):
+    """Serve a static file; fingerprinted names are immutable and precompressed."""
+    entry = _static_assets()[1].get(filename)
+    if entry is None:
+        return app.send_static_file(filename)
+    rel, digest = entry
+    path, encoding = Path(app.static_folder) / rel, None
+    accept = request.accept_encodings
+    for candidate, suffix in (("br", "br"), ("gzip", "gz")):
+        variant = CONFIG_DIR / "static-cache" / f"{digest}.{suffix}"
+        if accept[candidate] and variant.is_file():
+            path, encoding = variant, candidate
+            break
+    response = send_file(path, mimetype=mimetypes.guess_type(rel)[0],
+                         etag=f"{digest}-{encoding or 'identity'}", max_age=STATIC_IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+app.view_functions["static"] = static_file
+
 DOWNLOAD_DIR = Path(tempfile.mkdtemp(prefix="toolkit_"))
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 
 def _cleanup_on_exit():
     import shutil
+    # Children first, so no ffmpeg is still writing into DOWNLOAD_DIR.
+    tools.kill_all_children()
     shutil.rmtree(DOWNLOAD_DIR, ignore_errors=True)
 
 atexit.register(_cleanup_on_exit)
@@ -233,14 +551,171 @@ def save_history(items):
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     HISTORY_FILE.write_text(json.dumps(items, indent=2))
 
+class _JobRecord(dict):
+    """One job's status dict, saved to the shared store whenever it changes.
+
+    Progress ticks are saved at most four times a second; every other
+    change is saved at once so no worker misses a status transition.
+    """
+
+    def __init__(self, store, key, data):
+        super().__init__(data)
+        self._store = store
+        self._key = key
+        self._saved = 0.0
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        if name not in ("progress", "detail") or time.monotonic() - self._saved > 0.25:
+            self.save()
+
+    def save(self):
+        self._saved = time.monotonic()
+        self._store._write(self._key, self)
+
+
+class JobStore(dict):
+    """Job status by id, for the worker that runs the job and for its peers.
+
+    A plain dict until share() is called. Then each record is mirrored to a
+    JSON file under the shared directory, and lookups of jobs running in
+    another worker process return a snapshot read from that file.
+    """
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.dir: Path | None = None
+
+    def share(self, root: Path):
+        self.dir = root / self.name
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key) -> Path | None:
+        if self.dir is None or not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", str(key)):
+            return None
+        return self.dir / f"{key}.json"
+
+    def _write(self, key, data):
+        path = self._path(key)
+        if path is None:
+            return
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+
+    def _read(self, key) -> dict | None:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def __setitem__(self, key, value):
+        if self.dir is not None:
+            value = _JobRecord(self, key, value)
+            value.save()
+        super().__setitem__(key, value)
+
+    def __getitem__(self, key):
+        if super().__contains__(key) or self.dir is None:
+            return super().__getitem__(key)
+        data = self._read(key)
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key):
+        return super().__contains__(key) or self._read(key) is not None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def save(self, key):
+        """Write out a record after a change nested inside it, which it cannot see."""
+        if self.dir is not None and super().__contains__(key):
+            super().__getitem__(key).save()
+
+    def owns(self, key) -> bool:
+        """Whether this process runs the job."""
+        return super().__contains__(key)
+
+    def pop(self, key, *default):
+        path = self._path(key)
+        if path is not None:
+            path.unlink(missing_ok=True)
+        return super().pop(key, *default)
+
+    def prune_files(self, max_age_seconds: float):
+        """Drop records left behind by workers that are gone."""
+        if self.dir is None:
+            return
+        now = time.time()
+        for f in self.dir.iterdir():
+            with contextlib.suppress(OSError):
+                if now - f.stat().st_mtime > max_age_seconds:
+                    f.unlink()
+
+
 # Stores progress and file info keyed by download ID
-downloads = {}
+downloads = JobStore("downloads")
 _downloads_lock = threading.Lock()
 
 # Stores transcription progress and results keyed by transcription ID
-transcriptions = {}
+transcriptions = JobStore("transcriptions")
 _transcriptions_lock = threading.Lock()
 
+# Set when several worker processes serve the app (see share_job_state).
+_shared_state_dir: Path | None = None
+
+
+def share_job_state(root: Path):
+    """Make job state visible to the worker processes forked after this call."""
+    global _shared_state_dir
+    _shared_state_dir = root
+    for store in (downloads, transcriptions, previews, av_batches):
+        store.share(root)
+    (root / "cancel").mkdir(exist_ok=True)
+
+
+def _cancel_local(job_id: str) -> bool:
+    """Cancel job_id if this process runs it; report whether it did."""
+    found = tools.cancel_job(job_id, "Cancelled by user")
+    if downloads.owns(job_id):
+        downloads[job_id]["cancelled"] = True
+        # The progress hook only runs between chunks; post-processing ffmpeg
+        # (ours, or the one yt-dlp starts on <dl_id>.* files) has to be killed.
+        tools.kill_child_processes(str(DOWNLOAD_DIR / job_id))
+        found = True
+    if av_batches.owns(job_id) and av_batches[job_id]["status"] == "running":
+        av_batches[job_id]["cancelled"] = True
+        found = True
+    return found
+
+
+def _broadcast_cancel(job_id: str) -> bool:
+    """Ask the other worker processes to cancel job_id, if there are any."""
+    if _shared_state_dir is None or not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", job_id):
+        return False
+    (_shared_state_dir / "cancel" / job_id).touch()
+    return True
+
+
+def _watch_cancel_requests():
+    """Worker loop: act on cancel requests that reached another worker."""
+    cancel_dir = _shared_state_dir / "cancel"
+    while True:
+        time.sleep(0.5)
+        for marker in cancel_dir.iterdir():
+            with contextlib.suppress(OSError):
+                if _cancel_local(marker.name) or time.time() - marker.stat().st_mtime > 60:
+                    marker.unlink()
+
 
 def _safe_filename(name: str, default: str = "download", max_len: int = 200) -> str:
     """Sanitize an arbitrary string (e.g. a video title) for use as a download
@@ -272,11 +747,54 @@ def cleanup_old_files(max_age_seconds=3600):
         ]
         for k in stale:
             downloads.pop(k, None)
+    with _av_batches_lock:
+        for k, v in list(av_batches.items()):
+            if v["status"] != "running" and now - v["created"] > max_age_seconds:
+                av_batches.pop(k, None)
+                shutil.rmtree(DOWNLOAD_DIR / f"batch_{k}", ignore_errors=True)
+    with _previews_lock:
+        for k, v in list(previews.items()):
+            if v["status"] != "encoding" and now - v["created"] > max_age_seconds:
+                previews.pop(k, None)
+                shutil.rmtree(DOWNLOAD_DIR / f"preview_{k}", ignore_errors=True)
+    for d in DOWNLOAD_DIR.glob("thumbs_*"):
+        if now - d.stat().st_mtime > max_age_seconds:
+            shutil.rmtree(d, ignore_errors=True)
     # Finished transcriptions hold the full segment payload, so drop them once
     # the client has had time to fetch the result.
     for k, v in list(transcriptions.items()):
         if v.get("status") in ("done", "error") and now - v.get("created", now) > max_age_seconds:
             transcriptions.pop(k, None)
+    _prune_assets()
+    _prune_uploads()
+    # Shared records of jobs whose worker process died are never popped.
+    for store in (downloads, transcriptions, previews, av_batches):
+        store.prune_files(max_age_seconds * 24)
+
+
+CLEANUP_INTERVAL = 300
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+@app.before_request
+def schedule_cleanup():
+    """Run cleanup_old_files() every CLEANUP_INTERVAL seconds, whichever tools
+    are in use, on a thread so no request waits for it."""
+    global _last_cleanup
+    if time.time() - _last_cleanup < CLEANUP_INTERVAL or not _cleanup_lock.acquire(blocking=False):
+        return
+    _last_cleanup = time.time()
+
+    def run():
+        try:
+            cleanup_old_files()
+        except Exception:
+            logger.warning("cleanup of old files failed", exc_info=True)
+        finally:
+            _cleanup_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
 
 
 def _validate_folder(path: str):
@@ -312,7 +830,7 @@ def set_file_metadata(filepath, metadata):
     tmp = filepath.parent / f"_meta_{filepath.name}"
     cmd = [exe, "-y", "-i", str(filepath), "-codec", "copy", "-map", "0"] + args + [str(tmp)]
     try:
-        result = subprocess.run(cmd, capture_output=True, timeout=120)
+        result = tools._run_tracked(cmd, timeout=120)
         if result.returncode == 0:
             tmp.replace(filepath)
         else:
@@ -403,6 +921,11 @@ def set_config_route():
         if err:
             return jsonify({"error": err}), 400
         updates["output_folder"] = resolved
+    if updates.get("local_input_root"):
+        resolved, err = _validate_folder(updates["local_input_root"])
+        if err:
+            return jsonify({"error": err}), 400
+        updates["local_input_root"] = resolved
     cfg = load_config()
     cfg.update(updates)
     save_config(cfg)
@@ -478,6 +1001,128 @@ def open_file():
     return jsonify({"ok": True})
 
 
+def _requested_save_to() -> str:
+    """The save_to parameter, from the query string, a form or a JSON body."""
+    value = request.args.get("save_to") or request.form.get("save_to")
+    if not value and request.is_json:
+        value = (request.get_json(silent=True) or {}).get("save_to")
+    return value or ""
+
+
+@app.before_request
+def check_save_to():
+    """save_to=output_folder: check the folder before the tool does any work."""
+    if request.method != "POST" or not request.path.startswith("/api/"):
+        return
+    save_to = _requested_save_to()
+    if not save_to:
+        return
+    if save_to != "output_folder":
+        return jsonify({"error": "save_to must be output_folder"}), 400
+    folder, err = _validate_folder(load_config().get("output_folder", "").strip())
+    if err or not folder:
+        return jsonify({"error": err or "No output folder configured"}), 400
+    g.save_to = Path(folder)
+
+
+@app.after_request
+def save_result_to_output_folder(response):
+    """Write a tool's file result into the output folder and answer with its path.
+
+    Streamed results are copied chunk by chunk, so nothing is held in memory
+    beyond what the tool itself produced.
+    """
+    folder = g.pop("save_to", None)
+    if (folder is None or response.status_code != 200
+            or "attachment" not in response.headers.get("Content-Disposition", "")):
+        return response
+    _, params = parse_options_header(response.headers["Content-Disposition"])
+    name = _safe_filename(params.get("filename", ""), "result")
+    stem, dot, suffix = name.rpartition(".")
+    dest, n = folder / name, 2
+    while dest.exists():
+        dest = folder / (f"{stem} ({n}).{suffix}" if dot else f"{name} ({n})")
+        n += 1
+    tmp = folder / f".{dest.name}.part"
+    size = 0
+    try:
+        with open(tmp, "wb") as out:
+            for chunk in response.response:
+                out.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, dest)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        return jsonify({"error": f"Could not save to the output folder: {e}"[:500]}), 500
+    finally:
+        response.close()
+    saved = jsonify({"saved": True, "path": str(dest), "name": dest.name, "size": size})
+    for key, value in response.headers.items():
+        if key.startswith("X-"):
+            saved.headers[key] = value
+    return saved
+
+
+class LocalInput(FileStorage):
+    """A tool input already on this machine (a local file or a stored asset).
+
+    Media tools get its path and read it in place; the open stream serves
+    tools that take bytes.
+    """
+
+    def __init__(self, path: Path, name: str, filename: str | None = None,
+                 content_type: str | None = None):
+        filename = filename or path.name
+        super().__init__(open(path, "rb"), filename=filename, name=name,
+                         content_type=content_type or mimetypes.guess_type(filename)[0]
+                         or "application/octet-stream")
+        self.path = path
+
+
+def _input_data(f):
+    """Media for a tools function: a local input's path, read in place, or the upload's bytes."""
+    return f.path if isinstance(f, LocalInput) else f.stream.read()
+
+
+def _resolve_local_input(raw: str):
+    """Return (path, error_str) for a local input; it must be a file under local_input_root."""
+    root, err = _validate_folder(load_config().get("local_input_root", "").strip())
+    if err:
+        return None, err
+    if not root:
+        return None, "Local file inputs are off; set an input folder in settings"
+    p = Path(raw).expanduser().resolve()
+    if not p.is_relative_to(root):
+        return None, f"Path is outside the input folder: {p}"
+    if not p.is_file():
+        return None, f"File does not exist: {p}"
+    return p, ""
+
+
+@app.before_request
+def resolve_local_inputs():
+    """Stand files already on this machine in for the uploads a tool expects.
+
+    path fills "file", paths fills "files" and <field>_path fills <field>, so
+    a local file reaches ffmpeg, pypdf or PIL without passing through the browser.
+    """
+    if request.method != "POST" or not request.path.startswith("/api/") or not request.form:
+        return
+    refs = [(key, value) for key, values in request.form.lists()
+            if key in ("path", "paths") or key.endswith("_path") for value in values]
+    if not refs:
+        return
+    files = MultiDict(request.files)
+    for key, raw in refs:
+        field = {"path": "file", "paths": "files"}.get(key) or key[:-len("_path")]
+        path, err = _resolve_local_input(raw)
+        if err:
+            return jsonify({"error": err}), 400
+        files.add(field, LocalInput(path, field))
+    # The request closes these file handles when it ends.
+    request.files = ImmutableMultiDict(files)
+
+
 @app.route("/api/browse-folder", methods=["POST"])
 def browse_folder():
     import sys as _sys
@@ -623,6 +1268,55 @@ def deps():
     })
 
 
+def _form_parallel():
+    """The `parallel` form field: "on" / "off" force a mode, anything else is auto."""
+    value = request.form.get("parallel", "auto").strip().lower()
+    return {"on": True, "true": True, "off": False, "false": False}.get(value)
+
+
+def _form_time_budget():
+    """Encode time budget in seconds: form field, then config, then default."""
+    raw = request.form.get("time_budget") or load_config().get("encode_time_budget")
+    if raw in (None, ""):
+        return float(tools.ENCODE_TIME_BUDGET), ""
+    try:
+        budget = float(raw)
+    except (TypeError, ValueError):
+        return None, "Invalid time budget"
+    if budget <= 0:
+        return None, "Time budget must be positive"
+    return budget, ""
+
+
+def _plan_kwargs(plan):
+    if not plan:
+        return {}
+    kwargs = {"timeout": plan["timeout"]}
+    if plan["preset"]:
+        kwargs["preset"] = plan["preset"]
+    return kwargs
+
+
+def _with_plan_headers(resp, plan):
+    """Report the encoder preset chosen for the time budget."""
+    if plan and plan["preset"]:
+        resp.headers["X-Encoder-Preset"] = plan["preset"]
+    if plan and plan["estimated_seconds"] is not None:
+        resp.headers["X-Estimated-Seconds"] = str(plan["estimated_seconds"])
+    return resp
+
+
+def _form_loudness_target():
+    """Read the integrated-loudness target (LUFS). Returns (value, error_str)."""
+    try:
+        target = float(request.form.get("target", "-16"))
+    except ValueError:
+        return None, "Invalid loudness target"
+    if not -70 <= target <= -5:
+        return None, "Loudness target must be between -70 and -5 LUFS"
+    return target, ""
+
+
 def _ffmpeg_missing_response():
     """Structured 503 telling the UI ffmpeg is unavailable (so it can offer to install)."""
     return jsonify({
@@ -748,12 +1442,14 @@ def download():
         return jsonify({"error": "No URL provided"}), 400
     if not url.startswith(("http://", "https://")):
         return jsonify({"error": "Only http and https URLs are supported"}), 400
+    try:
+        priority = _requested_priority("background")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if not _check_download_rate():
         return jsonify({"error": "Too many downloads. Slow down a bit."}), 429
 
-    cleanup_old_files()
-
     dl_id = str(uuid.uuid4())
     with _downloads_lock:
         downloads[dl_id] = {
@@ -899,7 +1595,20 @@ def download():
         ydl_opts["download_ranges"] = download_range_func(None, [(clip_start or 0, clip_end or float('inf'))])
         ydl_opts["force_keyframes_at_cuts"] = True
 
+    queued_at = time.time()
+
     def do_download():
+        if priority == "background":
+            tools.lower_thread_priority()
+        with tools.job_scope(dl_id, kind="download"), tools.job_priority(priority):
+            tools.record_job_io(dl_id, queue_wait=time.time() - queued_at)
+            _do_download()
+            if downloads[dl_id].get("filename"):
+                out = DOWNLOAD_DIR / downloads[dl_id]["filename"]
+                if out.exists():
+                    tools.record_job_io(dl_id, bytes_out=out.stat().st_size)
+
+    def _do_download():
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 vid_info = ydl.extract_info(url, download=True)
@@ -960,6 +1669,9 @@ def download():
                 filepath = DOWNLOAD_DIR / downloads[dl_id]["filename"]
                 set_file_metadata(filepath, meta)
 
+            if downloads[dl_id].get("cancelled"):
+                raise tools.JobCancelled("Cancelled by user")
+
             # Auto-save to output folder if configured
             cfg = load_config()
             output_dir = cfg.get("output_folder", "").strip()
@@ -975,10 +1687,12 @@ def download():
             downloads[dl_id]["status"] = "done"
             downloads[dl_id]["progress"] = 100
         except Exception as e:
-            downloads[dl_id]["status"] = "error"
-            downloads[dl_id]["error"] = _friendly_download_error(
-                str(e), cancelled=bool(downloads[dl_id].get("cancelled"))
-            )
+            cancelled = bool(downloads[dl_id].get("cancelled"))
+            downloads[dl_id]["error"] = _friendly_download_error(str(e), cancelled=cancelled)
+            downloads[dl_id]["status"] = "cancelled" if cancelled else "error"
+            if cancelled:
+                for f in DOWNLOAD_DIR.glob(f"{dl_id}*"):
+                    f.unlink(missing_ok=True)
 
     thread = threading.Thread(target=do_download, daemon=True)
     thread.start()
@@ -996,7 +1710,7 @@ def progress(dl_id):
                 yield f"data: {json.dumps({'error': 'Unknown download'})}\n\n"
                 break
 
-            yield f"data: {json.dumps(info)}\n\n"
+            yield f"data: {json.dumps(dict(info, usage=tools.job_usage(dl_id)))}\n\n"
 
             if info.get("status") in ("done", "error", "cancelled"):
                 break
@@ -1016,10 +1730,54 @@ def cancel_download(dl_id):
     info = downloads.get(dl_id)
     if not info:
         return jsonify({"error": "Unknown download"}), 404
-    downloads[dl_id]["cancelled"] = True
+    if not _cancel_local(dl_id):
+        _broadcast_cancel(dl_id)
     return jsonify({"ok": True})
 
 
+@app.route("/api/stats")
+def stats():
+    """Resource use totals per job kind (download, transcribe, av:<op>, batch:<op>)."""
+    return jsonify(tools.usage_stats())
+
+
+@app.route("/api/av/cancel/<job_id>", methods=["POST"])
+def cancel_av_job(job_id):
+    """Kill the ffmpeg work of an in-flight AV request or batch."""
+    running = _cancel_local(job_id) or _broadcast_cancel(job_id)
+    return jsonify({"ok": True, "running": running})
+
+
+def _file_etag(path: Path) -> str:
+    """Strong validator from the file itself: inode, size and mtime."""
+    st = path.stat()
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _send_disk_file(path: Path, download_name: str | None = None, mimetype: str | None = None,
+                    etag: str | None = None, as_attachment: bool = True):
+    """send_file for a finished result on disk.
+
+    Answers Range with 206 (and If-Range), and If-None-Match with 304, so big
+    transfers resume and seek. The body goes through the server's
+    wsgi.file_wrapper, or is handed to a front-end server with --x-sendfile.
+    """
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, conditional=True,
+                         etag=etag or _file_etag(path))
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _zip_response(entries, download_name: str, on_close=None) -> Response:
+    """Chunked ZIP of (arcname, path or bytes) entries, sent as it is built."""
+    response = Response(tools.iter_zip(entries), mimetype="application/zip")
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    if on_close:
+        response.call_on_close(on_close)
+    return response
+
+
 @app.route("/api/file/<dl_id>")
 def file(dl_id):
     info = downloads.get(dl_id)
@@ -1031,7 +1789,7 @@ def file(dl_id):
         return jsonify({"error": "File not found"}), 404
 
     download_name = info.get("download_name") or info["filename"]
-    return send_file(filepath, as_attachment=True, download_name=download_name)
+    return _send_disk_file(filepath, download_name=download_name)
 
 
 @app.route("/api/batch-zip", methods=["POST"])
@@ -1040,21 +1798,419 @@ def batch_zip():
     if not ids:
         return jsonify({"error": "No IDs provided"}), 400
 
-    zip_buf = io.BytesIO()
-    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for dl_id in ids:
-            info = downloads.get(dl_id)
-            if not info or not info.get("filename"):
-                continue
-            filepath = DOWNLOAD_DIR / info["filename"]
-            if not filepath.exists():
-                continue
-            arcname = info.get("download_name") or info["filename"]
-            zf.write(filepath, arcname)
+    entries = []
+    for dl_id in ids:
+        info = downloads.get(dl_id)
+        if not info or not info.get("filename"):
+            continue
+        filepath = DOWNLOAD_DIR / info["filename"]
+        if not filepath.exists():
+            continue
+        entries.append((info.get("download_name") or info["filename"], str(filepath)))
+    return _zip_response(entries, "downloads.zip")
+
+
+# ── Asset API ──
+
+# Uploads and tool results kept on disk under their content hash, so a file
+# is uploaded once and then fed to one tool after another. Any tool takes
+# asset_id in place of its "file" upload, asset_ids for "files", and
+# <field>_asset_id for other upload fields (audio_asset_id, video_asset_id).
+# The result of a tool run on assets becomes an asset too (X-Asset-Id).
+ASSET_DIR = DOWNLOAD_DIR / "assets"
+ASSET_TTL_SECONDS = 3600
+ASSET_QUOTA_BYTES = 16 * 1024 ** 3
+_assets_lock = threading.Lock()
+
+
+def _asset_limits():
+    """(ttl_seconds, quota_bytes): asset_ttl_minutes / asset_quota_mb config, then defaults."""
+    cfg = load_config()
+    try:
+        ttl = float(cfg.get("asset_ttl_minutes") or 0) * 60 or ASSET_TTL_SECONDS
+        quota = float(cfg.get("asset_quota_mb") or 0) * 1024 * 1024 or ASSET_QUOTA_BYTES
+    except (TypeError, ValueError):
+        return ASSET_TTL_SECONDS, ASSET_QUOTA_BYTES
+    return ttl, quota
+
+
+def _asset_meta(asset_id: str) -> dict | None:
+    """Metadata of a live asset, or None. Looking an asset up renews its TTL."""
+    if not re.fullmatch(r"[0-9a-f]{32}", asset_id or ""):
+        return None
+    meta_path = ASSET_DIR / f"{asset_id}.json"
+    try:
+        meta = json.loads(meta_path.read_text())
+        os.utime(meta_path)
+    except (OSError, ValueError):
+        return None
+    return meta if (ASSET_DIR / asset_id).exists() else None
+
+
+def _prune_assets():
+    """Drop expired assets, then the least recently used ones until under quota."""
+    if not ASSET_DIR.exists():
+        return
+    ttl, quota = _asset_limits()
+    now = time.time()
+    live = []
+    for meta_path in ASSET_DIR.glob("*.json"):
+        data_path = meta_path.with_suffix("")
+        try:
+            used, size = meta_path.stat().st_mtime, data_path.stat().st_size
+        except OSError:
+            continue
+        if now - used > ttl:
+            data_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+        else:
+            live.append((used, size, meta_path, data_path))
+    total = sum(size for _, size, _, _ in live)
+    for _, size, meta_path, data_path in sorted(live):
+        if total <= quota:
+            break
+        data_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+        total -= size
+
+
+def _adopt_asset(path: Path, digest: str, name: str, content_type: str | None) -> dict:
+    """Move a complete file into the store under its sha256 digest."""
+    size = path.stat().st_size
+    _, quota = _asset_limits()
+    if size > quota:
+        raise ValueError("File is larger than the asset store quota")
+    asset_id = digest[:32]
+    ASSET_DIR.mkdir(exist_ok=True)
+    with _assets_lock:
+        meta = _asset_meta(asset_id)
+        if meta is None:
+            meta = {"id": asset_id, "name": _safe_filename(name, "file"), "size": size,
+                    "content_type": content_type or "application/octet-stream",
+                    "created": time.time()}
+            os.replace(path, ASSET_DIR / asset_id)
+            (ASSET_DIR / f"{asset_id}.json").write_text(json.dumps(meta))
+    path.unlink(missing_ok=True)
+    _prune_assets()
+    return meta
+
+
+def store_asset(stream, name: str, content_type: str | None = None) -> dict:
+    """Copy a binary stream into the store; identical content shares one asset."""
+    ASSET_DIR.mkdir(exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=ASSET_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(1 << 20), b""):
+                h.update(chunk)
+                out.write(chunk)
+        return _adopt_asset(Path(tmp), h.hexdigest(), name, content_type)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+
+
+@app.before_request
+def resolve_asset_inputs():
+    """Stand stored assets in for the uploads a tool expects."""
+    if request.method != "POST" or request.path.startswith("/api/assets") or not request.form:
+        return
+    refs = [(key, value) for key, values in request.form.lists()
+            if key == "asset_ids" or key.endswith("asset_id") for value in values]
+    if not refs:
+        return
+    files = MultiDict(request.files)
+    for key, asset_id in refs:
+        field = {"asset_id": "file", "asset_ids": "files"}.get(key) or key[:-len("_asset_id")]
+        meta = _asset_meta(asset_id)
+        if meta is None:
+            return jsonify({"error": f"Unknown or expired asset: {asset_id}"}), 404
+        files.add(field, LocalInput(ASSET_DIR / asset_id, field, filename=meta["name"],
+                                    content_type=meta["content_type"]))
+    # The request closes these file handles when it ends.
+    request.files = ImmutableMultiDict(files)
+    g.asset_inputs = True
+
 
-    zip_buf.seek(0)
-    return send_file(zip_buf, as_attachment=True, download_name="downloads.zip",
-                     mimetype="application/zip")
+@app.after_request
+def register_asset_result(response):
+    """Keep the file a tool returned for assets as a new asset, for the next step."""
+    if (not g.get("asset_inputs") or response.status_code != 200
+            or "attachment" not in response.headers.get("Content-Disposition", "")):
+        return response
+    _, params = parse_options_header(response.headers["Content-Disposition"])
+    name = params.get("filename", "result")
+    ASSET_DIR.mkdir(exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=ASSET_DIR, suffix=".part")
+    tmp = Path(tmp)
+    try:
+        # Spooled chunk by chunk: results can be large, or still streaming
+        # out of ffmpeg or a ZIP writer.
+        with os.fdopen(fd, "wb") as out:
+            for chunk in response.iter_encoded():
+                h.update(chunk)
+                out.write(chunk)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        failed = jsonify({"error": str(e)[-500:]})
+        failed.status_code = 500
+        return failed
+    finally:
+        response.close()
+    try:
+        meta = _adopt_asset(tmp, h.hexdigest(), name, response.mimetype)
+        stored = _send_disk_file(ASSET_DIR / meta["id"], name, response.mimetype, etag=meta["id"])
+        stored.headers["X-Asset-Id"] = meta["id"]
+    except ValueError:
+        # Over the store's quota: still hand the result back, just not as an asset.
+        stored = _send_disk_file(tmp, name, response.mimetype)
+        stored.call_on_close(lambda: tmp.unlink(missing_ok=True))
+    for key, value in response.headers.items():
+        if key.startswith("X-"):
+            stored.headers[key] = value
+    return stored
+
+
+@app.route("/api/assets", methods=["POST"])
+def upload_assets():
+    files = [f for f in request.files.getlist("files") + request.files.getlist("file") if f.filename]
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+    try:
+        assets = [store_asset(f.stream, f.filename, f.mimetype) for f in files]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify({"assets": assets})
+
+
+@app.route("/api/assets/<asset_id>", methods=["GET"])
+def asset_info(asset_id):
+    meta = _asset_meta(asset_id)
+    if meta is None:
+        return jsonify({"error": "Unknown or expired asset"}), 404
+    return jsonify(meta)
+
+
+@app.route("/api/assets/<asset_id>/file")
+def asset_file(asset_id):
+    meta = _asset_meta(asset_id)
+    if meta is None:
+        return jsonify({"error": "Unknown or expired asset"}), 404
+    # The id is the content hash, the strongest validator there is.
+    return _send_disk_file(ASSET_DIR / asset_id, download_name=meta["name"],
+                           mimetype=meta["content_type"], etag=asset_id)
+
+
+@app.route("/api/assets/<asset_id>", methods=["DELETE"])
+def delete_asset(asset_id):
+    if _asset_meta(asset_id) is None:
+        return jsonify({"error": "Unknown or expired asset"}), 404
+    with _assets_lock:
+        (ASSET_DIR / asset_id).unlink(missing_ok=True)
+        (ASSET_DIR / f"{asset_id}.json").unlink(missing_ok=True)
+    return jsonify({"ok": True})
+
+
+# Resumable uploads, after the tus 1.0 core protocol and its checksum
+# extension. POST /api/uploads with Upload-Length (and optionally
+# Upload-Metadata "filename <b64>,filetype <b64>") opens an upload; HEAD
+# reports its Upload-Offset; PATCH appends one chunk at that offset, checked
+# against "Upload-Checksum: sha256 <b64>" when given. Chunks are assembled
+# in UPLOAD_DIR and the finished file becomes an asset (X-Asset-Id).
+UPLOAD_DIR = DOWNLOAD_DIR / "uploads"
+UPLOAD_MAX_BYTES = 8 * 1024 ** 3
+UPLOAD_STALE_SECONDS = 24 * 3600
+_UPLOAD_CHECKSUMS = ("sha1", "sha256", "md5")
+# Only used without fcntl; elsewhere the part file itself is locked.
+_upload_locks: dict[str, threading.Lock] = {}
+
+
+def _upload_max_bytes() -> float:
+    """Upload size limit: max_upload_mb config, then UPLOAD_MAX_BYTES."""
+    try:
+        return float(load_config().get("max_upload_mb") or 0) * 1024 * 1024 or UPLOAD_MAX_BYTES
+    except (TypeError, ValueError):
+        return UPLOAD_MAX_BYTES
+
+
+def _upload_meta(u_id: str) -> dict | None:
+    if not re.fullmatch(r"[0-9a-f]{32}", u_id):
+        return None
+    try:
+        return json.loads((UPLOAD_DIR / f"{u_id}.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _upload_offset(meta: dict) -> int:
+    if meta["asset_id"]:
+        return meta["length"]
+    try:
+        return (UPLOAD_DIR / f"{meta['id']}.part").stat().st_size
+    except OSError:
+        return 0
+
+
+@contextlib.contextmanager
+def _upload_lock(u_id: str, part_file):
+    """Hold an upload's part file exclusively, across threads and worker processes."""
+    if fcntl is None:
+        with _upload_locks.setdefault(u_id, threading.Lock()):
+            yield
+        return
+    # Released when part_file is closed.
+    fcntl.flock(part_file.fileno(), fcntl.LOCK_EX)
+    yield
+
+
+def _tus_response(body, status, meta=None, **headers):
+    response = jsonify(body) if body is not None else Response(status=status)
+    response.status_code = status
+    response.headers["Tus-Resumable"] = "1.0.0"
+    response.headers["Cache-Control"] = "no-store"
+    if meta is not None:
+        response.headers["Upload-Offset"] = str(_upload_offset(meta))
+        response.headers["Upload-Length"] = str(meta["length"])
+        if meta["asset_id"]:
+            response.headers["X-Asset-Id"] = meta["asset_id"]
+    response.headers.update(headers)
+    return response
+
+
+def _prune_uploads():
+    """Forget uploads nobody has added a chunk to for UPLOAD_STALE_SECONDS."""
+    if not UPLOAD_DIR.exists():
+        return
+    now = time.time()
+    for meta_path in UPLOAD_DIR.glob("*.json"):
+        part = meta_path.with_suffix(".part")
+        with contextlib.suppress(OSError):
+            touched = max(meta_path.stat().st_mtime, part.stat().st_mtime if part.exists() else 0)
+            if now - touched > UPLOAD_STALE_SECONDS:
+                part.unlink(missing_ok=True)
+                meta_path.unlink()
+
+
+@app.route("/api/uploads", methods=["POST"])
+def create_upload():
+    try:
+        length = int(request.headers.get("Upload-Length", ""))
+    except ValueError:
+        return _tus_response({"error": "Upload-Length header required"}, 400)
+    if length < 1:
+        return _tus_response({"error": "Upload-Length must be positive"}, 400)
+    if length > min(_upload_max_bytes(), _asset_limits()[1]):
+        return _tus_response({"error": "File is larger than the upload limit"}, 413)
+    fields = {}
+    for pair in request.headers.get("Upload-Metadata", "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        with contextlib.suppress(ValueError):
+            fields[key] = base64.b64decode(value).decode("utf-8")
+    _prune_uploads()
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    u_id = uuid.uuid4().hex
+    meta = {"id": u_id, "length": length, "name": fields.get("filename") or "upload",
+            "content_type": fields.get("filetype"), "asset_id": None}
+    (UPLOAD_DIR / f"{u_id}.part").touch()
+    (UPLOAD_DIR / f"{u_id}.json").write_text(json.dumps(meta))
+    return _tus_response({"id": u_id, "offset": 0}, 201, meta, Location=f"/api/uploads/{u_id}")
+
+
+@app.route("/api/uploads/<u_id>", methods=["GET"])
+def upload_status(u_id):
+    """Upload progress; a HEAD request gets just the tus offset headers."""
+    meta = _upload_meta(u_id)
+    if meta is None:
+        return _tus_response({"error": "Unknown or expired upload"}, 404)
+    return _tus_response({"id": u_id, "offset": _upload_offset(meta), "length": meta["length"],
+                          "asset_id": meta["asset_id"]}, 200, meta)
+
+
+@app.route("/api/uploads/<u_id>", methods=["PATCH"])
+def upload_chunk(u_id):
+    meta = _upload_meta(u_id)
+    if meta is None:
+        return _tus_response({"error": "Unknown or expired upload"}, 404)
+    if request.mimetype != "application/offset+octet-stream":
+        return _tus_response({"error": "Chunks must be application/offset+octet-stream"}, 415)
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return _tus_response({"error": "Upload-Offset header required"}, 400)
+    if meta["asset_id"] and offset == meta["length"]:
+        # The final chunk again, from a client whose 204 got lost: the part
+        # has already been adopted as an asset.
+        return _tus_response(None, 204, meta)
+    digest = None
+    if request.headers.get("Upload-Checksum"):
+        algo, _, expected = request.headers["Upload-Checksum"].partition(" ")
+        if algo not in _UPLOAD_CHECKSUMS:
+            return _tus_response({"error": f"Checksum must be one of: {', '.join(_UPLOAD_CHECKSUMS)}"}, 400)
+        digest = hashlib.new(algo)
+
+    part = UPLOAD_DIR / f"{u_id}.part"
+    try:
+        out = open(part, "r+b")
+    except FileNotFoundError:
+        # Completed (or deleted) by another request since meta was read.
+        meta = _upload_meta(u_id)
+        if meta is None:
+            return _tus_response({"error": "Unknown or expired upload"}, 404)
+        if meta["asset_id"] and offset == meta["length"]:
+            return _tus_response(None, 204, meta)
+        return _tus_response({"error": "Offset does not match the upload"}, 409, meta)
+    with out, _upload_lock(u_id, out):
+        # Another worker may have written or finished the upload while this
+        # request waited for the lock.
+        meta = _upload_meta(u_id)
+        if meta is None:
+            return _tus_response({"error": "Unknown or expired upload"}, 404)
+        if meta["asset_id"] or offset != os.fstat(out.fileno()).st_size:
+            return _tus_response({"error": "Offset does not match the upload"}, 409, meta)
+        room = meta["length"] - offset
+        error = None
+        try:
+            out.seek(offset)
+            while chunk := request.stream.read(1 << 20):
+                if len(chunk) > room:
+                    error = ("Chunk runs past Upload-Length", 413)
+                    break
+                room -= len(chunk)
+                out.write(chunk)
+                if digest:
+                    digest.update(chunk)
+            out.flush()
+            if not error and digest and base64.b64encode(digest.digest()).decode() != expected.strip():
+                error = ("Checksum mismatch", 460)
+        except Exception:
+            out.truncate(offset)
+            raise
+        if error:
+            # Drop the partial chunk so the client can resend it whole.
+            out.truncate(offset)
+            return _tus_response({"error": error[0]}, error[1], meta)
+        if room == 0:
+            try:
+                asset = _adopt_asset(part, tools.file_hash(str(part)), meta["name"], meta["content_type"])
+            except ValueError as e:
+                return _tus_response({"error": str(e)}, 413, meta)
+            meta["asset_id"] = asset["id"]
+            tmp = UPLOAD_DIR / f".{u_id}.json.{os.getpid()}"
+            tmp.write_text(json.dumps(meta))
+            os.replace(tmp, UPLOAD_DIR / f"{u_id}.json")
+            _upload_locks.pop(u_id, None)
+    return _tus_response(None, 204, meta)
+
+
+@app.route("/api/uploads/<u_id>", methods=["DELETE"])
+def delete_upload(u_id):
+    if _upload_meta(u_id) is None:
+        return _tus_response({"error": "Unknown or expired upload"}, 404)
+    (UPLOAD_DIR / f"{u_id}.part").unlink(missing_ok=True)
+    (UPLOAD_DIR / f"{u_id}.json").unlink(missing_ok=True)
+    _upload_locks.pop(u_id, None)
+    return _tus_response(None, 204)
 
 
 # ── PDF API ──
@@ -1088,9 +2244,7 @@ def pdf_split():
         return send_file(io.BytesIO(data), as_attachment=True, download_name="split.pdf",
                          mimetype="application/pdf")
     else:
-        zip_data = tools.create_zip(parts)
-        return send_file(io.BytesIO(zip_data), as_attachment=True, download_name="split_pages.zip",
-                         mimetype="application/zip")
+        return _zip_response(parts, "split_pages.zip")
 
 
 @app.route("/api/pdf/images-to-pdf", methods=["POST"])
@@ -1276,10 +2430,8 @@ def pdf_extract_images():
             mime = "image/jpeg" if name.endswith(".jpg") else "image/png"
             return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
         else:
-            zip_data = tools.create_zip(images)
             base = tools._base_from_filename(f.filename, "document")
-            return send_file(io.BytesIO(zip_data), as_attachment=True,
-                             download_name=f"{base}_images.zip", mimetype="application/zip")
+            return _zip_response(images, f"{base}_images.zip")
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -1375,9 +2527,7 @@ def image_resize():
         mime = tools._MIME_MAP.get(fmt, f"image/{fmt}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
     else:
-        zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-        return send_file(io.BytesIO(zip_data), as_attachment=True,
-                         download_name="resized_images.zip", mimetype="application/zip")
+        return _zip_response([(n, d) for n, d, _ in results], "resized_images.zip")
 
 
 @app.route("/api/images/compress", methods=["POST"])
@@ -1409,9 +2559,7 @@ def image_compress():
         resp.headers["X-Compressed-Size"] = str(len(data))
         return resp
     else:
-        zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-        return send_file(io.BytesIO(zip_data), as_attachment=True,
-                         download_name="compressed_images.zip", mimetype="application/zip")
+        return _zip_response([(n, d) for n, d, _ in results], "compressed_images.zip")
 
 
 @app.route("/api/images/convert", methods=["POST"])
@@ -1439,9 +2587,7 @@ def image_convert():
         mime = tools._MIME_MAP.get(target, f"image/{target}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
     else:
-        zip_data = tools.create_zip(results)
-        return send_file(io.BytesIO(zip_data), as_attachment=True,
-                         download_name=f"converted_{target}.zip", mimetype="application/zip")
+        return _zip_response(results, f"converted_{target}.zip")
 
 
 @app.route("/api/images/crop", methods=["POST"])
@@ -1492,9 +2638,7 @@ def image_rotate():
         name, data, fmt = results[0]
         mime = tools._MIME_MAP.get(fmt, f"image/{fmt}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
-    zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-    return send_file(io.BytesIO(zip_data), as_attachment=True,
-                     download_name="rotated_images.zip", mimetype="application/zip")
+    return _zip_response([(n, d) for n, d, _ in results], "rotated_images.zip")
 
 
 @app.route("/api/images/strip-exif", methods=["POST"])
@@ -1540,9 +2684,7 @@ def image_flip():
         name, data, fmt = results[0]
         mime = tools._MIME_MAP.get(fmt, f"image/{fmt}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
-    zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-    return send_file(io.BytesIO(zip_data), as_attachment=True,
-                     download_name="flipped_images.zip", mimetype="application/zip")
+    return _zip_response([(n, d) for n, d, _ in results], "flipped_images.zip")
 
 
 @app.route("/api/images/grayscale", methods=["POST"])
@@ -1569,9 +2711,7 @@ def image_grayscale():
         name, data, fmt = results[0]
         mime = tools._MIME_MAP.get(fmt, f"image/{fmt}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
-    zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-    return send_file(io.BytesIO(zip_data), as_attachment=True,
-                     download_name="grayscale_images.zip", mimetype="application/zip")
+    return _zip_response([(n, d) for n, d, _ in results], "grayscale_images.zip")
 
 
 @app.route("/api/images/blur", methods=["POST"])
@@ -1602,9 +2742,7 @@ def image_blur():
         name, data, fmt = results[0]
         mime = tools._MIME_MAP.get(fmt, f"image/{fmt}")
         return send_file(io.BytesIO(data), as_attachment=True, download_name=name, mimetype=mime)
-    zip_data = tools.create_zip([(n, d) for n, d, _ in results])
-    return send_file(io.BytesIO(zip_data), as_attachment=True,
-                     download_name="blurred_images.zip", mimetype="application/zip")
+    return _zip_response([(n, d) for n, d, _ in results], "blurred_images.zip")
 
 
 @app.route("/api/images/to-ico", methods=["POST"])
@@ -1832,8 +2970,240 @@ def xml_to_json():
 
 # ── AV API ──
 
+@app.route("/api/av/info", methods=["POST"])
+def av_info():
+    """Stream layout, codecs, duration, and dimensions of a media file."""
+    f = request.files.get("file")
+    if not f:
+        return jsonify({"error": "No media file provided"}), 400
+    ext = tools._ext_from_filename(f.filename, "bin")
+    try:
+        return jsonify(tools.probe_media(_input_data(f), ext))
+    except tools.FFmpegMissingError:
+        return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)[-500:]}), 500
+
+
+@app.route("/api/av/waveform", methods=["POST"])
+def av_waveform():
+    """Min/max waveform peaks for drawing trim and fade timelines.
+
+    format=json (default) returns every zoom level. format=bin returns one
+    level (index "level") as interleaved signed 8-bit min/max pairs.
+    """
+    f = request.files.get("file")
+    if not f:
+        return jsonify({"error": "No media file provided"}), 400
+    fmt = request.form.get("format", "json")
+    if fmt not in ("json", "bin"):
+        return jsonify({"error": "Format must be json or bin"}), 400
+    try:
+        level = int(request.form.get("level", 0))
+    except ValueError:
+        return jsonify({"error": "Invalid level"}), 400
+    if not 0 <= level < len(tools.WAVEFORM_LEVELS):
+        return jsonify({"error": f"Level must be 0-{len(tools.WAVEFORM_LEVELS) - 1}"}), 400
+    ext = tools._ext_from_filename(f.filename, "bin")
+    try:
+        peaks = tools.waveform_peaks(_input_data(f), ext)
+    except tools.FFmpegMissingError:
+        return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)[-500:]}), 500
+    if fmt == "json":
+        return jsonify(peaks)
+    chosen = peaks["levels"][level]
+    pairs = bytearray(2 * len(chosen["min"]))
+    pairs[0::2] = bytes(v & 0xFF for v in chosen["min"])
+    pairs[1::2] = bytes(v & 0xFF for v in chosen["max"])
+    resp = Response(bytes(pairs), mimetype="application/octet-stream")
+    resp.headers["X-Duration"] = str(peaks["duration"])
+    resp.headers["X-Seconds-Per-Peak"] = str(chosen["seconds_per_peak"])
+    return resp
+
+
+@app.route("/api/av/thumbnails", methods=["POST"])
+def av_thumbnails():
+    """Keyframe sprite sheet for previewing a video before trimming or cropping.
+
+    Returns the sheet layout as JSON with a sprite_url and a WebVTT track
+    (vtt) whose cues point into the sprite.
+    """
+    f = request.files.get("file")
+    if not f:
+        return jsonify({"error": "No video file provided"}), 400
+    try:
+        count = int(request.form.get("count", 20))
+        width = int(request.form.get("width", 160))
+    except ValueError:
+        return jsonify({"error": "Invalid count or width"}), 400
+    ext = tools._ext_from_filename(f.filename, "mp4")
+    try:
+        sheet = tools.thumbnail_sheet(_input_data(f), ext, count, width)
+    except tools.FFmpegMissingError:
+        return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)[-500:]}), 500
+    sheet["sprite_url"] = f"/api/av/thumbnails/{sheet['id']}.jpg"
+    sheet["vtt"] = tools.thumbnails_vtt(sheet, sheet["sprite_url"])
+    # Kept on disk rather than only in this worker's cache, so whichever
+    # worker gets the sprite or track request can serve it.
+    sheet_dir = DOWNLOAD_DIR / f"thumbs_{sheet['id']}"
+    sprite = tools.thumbnail_sprite(sheet["id"])
+    if sprite is not None and not (sheet_dir / "sprite.jpg").exists():
+        sheet_dir.mkdir(exist_ok=True)
+        for name, data in (("sheet.vtt", sheet["vtt"].encode()), ("sprite.jpg", sprite)):
+            tmp = sheet_dir / f".{name}.{os.getpid()}.{threading.get_ident()}"
+            tmp.write_bytes(data)
+            os.replace(tmp, sheet_dir / name)
+    return jsonify(sheet)
+
+
+_SHEET_ID_RE = re.compile(r"[0-9a-f]{16}-\d+-\d+")
+
+
+@app.route("/api/av/thumbnails/<sheet_id>.<kind>")
+def av_thumbnail_sprite(sheet_id, kind):
+    """The sprite JPEG (.jpg) or WebVTT track (.vtt) of a thumbnail sheet."""
+    name = {"jpg": "sprite.jpg", "vtt": "sheet.vtt"}.get(kind)
+    path = DOWNLOAD_DIR / f"thumbs_{sheet_id}" / (name or "")
+    if not name or not _SHEET_ID_RE.fullmatch(sheet_id) or not path.is_file():
+        return jsonify({"error": "Thumbnails expired, request them again"}), 404
+    resp = send_file(path, mimetype="image/jpeg" if kind == "jpg" else "text/vtt")
+    # The id embeds the content hash, so a given URL never changes.
+    resp.headers["Cache-Control"] = "public, max-age=86400, immutable"
+    return resp
+
+
+# Preview proxies keyed by content-hash prefix; files live in
+# DOWNLOAD_DIR/preview_<id>/ so re-uploading the same file reuses them.
+previews = JobStore("previews")
+_previews_lock = threading.Lock()
+
+
+@app.route("/api/av/preview", methods=["POST"])
+def av_preview():
+    """Start (or reuse) a 360p browser-playable proxy of an uploaded video."""
+    f = request.files.get("file")
+    if not f:
+        return jsonify({"error": "No video file provided"}), 400
+    if not tools.ffmpeg_available():
+        return _ffmpeg_missing_response()
+    ext = tools._ext_from_filename(f.filename, "mp4")
+    upload = DOWNLOAD_DIR / f"preview_upload_{uuid.uuid4().hex[:12]}.{ext}"
+    f.save(upload)
+    p_id = tools.file_hash(str(upload))[:16]
+    preview_dir = DOWNLOAD_DIR / f"preview_{p_id}"
+    with _previews_lock:
+        info = previews.get(p_id)
+        if info and info["status"] != "error":
+            upload.unlink(missing_ok=True)
+            return jsonify({"id": p_id, "status": info["status"],
+                            "url": f"/api/av/preview/{p_id}"})
+        shutil.rmtree(preview_dir, ignore_errors=True)
+        preview_dir.mkdir()
+        in_path = preview_dir / f"input.{ext}"
+        upload.replace(in_path)
+        try:
+            proc = tools.start_proxy_preview(str(in_path), str(preview_dir / "proxy.mp4"),
+                                             str(preview_dir / "ffmpeg.log"), job=f"preview-{p_id}")
+        except tools.FFmpegMissingError:
+            shutil.rmtree(preview_dir, ignore_errors=True)
+            return _ffmpeg_missing_response()
+        previews[p_id] = {"status": "encoding", "error": None, "created": time.time()}
+
+    def watch():
+        tools.finish_process(proc)
+        info = previews[p_id]
+        if proc.returncode == 0:
+            info["status"] = "done"
+        else:
+            log = (preview_dir / "ffmpeg.log").read_text(errors="replace").strip()
+            info["error"] = tools._friendly_ffmpeg_error(log)
+            info["status"] = "error"
+        in_path.unlink(missing_ok=True)
+
+    threading.Thread(target=watch, daemon=True).start()
+    return jsonify({"id": p_id, "status": "encoding", "url": f"/api/av/preview/{p_id}"})
+
+
+@app.route("/api/av/preview/<p_id>")
+def av_preview_file(p_id):
+    """Serve a proxy, streaming it progressively while it is still encoding."""
+    proxy = DOWNLOAD_DIR / f"preview_{p_id}" / "proxy.mp4"
+    if not previews.get(p_id):
+        return jsonify({"error": "Unknown preview"}), 404
+
+    def status():
+        # Re-read each time: another worker process may be the one encoding.
+        return previews.get(p_id, {"status": "error", "error": "Preview was removed"})
+
+    # ffmpeg creates the output only once it has parsed the input.
+    start = time.time()
+    while status()["status"] == "encoding" and not proxy.exists() and time.time() - start < 30:
+        time.sleep(0.1)
+    info = status()
+    if info["status"] == "error":
+        return jsonify({"error": info["error"]}), 500
+    if not proxy.exists():
+        return jsonify({"error": "Preview is not ready yet"}), 404
+    if info["status"] == "done":
+        return _send_disk_file(proxy, mimetype="video/mp4", as_attachment=False)
+
+    def stream():
+        with open(proxy, "rb") as fh:
+            while time.time() - start < 7200:
+                chunk = fh.read(256 * 1024)
+                if chunk:
+                    yield chunk
+                elif status()["status"] == "encoding":
+                    time.sleep(0.2)
+                else:
+                    # The encoder may have flushed a last fragment since the read.
+                    while chunk := fh.read(256 * 1024):
+                        yield chunk
+                    break
+
+    return Response(stream(), mimetype="video/mp4",
+                    headers={"Cache-Control": "no-store"})
+
+
+def _streamed_attachment(chunks: Iterator[bytes], download_name: str) -> Response:
+    """Chunked download of a stream_ffmpeg() generator.
+
+    The first chunk is pulled here so a failure to start still becomes an
+    ordinary error response.
+    """
+    first = next(chunks, b"")
+
+    def body():
+        yield first
+        yield from chunks
+
+    response = Response(body(), mimetype=mimetypes.guess_type(download_name)[0]
+                        or "application/octet-stream")
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 @app.route("/api/av/convert-audio", methods=["POST"])
 def av_convert_audio():
+    """Convert audio, from a multipart upload or streamed.
+
+    A raw request body (with ?format= and ?filename=) in a format ffmpeg can
+    read from a pipe is converted while it is still uploading, and the
+    output comes back chunked as ffmpeg writes it.
+    """
+    if request.mimetype not in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        return _av_convert_audio_stream()
     f = request.files.get("file")
     if not f:
         return jsonify({"error": "No audio file provided"}), 400
@@ -1843,7 +3213,7 @@ def av_convert_audio():
     ext = tools._ext_from_filename(f.filename, "bin")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.convert_audio(f.stream.read(), ext, fmt)
+        result = tools.convert_audio(_input_data(f), ext, fmt)
         return send_file(io.BytesIO(result), as_attachment=True, download_name=f"{base}.{fmt}")
     except tools.FFmpegMissingError:
         return _ffmpeg_missing_response()
@@ -1851,6 +3221,25 @@ def av_convert_audio():
         return jsonify({"error": str(e)[-500:]}), 500
 
 
+def _av_convert_audio_stream():
+    fmt = request.args.get("format", "mp3").lower()
+    name = request.args.get("filename", "")
+    ext = tools._ext_from_filename(name, "bin")
+    base = tools._base_from_filename(name, "audio")
+    if fmt not in tools.PIPE_OUTPUT_FORMATS:
+        return jsonify({"error": f"Streamed output must be one of: {', '.join(tools.PIPE_OUTPUT_FORMATS)}"}), 400
+    if ext not in tools.PIPE_INPUT_FORMATS:
+        return jsonify({"error": f"Streamed input must be one of: {', '.join(tools.PIPE_INPUT_FORMATS)}; "
+                                 "upload other files as a form"}), 400
+    try:
+        chunks = tools.stream_ffmpeg(request.stream, ext, fmt, ["-map", "0:a"] + tools.AUDIO_CODEC_MAP[fmt])
+        return _streamed_attachment(chunks, f"{base}.{fmt}")
+    except tools.FFmpegMissingError:
+        return _ffmpeg_missing_response()
+    except Exception as e:
+        return jsonify({"error": str(e)[-500:]}), 500
+
+
 @app.route("/api/av/trim-audio", methods=["POST"])
 def av_trim_audio():
     f = request.files.get("file")
@@ -1860,10 +3249,13 @@ def av_trim_audio():
     end = request.form.get("end", "").strip()
     if not start:
         return jsonify({"error": "Start time required"}), 400
+    mode = request.form.get("mode", "copy")
+    if mode not in ("copy", "smart"):
+        return jsonify({"error": "Mode must be copy or smart"}), 400
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.trim_audio(f.stream.read(), ext, start, end)
+        result = tools.trim_audio(_input_data(f), ext, start, end, mode=mode)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_trimmed.{ext}")
     except tools.FFmpegMissingError:
@@ -1886,7 +3278,7 @@ def av_audio_speed():
     base = tools._base_from_filename(f.filename, "audio")
     out_ext = ext if ext in ("mp3", "wav", "ogg", "flac") else "mp3"
     try:
-        result = tools.audio_speed(f.stream.read(), ext, speed_f)
+        result = tools.audio_speed(_input_data(f), ext, speed_f)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_{speed}x.{out_ext}")
     except tools.FFmpegMissingError:
@@ -1906,7 +3298,7 @@ def av_extract_audio():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.extract_audio(f.stream.read(), ext, fmt)
+        result = tools.extract_audio(_input_data(f), ext, fmt)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_audio.{fmt}")
     except tools.FFmpegMissingError:
@@ -1924,10 +3316,13 @@ def av_trim_video():
     end = request.form.get("end", "").strip()
     if not start:
         return jsonify({"error": "Start time required"}), 400
+    mode = request.form.get("mode", "copy")
+    if mode not in ("copy", "smart"):
+        return jsonify({"error": "Mode must be copy or smart"}), 400
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.trim_video(f.stream.read(), ext, start, end)
+        result = tools.trim_video(_input_data(f), ext, start, end, mode=mode)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_trimmed.{ext}")
     except tools.FFmpegMissingError:
@@ -1942,12 +3337,20 @@ def av_compress_video():
     if not f:
         return jsonify({"error": "No video file provided"}), 400
     quality = request.form.get("quality", "medium")
+    budget, err = _form_time_budget()
+    if err:
+        return jsonify({"error": err}), 400
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.compress_video(f.stream.read(), ext, quality)
-        return send_file(io.BytesIO(result), as_attachment=True,
+        data = _input_data(f)
+        plan = tools.plan_video_encode(data, ext, "libx264", budget,
+                                        parallel=_form_parallel())
+        result = tools.compress_video(data, ext, quality, parallel=_form_parallel(),
+                                      **_plan_kwargs(plan))
+        resp = send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_compressed.mp4")
+        return _with_plan_headers(resp, plan)
     except tools.FFmpegMissingError:
         return _ffmpeg_missing_response()
     except Exception as e:
@@ -1962,12 +3365,20 @@ def av_convert_video():
     fmt = request.form.get("format", "mp4").lower()
     if fmt not in tools.VIDEO_CODEC_MAP:
         return jsonify({"error": "Unsupported format"}), 400
+    budget, err = _form_time_budget()
+    if err:
+        return jsonify({"error": err}), 400
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.convert_video(f.stream.read(), ext, fmt)
-        return send_file(io.BytesIO(result), as_attachment=True,
+        data = _input_data(f)
+        plan = tools.plan_video_encode(data, ext, tools.VIDEO_CODEC_MAP[fmt][1], budget,
+                                        parallel=_form_parallel())
+        result = tools.convert_video(data, ext, fmt, parallel=_form_parallel(),
+                                     **_plan_kwargs(plan))
+        resp = send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}.{fmt}")
+        return _with_plan_headers(resp, plan)
     except tools.FFmpegMissingError:
         return _ffmpeg_missing_response()
     except Exception as e:
@@ -1980,15 +3391,28 @@ def av_merge_audio():
     if len(files) < 2:
         return jsonify({"error": "Need at least 2 audio files"}), 400
     fmt = request.form.get("format", "mp3").lower()
+    if fmt not in tools.AUDIO_CODEC_MAP:
+        return jsonify({"error": "Unsupported format"}), 400
+    # Parts go straight to disk, so a 40-part audiobook never sits in memory.
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_merge_", dir=DOWNLOAD_DIR))
     try:
-        files_data = [(tools._ext_from_filename(f.filename, "mp3"), f.stream.read()) for f in files]
-        result = tools.merge_audio_files(files_data, fmt)
-        return send_file(io.BytesIO(result), as_attachment=True,
+        paths = []
+        for i, f in enumerate(files):
+            path = tmpdir / f"input_{i}.{tools._ext_from_filename(f.filename, 'mp3')}"
+            f.save(path)
+            paths.append(str(path))
+        out_path = tmpdir / f"merged.{fmt}"
+        tools.merge_audio_paths(paths, str(out_path), fmt)
+        return send_file(io.BytesIO(out_path.read_bytes()), as_attachment=True,
                          download_name=f"merged.{fmt}")
     except tools.FFmpegMissingError:
         return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)[-500:]}), 500
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
 
 @app.route("/api/av/normalize-volume", methods=["POST"])
@@ -1996,10 +3420,16 @@ def av_normalize_volume():
     f = request.files.get("file")
     if not f:
         return jsonify({"error": "No audio file provided"}), 400
+    mode = request.form.get("mode", "single")
+    if mode not in ("single", "two-pass"):
+        return jsonify({"error": "Mode must be single or two-pass"}), 400
+    target, err = _form_loudness_target()
+    if err:
+        return jsonify({"error": err}), 400
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.normalize_volume(f.stream.read(), ext)
+        result = tools.normalize_volume(_input_data(f), ext, mode=mode, target=target)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_normalized.{ext}")
     except tools.FFmpegMissingError:
@@ -2008,6 +3438,44 @@ def av_normalize_volume():
         return jsonify({"error": str(e)[-500:]}), 500
 
 
+@app.route("/api/av/normalize-album", methods=["POST"])
+def av_normalize_album():
+    """Bring a set of tracks to a target loudness with one shared gain."""
+    files = [f for f in request.files.getlist("files") if f.filename]
+    if not files:
+        return jsonify({"error": "No audio files provided"}), 400
+    target, err = _form_loudness_target()
+    if err:
+        return jsonify({"error": err}), 400
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_album_", dir=DOWNLOAD_DIR))
+    streaming = False
+    try:
+        in_paths, out_paths, names = [], [], []
+        for i, f in enumerate(files):
+            ext = tools._ext_from_filename(f.filename, "mp3")
+            in_paths.append(str(tmpdir / f"in_{i}.{ext}"))
+            out_paths.append(str(tmpdir / f"out_{i}.{ext}"))
+            f.save(in_paths[-1])
+            names.append(f"{i + 1:02d}_{tools._base_from_filename(f.filename, 'track')}_normalized.{ext}")
+        album = tools.normalize_album_paths(in_paths, out_paths, target=target)
+        # The ZIP streams from tmpdir, which goes once the response is sent.
+        resp = _zip_response(list(zip(names, out_paths)), "album_normalized.zip",
+                             on_close=lambda: shutil.rmtree(tmpdir, ignore_errors=True))
+        streaming = True
+        resp.headers["X-Album-Loudness"] = str(album["album_i"])
+        resp.headers["X-Album-Gain"] = str(album["gain"])
+        return resp
+    except tools.FFmpegMissingError:
+        return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)[-500:]}), 500
+    finally:
+        if not streaming:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
 @app.route("/api/av/video-to-gif", methods=["POST"])
 def av_video_to_gif():
     f = request.files.get("file")
@@ -2016,16 +3484,35 @@ def av_video_to_gif():
     try:
         fps = int(request.form.get("fps", 10))
         width = int(request.form.get("width", 480))
+        colors = int(request.form.get("colors", 256))
+        max_kb = int(request.form.get("max_size_kb") or 0)
     except ValueError:
         return jsonify({"error": "Invalid parameters"}), 400
+    mode = request.form.get("mode", "fast")
+    if mode not in ("fast", "optimized"):
+        return jsonify({"error": "Mode must be fast or optimized"}), 400
+    if max_kb < 0 or (max_kb and mode != "optimized"):
+        return jsonify({"error": "A size limit needs optimized mode"}), 400
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
+    dither = request.form.get("dither", "sierra2_4a")
     try:
-        result = tools.video_to_gif(f.stream.read(), ext, fps=fps, width=width)
-        return send_file(io.BytesIO(result), as_attachment=True,
+        used = None
+        if max_kb:
+            result, used = tools.video_to_gif_within(_input_data(f), ext, max_kb * 1024, fps=fps,
+                                                     width=width, colors=colors, dither=dither)
+        else:
+            result = tools.video_to_gif(_input_data(f), ext, fps=fps, width=width, mode=mode,
+                                        colors=colors, dither=dither)
+        resp = send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}.gif", mimetype="image/gif")
+        if used:
+            resp.headers["X-GIF-Settings"] = json.dumps(used)
+        return resp
     except tools.FFmpegMissingError:
         return _ffmpeg_missing_response()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)[-500:]}), 500
 
@@ -2038,7 +3525,7 @@ def av_reverse_audio():
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.reverse_audio(f.stream.read(), ext)
+        result = tools.reverse_audio(_input_data(f), ext)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_reversed.{ext}")
     except tools.FFmpegMissingError:
@@ -2059,7 +3546,7 @@ def av_change_pitch():
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.change_pitch(f.stream.read(), ext, semitones)
+        result = tools.change_pitch(_input_data(f), ext, semitones)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_pitch.{ext}")
     except tools.FFmpegMissingError:
@@ -2082,7 +3569,7 @@ def av_audio_equalizer():
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.audio_equalizer(f.stream.read(), ext, bass, mid, treble)
+        result = tools.audio_equalizer(_input_data(f), ext, bass, mid, treble)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_eq.{ext}")
     except tools.FFmpegMissingError:
@@ -2105,7 +3592,7 @@ def av_audio_fade():
     ext = tools._ext_from_filename(f.filename, "mp3")
     base = tools._base_from_filename(f.filename, "audio")
     try:
-        result = tools.audio_fade(f.stream.read(), ext, fade_in, fade_out, duration)
+        result = tools.audio_fade(_input_data(f), ext, fade_in, fade_out, duration)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_faded.{ext}")
     except tools.FFmpegMissingError:
@@ -2131,7 +3618,7 @@ def av_crop_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.crop_video(f.stream.read(), ext, width, height, x, y)
+        result = tools.crop_video(_input_data(f), ext, width, height, x, y)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_cropped.{ext}")
     except tools.FFmpegMissingError:
@@ -2154,7 +3641,7 @@ def av_rotate_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.rotate_video(f.stream.read(), ext, angle)
+        result = tools.rotate_video(_input_data(f), ext, angle)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_rotated.{ext}")
     except tools.FFmpegMissingError:
@@ -2178,7 +3665,7 @@ def av_resize_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.resize_video(f.stream.read(), ext, width, height)
+        result = tools.resize_video(_input_data(f), ext, width, height)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_resized.{ext}")
     except tools.FFmpegMissingError:
@@ -2195,7 +3682,7 @@ def av_reverse_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.reverse_video(f.stream.read(), ext)
+        result = tools.reverse_video(_input_data(f), ext)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_reversed.{ext}")
     except tools.FFmpegMissingError:
@@ -2216,7 +3703,7 @@ def av_loop_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.loop_video(f.stream.read(), ext, count)
+        result = tools.loop_video(_input_data(f), ext, count)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_looped.{ext}")
     except tools.FFmpegMissingError:
@@ -2233,7 +3720,7 @@ def av_mute_video():
     ext = tools._ext_from_filename(f.filename, "mp4")
     base = tools._base_from_filename(f.filename, "video")
     try:
-        result = tools.mute_video(f.stream.read(), ext)
+        result = tools.mute_video(_input_data(f), ext)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_muted.{ext}")
     except tools.FFmpegMissingError:
@@ -2254,8 +3741,8 @@ def av_add_audio():
     base = tools._base_from_filename(video.filename, "video")
     audio_ext = tools._ext_from_filename(audio.filename, "mp3")
     try:
-        result = tools.add_audio_to_video(video.stream.read(), video_ext,
-                                          audio.stream.read(), audio_ext)
+        result = tools.add_audio_to_video(_input_data(video), video_ext,
+                                          _input_data(audio), audio_ext)
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_with_audio.{video_ext}")
     except tools.FFmpegMissingError:
@@ -2275,7 +3762,7 @@ def av_burn_subtitles():
     video_ext = tools._ext_from_filename(video.filename, "mp4")
     base = tools._base_from_filename(video.filename, "video")
     try:
-        result = tools.burn_subtitles(video.stream.read(), video_ext,
+        result = tools.burn_subtitles(_input_data(video), video_ext,
                                       subtitles.stream.read())
         return send_file(io.BytesIO(result), as_attachment=True,
                          download_name=f"{base}_subtitled.{video_ext}")
@@ -2285,6 +3772,178 @@ def av_burn_subtitles():
         return jsonify({"error": str(e)[-500:]}), 500
 
 
+# ── AV batch API ──
+
+# Batches of files run through one AV operation. Each entry tracks per-file
+# status so the progress stream can show which items are queued, running,
+# finished or failed; outputs live in DOWNLOAD_DIR/batch_<id>/.
+av_batches = JobStore("av_batches")
+_av_batches_lock = threading.Lock()
+
+
+def _batch_av_op(op: str, form) -> tuple[dict, str]:
+    """Validate batch options for op. Returns (options, error_str)."""
+    if op in ("convert-audio", "extract-audio"):
+        fmt = form.get("format", "mp3").lower()
+        if fmt not in tools.AUDIO_CODEC_MAP:
+            return {}, "Unsupported format"
+        return {"format": fmt}, ""
+    if op == "convert-video":
+        fmt = form.get("format", "mp4").lower()
+        if fmt not in tools.VIDEO_CODEC_MAP:
+            return {}, "Unsupported format"
+        return {"format": fmt}, ""
+    if op == "compress-video":
+        return {"quality": form.get("quality", "medium")}, ""
+    if op == "normalize-volume":
+        mode = form.get("mode", "single")
+        if mode not in ("single", "two-pass"):
+            return {}, "Mode must be single or two-pass"
+        return {"mode": mode}, ""
+    return {}, f"Unsupported batch operation: {op}"
+
+
+def _run_batch_av_op(op: str, opts: dict, data, ext: str) -> tuple[bytes, str, str]:
+    """Run one batch item. Returns (output, out_ext, filename_suffix).
+
+    Video items encode in one process: the batch already runs items side by
+    side, and segment fan-out would only compete with them for ffmpeg slots.
+    """
+    if op == "convert-audio":
+        return tools.convert_audio(data, ext, opts["format"]), opts["format"], ""
+    if op == "extract-audio":
+        return tools.extract_audio(data, ext, opts["format"]), opts["format"], "_audio"
+    if op == "convert-video":
+        return tools.convert_video(data, ext, opts["format"], parallel=False), opts["format"], ""
+    if op == "compress-video":
+        return (tools.compress_video(data, ext, opts["quality"], parallel=False),
+                "mp4", "_compressed")
+    return tools.normalize_volume(data, ext, mode=opts["mode"]), ext, "_normalized"
+
+
+@app.route("/api/av/batch", methods=["POST"])
+def av_batch():
+    files = [f for f in request.files.getlist("files") if f.filename]
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+    op = request.form.get("op", "")
+    opts, err = _batch_av_op(op, request.form)
+    if err:
+        return jsonify({"error": err}), 400
+    if not tools.ffmpeg_available():
+        return _ffmpeg_missing_response()
+
+    b_id = str(uuid.uuid4())[:12]
+    batch_dir = DOWNLOAD_DIR / f"batch_{b_id}"
+    batch_dir.mkdir()
+    items = []
+    for i, f in enumerate(files):
+        ext = tools._ext_from_filename(f.filename, "bin")
+        f.save(batch_dir / f"in_{i}.{ext}")
+        items.append({"name": f.filename, "ext": ext, "status": "queued",
+                      "output": None, "error": None})
+    # Everything the progress stream serializes is created up front, so the
+    # workers only ever replace values and never resize these dicts.
+    av_batches[b_id] = {"op": op, "status": "running", "total": len(items),
+                        "completed": 0, "failed": 0, "cancelled": False, "files": items,
+                        "created": time.time()}
+
+    used_names = set()
+    priority = g.av_priority
+
+    def update_item(item, **changes):
+        with _av_batches_lock:
+            item.update(changes)
+            av_batches.save(b_id)
+
+    def run_one(i):
+        item = items[i]
+        in_path = batch_dir / f"in_{i}.{item['ext']}"
+        try:
+            # Each ffmpeg child waits for a slot in tools, which also
+            # accounts the queue time.
+            tools.record_job_io(b_id, bytes_in=in_path.stat().st_size)
+            if tools.job_cancelled(b_id):
+                raise tools.JobCancelled("Cancelled by user")
+            update_item(item, status="running")
+            result, out_ext, suffix = _run_batch_av_op(op, opts, in_path, item["ext"])
+            base = tools._base_from_filename(item["name"], "file")
+            with _av_batches_lock:
+                name = f"{base}{suffix}.{out_ext}"
+                n = 2
+                while name in used_names:
+                    name = f"{base}{suffix}_{n}.{out_ext}"
+                    n += 1
+                used_names.add(name)
+            (batch_dir / f"out_{i}").write_bytes(result)
+            tools.record_job_io(b_id, bytes_out=len(result))
+            update_item(item, output=name, status="done")
+            with _av_batches_lock:
+                av_batches[b_id]["completed"] += 1
+        except tools.JobCancelled:
+            update_item(item, status="cancelled")
+        except Exception as e:
+            update_item(item, error=str(e)[-500:], status="error")
+            with _av_batches_lock:
+                av_batches[b_id]["failed"] += 1
+        finally:
+            in_path.unlink(missing_ok=True)
+
+    def run_batch():
+        # Items run as one job, so /api/av/cancel/<b_id> stops the lot.
+        with tools.job_scope(b_id, kind=f"batch:{op}"), tools.job_priority(priority), \
+                tools.ContextThreadPool(max_workers=tools.FFMPEG_MAX_JOBS) as pool:
+            list(pool.map(run_one, range(len(items))))
+        av_batches[b_id]["status"] = "cancelled" if av_batches[b_id]["cancelled"] else "done"
+
+    threading.Thread(target=run_batch, daemon=True).start()
+    return jsonify({"id": b_id, "total": len(items)})
+
+
+@app.route("/api/av/batch/<b_id>/progress")
+def av_batch_progress(b_id):
+    def stream():
+        start = time.time()
+        while True:
+            info = av_batches.get(b_id)
+            if not info:
+                yield f"data: {json.dumps({'error': 'Unknown batch'})}\n\n"
+                break
+            yield f"data: {json.dumps(dict(info, usage=tools.job_usage(b_id)))}\n\n"
+            if info["status"] != "running" or time.time() - start > 7200:
+                break
+            time.sleep(0.5)
+    return Response(stream(), mimetype="text/event-stream")
+
+
+@app.route("/api/av/batch/<b_id>/zip")
+def av_batch_zip(b_id):
+    """Stream finished outputs into a ZIP, adding each one as it completes."""
+    info = av_batches.get(b_id)
+    if not info:
+        return jsonify({"error": "Unknown batch"}), 404
+    batch_dir = DOWNLOAD_DIR / f"batch_{b_id}"
+
+    def finished_outputs():
+        sent = set()
+        start = time.time()
+        while time.time() - start < 7200:
+            # Re-read each pass: another worker process may be running it.
+            info = av_batches.get(b_id)
+            if not info:
+                break
+            running = info["status"] == "running"
+            for i, item in enumerate(info["files"]):
+                if i not in sent and item["status"] == "done":
+                    sent.add(i)
+                    yield item["output"], str(batch_dir / f"out_{i}")
+            if not running:
+                break
+            time.sleep(0.2)
+
+    return _zip_response(finished_outputs(), f"batch_{b_id}.zip")
+
+
 # ── Archive convert ──
 
 @app.route("/api/convert/zip", methods=["POST"])
@@ -2294,9 +3953,7 @@ def convert_zip():
         return jsonify({"error": "No files provided"}), 400
     try:
         file_list = [(f.filename or "file", f.stream.read()) for f in files]
-        result = tools.create_zip(file_list)
-        return send_file(io.BytesIO(result), as_attachment=True,
-                         download_name="archive.zip", mimetype="application/zip")
+        return _zip_response(file_list, "archive.zip")
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -2314,10 +3971,8 @@ def convert_unzip():
             name, data = extracted[0]
             return send_file(io.BytesIO(data), as_attachment=True, download_name=name)
         else:
-            zip_data = tools.create_zip(extracted)
             base = tools._base_from_filename(f.filename, "archive")
-            return send_file(io.BytesIO(zip_data), as_attachment=True,
-                             download_name=f"{base}_extracted.zip", mimetype="application/zip")
+            return _zip_response(extracted, f"{base}_extracted.zip")
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -2355,6 +4010,10 @@ def transcribe():
     valid_models = ("tiny", "base", "small", "medium", "large-v3")
     if model not in valid_models:
         return jsonify({"error": f"Invalid model. Choose from: {', '.join(valid_models)}"}), 400
+    try:
+        priority = _requested_priority("interactive")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     t_id = str(uuid.uuid4())[:12]
     ext = tools._ext_from_filename(f.filename, "mp3")
@@ -2370,6 +4029,13 @@ def transcribe():
     }
 
     def do_transcribe():
+        if priority == "background":
+            tools.lower_thread_priority()
+        with tools.job_scope(t_id, kind="transcribe"), tools.job_priority(priority):
+            tools.record_job_io(t_id, bytes_in=Path(input_path).stat().st_size)
+            _do_transcribe()
+
+    def _do_transcribe():
         wav_path = str(DOWNLOAD_DIR / f"{t_id}_audio.wav")
         try:
             def progress_cb(pct, status, detail):
@@ -2398,6 +4064,7 @@ def transcribe():
                 transcriptions[t_id]["detail"] = "Diarization skipped (no HuggingFace token)"
 
             progress_cb(95, "finalizing", "Preparing results...")
+            tools.record_job_io(t_id, bytes_out=len(json.dumps(segments)))
             transcriptions[t_id]["segments"] = segments
             transcriptions[t_id]["progress"] = 100
             transcriptions[t_id]["status"] = "done"
@@ -2423,7 +4090,7 @@ def transcribe_progress(t_id):
             if not info:
                 yield f"data: {json.dumps({'error': 'Unknown transcription'})}\n\n"
                 break
-            yield f"data: {json.dumps(info)}\n\n"
+            yield f"data: {json.dumps(dict(info, usage=tools.job_usage(t_id)))}\n\n"
             if info["status"] in ("done", "error"):
                 break
             time.sleep(0.5)
@@ -2698,26 +4365,57 @@ def main():
     parser.add_argument("--no-browser", action="store_true", help="don't open browser on start")
     parser.add_argument("--no-tray", action="store_true", help="skip system tray, run Flask on main thread")
     parser.add_argument("-q", "--quiet", action="store_true", help="suppress startup banner")
+    parser.add_argument("--server", choices=("dev", "waitress"), default="dev",
+                        help="HTTP server: Flask's development server or waitress (default: dev)")
+    parser.add_argument("--threads", type=int, default=16,
+                        help="request threads per worker with --server waitress (default: 16)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes with --server waitress, POSIX only (default: 1)")
+    parser.add_argument("--connection-limit", type=int, default=200,
+                        help="open connections per worker with --server waitress (default: 200)")
+    parser.add_argument("--backlog", type=int, default=1024,
+                        help="listen backlog with --server waitress (default: 1024)")
+    parser.add_argument("--channel-timeout", type=int, default=120,
+                        help="seconds an idle keep-alive connection stays open (default: 120)")
+    parser.add_argument("--x-sendfile", action="store_true",
+                        help="let a front-end server (Apache mod_xsendfile, lighttpd) send result files")
     parser.add_argument("--open", metavar="PAGE", help="open specific page (e.g. pdf, images, text)")
     parser.add_argument("command", nargs="?", help="subcommand (e.g. 'transcribe' to install transcription deps)")
 
     args = parser.parse_args()
+    if min(args.threads, args.workers, args.connection_limit, args.backlog, args.channel_timeout) < 1:
+        parser.error("--threads, --workers, --connection-limit, --backlog and --channel-timeout must be at least 1")
+    if args.workers > 1 and (args.server != "waitress" or not hasattr(os, "fork")):
+        parser.error("--workers needs --server waitress on a POSIX system")
 
     if args.command == "transcribe":
         _install_transcribe_deps()
         return
 
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    logging.getLogger("waitress").setLevel(logging.WARNING)
+    app.config["USE_X_SENDFILE"] = args.x_sendfile
 
     console = Console()
     host = args.host
     port = args.port
 
+    if args.server == "waitress":
+        try:
+            import waitress  # noqa: F401, just checking availability
+        except ImportError:
+            console.print("  [red]Error:[/red] --server waitress needs waitress: pip install 'sdexe[server]'")
+            sys.exit(1)
+
     # Graceful Ctrl+C
     def _sigint_handler(sig, frame):
         console.print("\n  [dim]Shutting down...[/dim]")
         sys.exit(0)
     signal.signal(signal.SIGINT, _sigint_handler)
+    # A service manager stops us with SIGTERM; exit through atexit too, so
+    # running ffmpeg children are killed rather than orphaned.
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _sigint_handler)
 
     if not args.quiet:
         console.print()
@@ -2760,14 +4458,15 @@ def main():
     if not args.no_browser:
         webbrowser.open(url)
 
-    # Start server
-    if args.no_tray:
-        app.run(host=host, port=port, use_reloader=False)
+    # Start server. Worker processes are forked from the main thread, so
+    # there is no tray with --workers.
+    if args.no_tray or args.workers > 1:
+        _run_server(host, port, args)
     else:
         try:
             import pystray  # noqa: F401, just checking availability
             flask_thread = threading.Thread(
-                target=lambda: app.run(host=host, port=port, use_reloader=False),
+                target=lambda: _run_server(host, port, args),
                 daemon=True,
             )
             flask_thread.start()
@@ -2779,7 +4478,84 @@ def main():
                     console.print("  [yellow]System tray unavailable, running without it.[/yellow]\n")
                 flask_thread.join()
         except ImportError:
-            app.run(host=host, port=port, use_reloader=False)
+            _run_server(host, port, args)
+
+
+def _run_server(host: str, port: int, args):
+    """Serve the app with the server picked by --server."""
+    # Fingerprint and precompress static files now, not on the first page load
+    # (and before any fork, so workers share the result).
+    _static_assets()
+    if args.workers == 1 or args.server == "dev":
+        # Prefork workers start their own on first use; a thread would not survive fork.
+        tools.start_encoder_calibration()
+    if args.server == "dev":
+        app.run(host=host, port=port, use_reloader=False)
+        return
+    from waitress import serve
+
+    options = {"threads": args.threads, "connection_limit": args.connection_limit,
+               "backlog": args.backlog, "channel_timeout": args.channel_timeout,
+               # Lets waitress notice a client hanging up mid-request and
+               # report it through environ["waitress.client_disconnected"].
+               "channel_request_lookahead": 1, "ident": "sdexe"}
+    if args.workers == 1:
+        serve(app, host=host, port=port, **options)
+    else:
+        _serve_prefork(host, port, args.workers, options)
+
+
+def _serve_prefork(host: str, port: int, workers: int, options: dict):
+    """Run waitress in forked workers that accept on one listening socket.
+
+    Job state moves to files under DOWNLOAD_DIR so that a progress stream,
+    file fetch or cancel can land on any worker. A worker that dies is
+    replaced; SIGTERM or Ctrl+C on the parent stops them all.
+    """
+    import signal
+    import sys
+    from waitress import serve
+
+    sock = socket.create_server((host, port), backlog=options["backlog"])
+    share_job_state(DOWNLOAD_DIR / "_jobs")
+
+    def spawn():
+        pid = os.fork()
+        if pid:
+            return pid
+        # Ctrl+C reaches the whole process group; the parent handles it.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        code = 0
+        try:
+            threading.Thread(target=_watch_cancel_requests, daemon=True).start()
+            serve(app, sockets=[sock], **options)
+        except SystemExit:
+            pass
+        except BaseException:
+            logger.exception("worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            # Skip atexit: DOWNLOAD_DIR belongs to the parent.
+            tools.kill_all_children()
+            os._exit(code)
+
+    pids = {spawn() for _ in range(workers)}
+    try:
+        while pids:
+            pid, _ = os.wait()
+            pids.discard(pid)
+            logger.warning("worker %d exited, starting a new one", pid)
+            time.sleep(1)
+            pids.add(spawn())
+    finally:
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+        for pid in pids:
+            with contextlib.suppress(ChildProcessError):
+                os.waitpid(pid, 0)
+        sock.close()
 
 
 if __name__ == "__main__":
@@ -670,12 +670,12 @@ function trackSingleProgress(id, hasMetadata, retries = 0) {
             }
             sendNotification("sdexe", `Downloaded: ${title}`);
             resetBtn(btn, "Download");
-        } else if (d.status === "error") {
+        } else if (d.status === "error" || d.status === "cancelled") {
             source.close();
             fill.classList.add("is-error");
             hideCancelBtn();
             showError(d.error || "Download failed");
-            if (statusEl) statusEl.textContent = "Failed";
+            if (statusEl) statusEl.textContent = d.status === "cancelled" ? "Cancelled" : "Failed";
             if (pctEl) pctEl.textContent = "";
             if (detailEl) detailEl.textContent = "";
             resetBtn(btn, "Download");
@@ -904,7 +904,7 @@ function trackEntryProgress(id, statusEl, retries = 0) {
                 source.close();
                 statusEl.innerHTML = `<a href="/api/file/${encodeURIComponent(id)}" class="entry-save">Save</a>`;
                 resolve(true);
-            } else if (d.status === "error") {
+            } else if (d.status === "error" || d.status === "cancelled") {
                 source.close();
                 // Show the real reason. A bare "Failed" makes a broken playlist
                 // impossible to diagnose.
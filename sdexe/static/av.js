@@ -29,6 +29,20 @@ function clearAvFile(prefix) {
 }
 
 /* ── Generic AV fetch ── */
+// Jobs still running on the server. Leaving the page cancels them so their
+// ffmpeg processes don't keep running for nobody.
+const avJobs = new Set();
+window.addEventListener("pagehide", () => {
+    for (const id of avJobs) navigator.sendBeacon(`/api/av/cancel/${id}`);
+});
+
+// When the user has opted in under Settings (and an output folder is set),
+// results are written there by the server instead of streamed into a blob.
+let avSaveToFolder = false;
+fetch("/api/config").then(r => r.json()).then(cfg => {
+    avSaveToFolder = !!cfg.output_folder && cfg.av_save_to_folder === true;
+}).catch(() => {});
+
 async function avFetch(prefix, endpoint, buildForm, downloadName, loadingText) {
     const f = avFiles[prefix];
     if (!f) return;
@@ -38,14 +52,33 @@ async function avFetch(prefix, endpoint, buildForm, downloadName, loadingText) {
     btn.disabled = true;
     btn.textContent = loadingText || "Processing...";
 
-    const form = buildForm(f);
+    let form = buildForm(f);
 
+    const jobId = crypto.randomUUID ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2);
+    avJobs.add(jobId);
     try {
-        const res = await fetch(endpoint, { method: "POST", body: form });
+        form = await offloadLargeFiles(form, p => { btn.textContent = `Uploading ${Math.round(p * 100)}%`; });
+        btn.textContent = loadingText || "Processing...";
+        if (avSaveToFolder) form.append("save_to", "output_folder");
+        const res = await fetch(endpoint, { method: "POST", body: form, headers: { "X-Job-Id": jobId } });
         if (!res.ok) {
             const data = await res.json();
-            err.textContent = data.error || "Processing failed";
-            err.hidden = false;
+            if (data.cancelled) {
+                showToast("Cancelled", "info");
+            } else {
+                err.textContent = data.error || "Processing failed";
+                err.hidden = false;
+            }
+        } else if ((res.headers.get("content-type") || "").startsWith("application/json")) {
+            const data = await res.json();
+            showToast("Saved: " + data.name, "success", [
+                { label: "Open file", fn: () => fetch("/api/open-file", {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({ path: data.path }),
+                })},
+                { label: "Open folder", fn: () => fetch("/api/open-folder", { method: "POST" }) },
+            ]);
         } else {
             const blob = await res.blob();
             const cd = res.headers.get("content-disposition") || "";
@@ -54,10 +87,12 @@ async function avFetch(prefix, endpoint, buildForm, downloadName, loadingText) {
             downloadBlob(blob, name);
             showToast("Saved: " + name);
         }
-    } catch {
-        err.textContent = "Network error";
+    } catch (e) {
+        // fetch() rejects with a TypeError when the network fails.
+        err.textContent = e instanceof TypeError ? "Network error" : e.message;
         err.hidden = false;
     }
+    avJobs.delete(jobId);
 
     btn.disabled = false;
     btn.innerHTML = `<svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5" stroke-linecap="square"><path d="M12 3v14M5 12l7 7 7-7"/><path d="M5 21h14"/></svg> ${btn.dataset.label || "Download"}`;
@@ -101,6 +136,7 @@ async function doAvTrimAudio() {
             fd.append("file", file);
             fd.append("start", start);
             if (end) fd.append("end", end);
+            fd.append("mode", document.getElementById("av-trim-audio-mode").value);
             return fd;
         },
         file => { const base = file.name.replace(/\.[^.]+$/, ""); const ext = file.name.split(".").pop(); return `${base}_trimmed.${ext}`; },
@@ -162,6 +198,7 @@ async function doAvTrimVideo() {
             fd.append("file", file);
             fd.append("start", start);
             if (end) fd.append("end", end);
+            fd.append("mode", document.getElementById("av-trim-video-mode").value);
             return fd;
         },
         file => { const base = file.name.replace(/\.[^.]+$/, ""); const ext = file.name.split(".").pop(); return `${base}_trimmed.${ext}`; },
@@ -287,8 +324,16 @@ async function doAvVideoToGif() {
     if (!f) return;
     const fps = document.getElementById("av-video-to-gif-fps").value;
     const width = document.getElementById("av-video-to-gif-width").value;
+    const maxKb = document.getElementById("av-video-to-gif-max").value;
+    // A size limit only works with the palette encoder, so it implies it.
+    const mode = maxKb ? "optimized" : document.getElementById("av-video-to-gif-mode").value;
     await avFetch("av-video-to-gif", "/api/av/video-to-gif",
-        file => { const fd = new FormData(); fd.append("file", file); fd.append("fps", fps); fd.append("width", width); return fd; },
+        file => {
+            const fd = new FormData();
+            fd.append("file", file); fd.append("fps", fps); fd.append("width", width);
+            fd.append("mode", mode); fd.append("max_size_kb", maxKb);
+            return fd;
+        },
         file => file.name.replace(/\.[^.]+$/, "") + ".gif",
         "Converting..."
     );
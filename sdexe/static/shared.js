@@ -91,3 +91,104 @@ function _acceptMatches(accept, file) {
         return type === rule;
     });
 }
+
+/* ── Resumable uploads ──
+   Large files go up in checksummed chunks to /api/uploads (tus-style) and
+   come back as an asset id the tool routes accept in place of the file. An
+   interrupted upload resumes from the server's offset, also after a reload. */
+const CHUNKED_UPLOAD_MIN = 64 * 1024 * 1024;
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const UPLOAD_PARALLEL_FILES = 3;
+
+async function _chunkChecksum(blob) {
+    // crypto.subtle only exists in secure contexts (localhost or https).
+    if (!window.crypto || !crypto.subtle) return null;
+    const digest = await crypto.subtle.digest("SHA-256", await blob.arrayBuffer());
+    let bin = "";
+    new Uint8Array(digest).forEach(b => { bin += String.fromCharCode(b); });
+    return "sha256 " + btoa(bin);
+}
+
+async function uploadResumable(file, onProgress) {
+    const key = `sdexe-upload:${file.name}:${file.size}:${file.lastModified}`;
+    let url = localStorage.getItem(key);
+    let offset = -1;
+    if (url) {
+        const head = await fetch(url, { method: "HEAD" });
+        if (head.ok) {
+            const done = head.headers.get("X-Asset-Id");
+            if (done) { localStorage.removeItem(key); return done; }
+            offset = parseInt(head.headers.get("Upload-Offset"), 10);
+        }
+    }
+    if (offset < 0) {
+        const meta = "filename " + btoa(unescape(encodeURIComponent(file.name))) +
+            (file.type ? ",filetype " + btoa(file.type) : "");
+        const res = await fetch("/api/uploads", {
+            method: "POST", headers: { "Upload-Length": String(file.size), "Upload-Metadata": meta },
+        });
+        if (!res.ok) throw new Error((await res.json()).error || "Upload failed");
+        url = res.headers.get("Location");
+        offset = 0;
+        localStorage.setItem(key, url);
+    }
+    let retries = 0;
+    while (true) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        const headers = { "Content-Type": "application/offset+octet-stream", "Upload-Offset": String(offset) };
+        const checksum = await _chunkChecksum(chunk);
+        if (checksum) headers["Upload-Checksum"] = checksum;
+        let res;
+        try {
+            res = await fetch(url, { method: "PATCH", headers, body: chunk });
+        } catch {
+            res = null;
+        }
+        if (res && res.ok) {
+            retries = 0;
+            offset = parseInt(res.headers.get("Upload-Offset"), 10);
+            if (onProgress) onProgress(offset / file.size);
+            const assetId = res.headers.get("X-Asset-Id");
+            if (assetId) { localStorage.removeItem(key); return assetId; }
+            continue;
+        }
+        if (res && ![409, 460].includes(res.status)) throw new Error((await res.json()).error || "Upload failed");
+        if (++retries > 5) throw new Error("Upload interrupted");
+        await new Promise(r => setTimeout(r, 1000 * retries));
+        // Ask the server where to carry on from.
+        const head = await fetch(url, { method: "HEAD" }).catch(() => null);
+        if (head && head.ok) offset = parseInt(head.headers.get("Upload-Offset"), 10);
+    }
+}
+
+/* Swap the large files in a FormData for asset ids ("file" -> asset_id,
+   "files" -> asset_ids, other fields -> <field>_asset_id), uploading up to
+   UPLOAD_PARALLEL_FILES of them at a time. */
+async function offloadLargeFiles(form, onProgress) {
+    const big = [];
+    for (const [field, value] of form.entries()) {
+        if (value instanceof File && value.size >= CHUNKED_UPLOAD_MIN) big.push([field, value]);
+    }
+    if (!big.length) return form;
+    const total = big.reduce((n, [, f]) => n + f.size, 0);
+    const sent = new Map();
+    const report = () => onProgress && onProgress([...sent.values()].reduce((a, b) => a + b, 0) / total);
+    const ids = new Array(big.length);
+    let next = 0;
+    async function worker() {
+        while (next < big.length) {
+            const i = next++;
+            const file = big[i][1];
+            ids[i] = await uploadResumable(file, p => { sent.set(i, p * file.size); report(); });
+        }
+    }
+    await Promise.all(Array.from({ length: Math.min(UPLOAD_PARALLEL_FILES, big.length) }, worker));
+    const out = new FormData();
+    for (const [field, value] of form.entries()) {
+        const i = big.findIndex(([, f]) => f === value);
+        if (i < 0) { out.append(field, value); continue; }
+        const name = field === "file" ? "asset_id" : field === "files" ? "asset_ids" : `${field}_asset_id`;
+        out.append(name, ids[i]);
+    }
+    return out;
+}
@@ -1,17 +1,29 @@
 """Pure tool functions shared between web routes and CLI subcommands."""
 
 import io
+import os
 import re
 import csv
+import copy
+import contextlib
+import contextvars
 import json
+import math
+import hashlib
 import logging
 import shutil
+import signal
 import tempfile
+import threading
 import subprocess
+import sys
+import time
 import zipfile
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, Iterable, Iterator
 
 from pypdf import PdfReader, PdfWriter
 from PIL import Image, ImageFilter, ImageEnhance, ImageDraw, ImageFont
@@ -26,6 +38,399 @@ except ImportError:
 logger = logging.getLogger("sdexe")
 
 
+# ── Job priority ──
+
+# Interactive jobs run children at the server's own priority; background jobs
+# (batches, downloads) get a raised nice value and idle-class disk I/O so a
+# long encode never starves the UI or a single-file tool.
+PRIORITY_CLASSES = ("interactive", "background")
+BACKGROUND_NICE = 10
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_WHO_PROCESS = 1
+# ioprio_set has no libc wrapper; syscall numbers per architecture.
+_IOPRIO_SET_NR = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30,
+                  "riscv64": 30, "armv7l": 314, "ppc64le": 273, "s390x": 282}
+_job_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "sdexe_job_priority", default="interactive")
+_syscall = None
+
+
+def check_priority(priority: str) -> str:
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Priority must be one of: {', '.join(PRIORITY_CLASSES)}")
+    return priority
+
+
+@contextlib.contextmanager
+def job_priority(priority: str):
+    """Run children started in this block (and its worker pools) at priority."""
+    token = _job_priority.set(check_priority(priority))
+    try:
+        yield
+    finally:
+        _job_priority.reset(token)
+
+
+def _libc_syscall():
+    # Resolved in the parent: preexec_fn runs after fork, where loading a
+    # library is unsafe.
+    global _syscall
+    if _syscall is None:
+        _syscall = False
+        nr = _IOPRIO_SET_NR.get(os.uname().machine) if sys.platform.startswith("linux") else None
+        if nr is not None:
+            try:
+                import ctypes
+                fn = ctypes.CDLL(None, use_errno=True).syscall
+                _syscall = lambda tid: fn(nr, _IOPRIO_WHO_PROCESS, tid, _IOPRIO_CLASS_IDLE << 13)
+            except (OSError, AttributeError):
+                pass
+    return _syscall
+
+
+def _lower_priority(tid: int, set_idle_io):
+    try:
+        if os.getpriority(os.PRIO_PROCESS, tid) < BACKGROUND_NICE:
+            os.setpriority(os.PRIO_PROCESS, tid, BACKGROUND_NICE)
+    except OSError:
+        pass
+    if set_idle_io:
+        set_idle_io(tid)
+
+
+def _priority_preexec():
+    """preexec_fn for the current priority class, or None if interactive."""
+    if _job_priority.get() != "background" or os.name != "posix":
+        return None
+    set_idle_io = _libc_syscall()
+    return lambda: _lower_priority(0, set_idle_io)
+
+
+def lower_thread_priority():
+    """Move the calling thread to the background class, for good.
+
+    For in-process work such as yt-dlp or whisper; children the thread starts
+    inherit it. Linux schedules threads individually, so this only touches
+    the caller, which must be a thread the job owns (it cannot be undone
+    without privileges). Elsewhere it does nothing.
+    """
+    if sys.platform.startswith("linux"):
+        _lower_priority(threading.get_native_id(), _libc_syscall())
+
+
+# ── Child process tracking ──
+
+class JobCancelled(RuntimeError):
+    """Raised in a job whose ffmpeg children were killed by cancel_job()."""
+
+
+# The job the current thread is working for. Worker pools started inside a
+# job copy it into their threads (see ContextThreadPool).
+_current_job: contextvars.ContextVar[str | None] = contextvars.ContextVar("sdexe_job", default=None)
+_procs_lock = threading.Lock()
+_job_procs: dict[str | None, set] = {}
+_job_depth: dict[str, int] = {}
+_cancelled_jobs: dict[str, str] = {}
+
+# Resource use per job: live jobs in _job_usage, finished ones in a bounded
+# cache for status lookups, and running totals per job kind for /api/stats.
+_USAGE_FIELDS = ("wall_seconds", "queue_wait_seconds", "thread_cpu_seconds",
+                 "child_cpu_user_seconds", "child_cpu_sys_seconds", "child_peak_rss_kb",
+                 "child_processes", "bytes_in", "bytes_out")
+_job_usage: dict[str, dict] = {}
+_usage_totals: dict[str, dict] = {}
+
+
+def _new_usage(kind: str) -> dict:
+    usage = dict.fromkeys(_USAGE_FIELDS, 0)
+    usage.update(kind=kind, started=time.time())
+    return usage
+
+
+@contextlib.contextmanager
+def job_scope(job_id: str, kind: str = "job"):
+    """Attach every child process started in this block to job_id.
+
+    Scopes for the same id may nest or run on several threads at once; the
+    job ends, and forgets any cancellation, when the last one exits. Its
+    resource use (see job_usage) is then added to the totals for kind, with
+    a cancelled flag and count.
+    """
+    with _procs_lock:
+        _job_depth[job_id] = _job_depth.get(job_id, 0) + 1
+        _job_usage.setdefault(job_id, _new_usage(kind))
+    token = _current_job.set(job_id)
+    thread_cpu = time.thread_time()
+    try:
+        yield job_id
+    finally:
+        _current_job.reset(token)
+        with _procs_lock:
+            _job_usage[job_id]["thread_cpu_seconds"] += time.thread_time() - thread_cpu
+            _job_depth[job_id] -= 1
+            if not _job_depth[job_id]:
+                del _job_depth[job_id]
+                cancelled = _cancelled_jobs.pop(job_id, None) is not None
+                usage = _job_usage.pop(job_id)
+                usage["wall_seconds"] = time.time() - usage["started"]
+                usage["cancelled"] = cancelled
+                _finished_usage.put(job_id, usage)
+                totals = _usage_totals.setdefault(usage["kind"], dict.fromkeys(_USAGE_FIELDS, 0))
+                totals["jobs"] = totals.get("jobs", 0) + 1
+                totals["cancelled"] = totals.get("cancelled", 0) + cancelled
+                for field in _USAGE_FIELDS:
+                    if field == "child_peak_rss_kb":
+                        totals[field] = max(totals[field], usage[field])
+                    else:
+                        totals[field] += usage[field]
+
+
+def record_job_io(job_id: str, bytes_in: int = 0, bytes_out: int = 0,
+                  queue_wait: float = 0.0):
+    """Add transferred bytes and time spent queued to a running job."""
+    with _procs_lock:
+        usage = _job_usage.get(job_id)
+        if usage is not None:
+            usage["bytes_in"] += bytes_in
+            usage["bytes_out"] += bytes_out
+            usage["queue_wait_seconds"] += queue_wait
+
+
+def job_usage(job_id: str) -> dict | None:
+    """Resource use of a running or recently finished job, rounded for display."""
+    with _procs_lock:
+        usage = _job_usage.get(job_id)
+        if usage is not None:
+            usage = dict(usage, wall_seconds=time.time() - usage["started"])
+        else:
+            usage = _finished_usage.get(job_id)
+    if usage is None:
+        return None
+    return {k: round(v, 3) if isinstance(v, float) else v
+            for k, v in usage.items() if k != "started"}
+
+
+def usage_stats() -> dict:
+    """Totals per job kind plus averages, for capacity planning."""
+    with _procs_lock:
+        totals = copy.deepcopy(_usage_totals)
+        running = len(_job_usage)
+    for kind in totals.values():
+        jobs = kind.get("jobs") or 1
+        kind["avg_wall_seconds"] = kind["wall_seconds"] / jobs
+        kind["avg_cpu_seconds"] = (kind["child_cpu_user_seconds"] + kind["child_cpu_sys_seconds"]
+                                   + kind["thread_cpu_seconds"]) / jobs
+        for k, v in kind.items():
+            if isinstance(v, float):
+                kind[k] = round(v, 3)
+    return {"running_jobs": running, "kinds": totals}
+
+
+def _account_child(proc: subprocess.Popen, rusage):
+    """Charge a reaped child's CPU time and peak memory to its job."""
+    rss = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    with _procs_lock:
+        usage = _job_usage.get(getattr(proc, "sdexe_job", None))
+        if usage is not None:
+            usage["child_cpu_user_seconds"] += rusage.ru_utime
+            usage["child_cpu_sys_seconds"] += rusage.ru_stime
+            usage["child_peak_rss_kb"] = max(usage["child_peak_rss_kb"], rss)
+            usage["child_processes"] += 1
+
+
+def _reap(proc: subprocess.Popen, timeout: float | None = None) -> int:
+    """Wait for proc like Popen.wait(), recording its rusage where wait4 exists.
+
+    Popen reaps with waitpid, which discards the child's resource usage, so
+    on POSIX the child is reaped here with os.wait4 and the exit status is
+    handed back to the Popen object.
+    """
+    if not hasattr(os, "wait4"):
+        return proc.wait(timeout)
+    if proc.returncode is not None:
+        return proc.returncode
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        try:
+            pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        except ChildProcessError:
+            return proc.wait()  # already reaped elsewhere (e.g. by poll())
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            _account_child(proc, rusage)
+            return proc.returncode
+        if deadline is not None and time.monotonic() > deadline:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def cancel_job(job_id: str, reason: str = "Cancelled") -> bool:
+    """Kill job_id's running children and refuse to start new ones.
+
+    Returns False when no such job is running.
+    """
+    with _procs_lock:
+        if job_id not in _job_depth and job_id not in _job_procs:
+            return False
+        if job_id in _job_depth:
+            _cancelled_jobs[job_id] = reason
+        procs = list(_job_procs.get(job_id, ()))
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+    return True
+
+
+def job_cancelled(job_id: str | None = None) -> str | None:
+    """Cancellation reason for job_id (default: the current job), or None."""
+    job_id = job_id or _current_job.get()
+    with _procs_lock:
+        return _cancelled_jobs.get(job_id) if job_id else None
+
+
+def kill_all_children():
+    """Kill every tracked child process; used at shutdown."""
+    with _procs_lock:
+        procs = [p for group in _job_procs.values() for p in group]
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+
+
+def _track(proc: subprocess.Popen, job: str | None):
+    proc.sdexe_job = job
+    with _procs_lock:
+        _job_procs.setdefault(job, set()).add(proc)
+        reason = _cancelled_jobs.get(job) if job else None
+    if reason:
+        proc.kill()
+
+
+def _untrack(proc: subprocess.Popen):
+    if getattr(proc, "sdexe_slot", False):
+        proc.sdexe_slot = False
+        _child_slots.release()
+    with _procs_lock:
+        for job, group in list(_job_procs.items()):
+            if proc in group:
+                group.discard(proc)
+                if not group:
+                    _job_procs.pop(job, None)
+
+
+# Upper bound on ffmpeg/ffprobe children running at once, across every
+# request, batch and fan-out, so concurrent jobs can't together swamp the
+# machine. At least two, so one long stream can't stall every other tool.
+FFMPEG_MAX_JOBS = max(2, (os.cpu_count() or 2) // 2)
+_child_slots = threading.BoundedSemaphore(FFMPEG_MAX_JOBS)
+
+
+def _take_child_slot(job: str | None):
+    """Wait for a free child slot, giving up if job is cancelled meanwhile."""
+    waiting_since = time.time()
+    while not _child_slots.acquire(timeout=0.25):
+        reason = job_cancelled(job)
+        if reason:
+            raise JobCancelled(reason)
+    if job:
+        record_job_io(job, queue_wait=time.time() - waiting_since)
+
+
+def _popen_tracked(cmd: list[str], job: str | None = None, **kwargs) -> subprocess.Popen:
+    """Start a child registered to job (default: the current job).
+
+    Waits for one of the FFMPEG_MAX_JOBS slots first; _untrack, which callers
+    must call once the child has exited, gives it back.
+    """
+    job = job or _current_job.get()
+    reason = job_cancelled(job)
+    if reason:
+        raise JobCancelled(reason)
+    kwargs.setdefault("preexec_fn", _priority_preexec())
+    _take_child_slot(job)
+    try:
+        proc = subprocess.Popen(cmd, **kwargs)
+    except BaseException:
+        _child_slots.release()
+        raise
+    proc.sdexe_slot = True
+    _track(proc, job)
+    return proc
+
+
+def _run_tracked(cmd: list[str], timeout: float | None = None,
+                 text: bool = False) -> subprocess.CompletedProcess:
+    """subprocess.run(capture_output=True) whose child cancel_job() can kill.
+
+    Raises JobCancelled rather than returning the killed child's output.
+    """
+    proc = _popen_tracked(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+    output = {}
+
+    def drain(name, pipe):
+        output[name] = pipe.read()
+        pipe.close()
+
+    # Pipes are drained on threads so the child is reaped by _reap (with its
+    # rusage) rather than by communicate().
+    readers = [threading.Thread(target=drain, args=(n, p), daemon=True)
+               for n, p in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for t in readers:
+        t.start()
+    try:
+        try:
+            _reap(proc, timeout)
+        except BaseException:
+            proc.kill()
+            _reap(proc)
+            raise
+        finally:
+            for t in readers:
+                t.join()
+    finally:
+        _untrack(proc)
+    stdout, stderr = output.get("stdout"), output.get("stderr")
+    reason = job_cancelled()
+    if reason:
+        raise JobCancelled(reason)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class ContextThreadPool(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks run in the submitter's context, so the
+    ffmpeg children they start stay attached to the submitting job."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def kill_child_processes(marker: str) -> int:
+    """Kill direct children whose command line contains marker.
+
+    For processes this module did not start, such as the ffmpeg that yt-dlp
+    runs for post-processing. POSIX only; returns the number killed.
+    """
+    if os.name != "posix":
+        return 0
+    try:
+        out = subprocess.run(["ps", "-A", "-o", "pid=,ppid=,command="],
+                             capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    killed = 0
+    for line in out.splitlines():
+        parts = line.split(None, 2)
+        if len(parts) == 3 and parts[1] == str(os.getpid()) and marker in parts[2]:
+            try:
+                os.kill(int(parts[0]), signal.SIGKILL)
+                killed += 1
+            except (OSError, ValueError):
+                pass
+    return killed
+
+
 # ── Dependency resolution ──
 
 _ffmpeg_path_cache = None  # None = unresolved; "" = resolved to nothing
@@ -130,31 +535,316 @@ def ffmpeg_exe_with_filter(name: str) -> str | None:
     return None
 
 
+def ffprobe_path() -> str | None:
+    """Path to ffprobe, or None. Checks PATH, then next to the resolved ffmpeg."""
+    system = shutil.which("ffprobe")
+    if system:
+        return system
+    exe = ffmpeg_path()
+    if exe:
+        sibling = Path(exe).with_name("ffprobe" + Path(exe).suffix)
+        if sibling.is_file():
+            return str(sibling)
+    return None
+
+
 def ffprobe_available() -> bool:
-    return shutil.which("ffprobe") is not None
+    return ffprobe_path() is not None
 
 
-def probe_duration(data: bytes, ext: str) -> float:
-    """Duration of a media blob in seconds, or 0 when it cannot be determined."""
-    exe = _ffmpeg_exe()
+# ── Media probing ──
+
+class _LRUCache:
+    """Small thread-safe LRU map for results keyed by content hash."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def content_hash(data: bytes) -> str:
+    """Stable key for caches of per-file results."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """content_hash() of a file on disk, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Media arguments are bytes, or a path (os.PathLike) to a file already on this
+# machine, which ffmpeg then reads in place rather than from a temp copy.
+MediaInput = bytes | os.PathLike
+
+
+def media_key(data: MediaInput) -> str:
+    """Cache key for media: content_hash() of bytes, or a file's identity and version.
+
+    A local file is keyed by its stat rather than its contents so an in-place
+    input is not read end to end just to look up a cache.
+    """
+    if isinstance(data, os.PathLike):
+        st = os.stat(data)
+        return content_hash(f"{os.fspath(data)}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return content_hash(data)
+
+
+def _media_path(data: MediaInput, dest: str) -> str:
+    """Path ffmpeg should read data from: the file itself, or dest with the bytes written there."""
+    if isinstance(data, os.PathLike):
+        return os.fspath(data)
+    Path(dest).write_bytes(data)
+    return dest
+
+
+_probe_cache = _LRUCache(256)
+_finished_usage = _LRUCache(1024)
+
+
+def _to_float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_int(value, default=None):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_rate(value) -> float | None:
+    """ffprobe frame rates arrive as '30000/1001'."""
+    if not value or value == "0/0":
+        return None
+    num, _, den = str(value).partition("/")
+    rate = _to_float(num)
+    if rate is None:
+        return None
+    if den:
+        d = _to_float(den)
+        if not d:
+            return None
+        rate /= d
+    return round(rate, 3)
+
+
+def _summarize_probe(info: dict) -> dict:
+    """Add top-level convenience fields from the first video and audio stream."""
+    video = next((s for s in info["streams"] if s["type"] == "video"), None)
+    audio = next((s for s in info["streams"] if s["type"] == "audio"), None)
+    info["has_video"] = video is not None
+    info["has_audio"] = audio is not None
+    info["video_codec"] = video["codec"] if video else None
+    info["audio_codec"] = audio["codec"] if audio else None
+    info["width"] = video.get("width") if video else None
+    info["height"] = video.get("height") if video else None
+    info["fps"] = video.get("fps") if video else None
+    info["sample_rate"] = audio.get("sample_rate") if audio else None
+    info["channels"] = audio.get("channels") if audio else None
+    info["audio_profile"] = audio.get("profile") if audio else None
+    info["channel_layout"] = audio.get("channel_layout") if audio else None
+    return info
+
+
+def _probe_with_ffprobe(exe: str, path: str) -> dict | None:
+    r = _run_tracked(
+        [exe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        text=True, timeout=60,
+    )
+    if r.returncode != 0:
+        return None
+    raw = json.loads(r.stdout or "{}")
+    fmt = raw.get("format") or {}
+    streams = []
+    for s in raw.get("streams") or []:
+        kind = s.get("codec_type") or "data"
+        stream = {
+            "index": s.get("index"),
+            "type": kind,
+            "codec": s.get("codec_name"),
+            "bit_rate": _to_int(s.get("bit_rate")),
+        }
+        if kind == "video":
+            stream.update({
+                "width": _to_int(s.get("width")),
+                "height": _to_int(s.get("height")),
+                "fps": _parse_rate(s.get("avg_frame_rate")) or _parse_rate(s.get("r_frame_rate")),
+                "pix_fmt": s.get("pix_fmt"),
+            })
+        elif kind == "audio":
+            stream.update({
+                "sample_rate": _to_int(s.get("sample_rate")),
+                "channels": _to_int(s.get("channels")),
+                "sample_fmt": s.get("sample_fmt"),
+                "profile": s.get("profile"),
+                "channel_layout": s.get("channel_layout"),
+            })
+        streams.append(stream)
+    return {
+        "format": fmt.get("format_name"),
+        "duration": _to_float(fmt.get("duration"), 0.0),
+        "start_time": _to_float(fmt.get("start_time"), 0.0),
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "streams": streams,
+        "source": "ffprobe",
+    }
+
+
+_INPUT_RE = re.compile(r"^Input #0, ([^\s]+), from", re.MULTILINE)
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d\d):(\d\d(?:\.\d+)?)")
+_BITRATE_RE = re.compile(r"Duration:.*?bitrate:\s*(\d+)\s*kb/s")
+_START_RE = re.compile(r"Duration:.*?start:\s*(-?[\d.]+)")
+_STREAM_RE = re.compile(r"^\s*Stream #0:(\d+)[^:]*: (Video|Audio|Subtitle|Data): (.*)$", re.MULTILINE)
+
+
+def _probe_with_ffmpeg(exe: str, path: str) -> dict | None:
+    """Parse the stream layout off `ffmpeg -i` stderr (no ffprobe needed)."""
+    r = _run_tracked([exe, "-hide_banner", "-i", path], text=True, timeout=60)
+    err = r.stderr or ""
+    fmt = _INPUT_RE.search(err)
+    if not fmt:
+        return None
+    duration = 0.0
+    m = _DURATION_RE.search(err)
+    if m:
+        hours, minutes, seconds = m.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    start = _START_RE.search(err)
+    m = _BITRATE_RE.search(err)
+    streams = []
+    for idx, kind, desc in _STREAM_RE.findall(err):
+        kind = kind.lower()
+        codec = desc.split(",", 1)[0].split()[0] if desc.strip() else None
+        br = re.search(r"(\d+) kb/s", desc)
+        stream = {
+            "index": int(idx),
+            "type": kind,
+            "codec": codec,
+            "bit_rate": int(br.group(1)) * 1000 if br else None,
+        }
+        if kind == "video":
+            size = re.search(r",\s*(\d{2,5})x(\d{2,5})", desc)
+            fps = re.search(r"([\d.]+) fps", desc)
+            stream.update({
+                "width": int(size.group(1)) if size else None,
+                "height": int(size.group(2)) if size else None,
+                "fps": float(fps.group(1)) if fps else None,
+                "pix_fmt": None,
+            })
+        elif kind == "audio":
+            rate = re.search(r"(\d+) Hz", desc)
+            layout = re.search(r"Hz,\s*([^,]+)", desc)
+            # "aac (LC) (mp4a / ...)": the first bracket is the profile, or the
+            # decoder name for codecs without profiles, which is then constant.
+            profile = re.match(r"[^\s,]+ \(([^()/]+)\)", desc)
+            channels = name = num = None
+            if layout:
+                name = layout.group(1).strip()
+                named = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "5.0": 5, "5.1": 6, "7.1": 8}
+                num = re.match(r"(\d+) channels", name)
+                channels = named.get(name.split("(")[0]) or (int(num.group(1)) if num else None)
+            stream.update({
+                "sample_rate": int(rate.group(1)) if rate else None,
+                "channels": channels,
+                "sample_fmt": None,
+                "profile": profile.group(1) if profile else None,
+                "channel_layout": None if num or not name else name,
+            })
+        streams.append(stream)
+    return {
+        "format": fmt.group(1).rstrip(","),
+        "duration": duration,
+        "start_time": float(start.group(1)) if start else 0.0,
+        "bit_rate": int(m.group(1)) * 1000 if m else None,
+        "streams": streams,
+        "source": "ffmpeg",
+    }
+
+
+def probe_media_file(path: str, key: str | None = None) -> dict:
+    """Structured stream/format info for a media file.
+
+    Uses ffprobe JSON when available and falls back to parsing `ffmpeg -i`
+    output. Results are cached by content hash; pass `key` when the caller
+    already knows it. Raises ValueError when the file is not readable media.
+    """
+    key = key or file_hash(path)
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+    info = None
+    probe = ffprobe_path()
+    if probe:
+        try:
+            info = _probe_with_ffprobe(probe, path)
+        except JobCancelled:
+            raise
+        except Exception:
+            info = None
+    if info is None:
+        info = _probe_with_ffmpeg(_ffmpeg_exe(), path)
+    if info is None:
+        raise ValueError("That file could not be read. It may be corrupt or an unsupported format.")
+    info["size"] = Path(path).stat().st_size
+    info["hash"] = key
+    _summarize_probe(info)
+    _probe_cache.put(key, info)
+    return copy.deepcopy(info)
+
+
+def probe_media(data: MediaInput, ext: str) -> dict:
+    """probe_media_file() for an in-memory blob or a local file."""
+    key = media_key(data)
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+    if isinstance(data, os.PathLike):
+        return probe_media_file(os.fspath(data), key=key)
     tmp = tempfile.NamedTemporaryFile(suffix=f".{ext.lstrip('.')}", delete=False)
     try:
         tmp.write(data)
         tmp.close()
-        # ffprobe may be absent when only the bundled ffmpeg is available, so
-        # read the duration off ffmpeg's own stderr instead.
-        r = subprocess.run([exe, "-i", tmp.name], capture_output=True, text=True, timeout=60)
-        match = re.search(r"Duration:\s*(\d+):(\d\d):(\d\d(?:\.\d+)?)", r.stderr or "")
-        if not match:
-            return 0.0
-        hours, minutes, seconds = match.groups()
-        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
-    except Exception:
-        return 0.0
+        return probe_media_file(tmp.name, key=key)
     finally:
         Path(tmp.name).unlink(missing_ok=True)
 
 
+def probe_duration(data: MediaInput, ext: str) -> float:
+    """Duration of a media blob in seconds, or 0 when it cannot be determined."""
+    try:
+        return probe_media(data, ext)["duration"] or 0.0
+    except (FFmpegMissingError, JobCancelled):
+        raise
+    except Exception:
+        return 0.0
+
+
 def ffmpeg_version() -> str | None:
     """Short ffmpeg version string for display, or None if unavailable."""
     path = ffmpeg_path()
@@ -868,22 +1558,26 @@ def _friendly_ffmpeg_error(stderr: str) -> str:
     return "The media operation failed. Check that the file is a valid, complete media file."
 
 
-def run_ffmpeg(input_data: bytes, in_suffix: str, out_suffix: str,
+def run_ffmpeg(input_data: MediaInput, in_suffix: str, out_suffix: str,
                ffmpeg_args: list[str], timeout: int = 300,
                pre_input_args: list[str] | None = None) -> bytes:
     """Run ffmpeg with input data, return output bytes."""
     exe = ffmpeg_path()
     if not exe:
         raise FFmpegMissingError("ffmpeg is not installed")
-    with tempfile.NamedTemporaryFile(suffix=in_suffix, delete=False) as inf:
-        inf.write(input_data)
-        inf_path = inf.name
+    local = isinstance(input_data, os.PathLike)
+    if local:
+        inf_path = os.fspath(input_data)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=in_suffix, delete=False) as inf:
+            inf.write(input_data)
+            inf_path = inf.name
     with tempfile.NamedTemporaryFile(suffix=out_suffix, delete=False) as outf:
         out_path = outf.name
     try:
         cmd = [exe, "-y"] + (pre_input_args or []) + ["-i", inf_path] + ffmpeg_args + [out_path]
         try:
-            result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+            result = _run_tracked(cmd, timeout=timeout)
         except FileNotFoundError:
             raise FFmpegMissingError("ffmpeg is not installed")
         if result.returncode != 0:
@@ -894,10 +1588,112 @@ def run_ffmpeg(input_data: bytes, in_suffix: str, out_suffix: str,
             raise RuntimeError(_friendly_ffmpeg_error(stderr))
         return Path(out_path).read_bytes()
     finally:
-        Path(inf_path).unlink(missing_ok=True)
+        if not local:
+            Path(inf_path).unlink(missing_ok=True)
         Path(out_path).unlink(missing_ok=True)
 
 
+# Inputs ffmpeg can demux from a pipe, by extension, and outputs it can mux
+# to one (no seeking back to patch a header), by output format.
+PIPE_INPUT_FORMATS = {"mp3": "mp3", "wav": "wav", "flac": "flac", "ogg": "ogg",
+                      "aac": "aac", "ts": "mpegts", "mkv": "matroska", "mka": "matroska"}
+PIPE_OUTPUT_FORMATS = {"mp3": ["-f", "mp3"], "ogg": ["-f", "ogg"], "flac": ["-f", "flac"],
+                       "wav": ["-f", "wav"], "aac": ["-f", "adts"],
+                       "m4a": ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov"]}
+
+
+def stream_ffmpeg(source: BinaryIO, in_ext: str, out_fmt: str,
+                  ffmpeg_args: list[str], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Run ffmpeg from source to out_fmt, yielding output as it is produced.
+
+    source (e.g. a request body still arriving) is fed to stdin on a thread.
+    Output is spooled to a temp file so ffmpeg never stalls on a consumer
+    that is not reading yet, such as a client still sending its upload.
+    Raises from the first next() if ffmpeg fails before producing output;
+    a later failure ends the stream early. ffmpeg belongs to the job current
+    at the first next(), even when later chunks are pulled outside it.
+    """
+    job = _current_job.get()
+    if in_ext not in PIPE_INPUT_FORMATS or out_fmt not in PIPE_OUTPUT_FORMATS:
+        raise ValueError(f"Cannot stream .{in_ext} to .{out_fmt}")
+    cmd = ([_ffmpeg_exe(), "-v", "error", "-f", PIPE_INPUT_FORMATS[in_ext], "-i", "pipe:0"]
+           + ffmpeg_args + PIPE_OUTPUT_FORMATS[out_fmt] + ["pipe:1"])
+    errlog = tempfile.TemporaryFile()
+    try:
+        proc = _popen_tracked(cmd, job=job, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=errlog)
+    except FileNotFoundError:
+        errlog.close()
+        raise FFmpegMissingError("ffmpeg is not installed")
+    fd, spool_path = tempfile.mkstemp(suffix=f".{out_fmt}")
+    spool_in, spool_out = os.fdopen(fd, "wb"), open(spool_path, "rb")
+    ready = threading.Condition()
+    state = {"written": 0, "done": False}
+
+    def feed():
+        try:
+            while chunk := source.read(chunk_size):
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # ffmpeg stopped reading; its exit status tells why
+        except Exception:
+            logger.info("input stream for %s ended early", cmd[0], exc_info=True)
+            proc.kill()
+        finally:
+            with contextlib.suppress(OSError):
+                proc.stdin.close()
+
+    def drain():
+        try:
+            while chunk := proc.stdout.read1(chunk_size):
+                spool_in.write(chunk)
+                spool_in.flush()
+                with ready:
+                    state["written"] += len(chunk)
+                    ready.notify_all()
+        finally:
+            with ready:
+                state["done"] = True
+                ready.notify_all()
+
+    threading.Thread(target=feed, daemon=True).start()
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    sent = 0
+    try:
+        while True:
+            with ready:
+                while state["written"] == sent and not state["done"]:
+                    ready.wait()
+                available, done = state["written"] - sent, state["done"]
+            if available:
+                data = spool_out.read(available)
+                sent += len(data)
+                yield data
+            elif done:
+                break
+        _reap(proc)
+        reason = job_cancelled(job)
+        if reason:
+            raise JobCancelled(reason)
+        if proc.returncode != 0 or not sent:
+            errlog.seek(0)
+            stderr = errlog.read().decode("utf-8", errors="replace").strip()
+            logger.error("ffmpeg failed: %s | stderr: %s", " ".join(cmd), stderr[-2000:])
+            raise RuntimeError(_friendly_ffmpeg_error(stderr) if stderr else "ffmpeg produced no output")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            _reap(proc)
+        _untrack(proc)
+        drainer.join(10)
+        proc.stdout.close()
+        errlog.close()
+        spool_in.close()
+        spool_out.close()
+        Path(spool_path).unlink(missing_ok=True)
+
+
 # Codec maps for AV operations
 AUDIO_CODEC_MAP = {
     "mp3": ["-codec:a", "libmp3lame", "-q:a", "2"],
@@ -916,14 +1712,31 @@ VIDEO_CODEC_MAP = {
 }
 
 
-def convert_audio(data: bytes, in_ext: str, out_fmt: str) -> bytes:
+def convert_audio(data: MediaInput, in_ext: str, out_fmt: str) -> bytes:
     if out_fmt not in AUDIO_CODEC_MAP:
         raise ValueError(f"Unsupported audio format: {out_fmt}")
     return run_ffmpeg(data, f".{in_ext}", f".{out_fmt}",
                       ["-map", "0:a"] + AUDIO_CODEC_MAP[out_fmt])
 
 
-def trim_audio(data: bytes, ext: str, start: str, end: str = "") -> bytes:
+def trim_audio(data: MediaInput, ext: str, start: str, end: str = "",
+               mode: str = "copy") -> bytes:
+    """Cut audio to [start, end].
+
+    mode "copy" cuts on codec frame boundaries. "smart" decodes and re-encodes
+    the range so the cut is sample accurate. Audio encodes are fast, so there
+    is no partial-GOP split to make as there is for video.
+    """
+    if mode == "smart" and ext in AUDIO_CODEC_MAP:
+        pre = ["-ss", start]
+        args = []
+        if end:
+            duration = parse_timestamp(end) - parse_timestamp(start)
+            if duration <= 0:
+                raise ValueError("End time must be after start time")
+            args += ["-t", f"{duration:.6f}"]
+        args += ["-map", "0:a"] + AUDIO_CODEC_MAP[ext]
+        return run_ffmpeg(data, f".{ext}", f".{ext}", args, pre_input_args=pre)
     args = ["-ss", start]
     if end:
         args += ["-to", end]
@@ -931,7 +1744,7 @@ def trim_audio(data: bytes, ext: str, start: str, end: str = "") -> bytes:
     return run_ffmpeg(data, f".{ext}", f".{ext}", args)
 
 
-def audio_speed(data: bytes, ext: str, speed: float) -> bytes:
+def audio_speed(data: MediaInput, ext: str, speed: float) -> bytes:
     if speed < 0.25 or speed > 4.0:
         raise ValueError("Speed must be between 0.25 and 4.0")
     if 0.5 <= speed <= 2.0:
@@ -945,7 +1758,7 @@ def audio_speed(data: bytes, ext: str, speed: float) -> bytes:
                       ["-map", "0:a", "-filter:a", atempo_chain])
 
 
-def extract_audio(data: bytes, in_ext: str, out_fmt: str) -> bytes:
+def extract_audio(data: MediaInput, in_ext: str, out_fmt: str) -> bytes:
     if out_fmt not in AUDIO_CODEC_MAP:
         raise ValueError(f"Unsupported audio format: {out_fmt}")
     return run_ffmpeg(data, f".{in_ext}", f".{out_fmt}",
@@ -963,7 +1776,25 @@ def parse_timestamp(value: str) -> float:
     return total
 
 
-def trim_video(data: bytes, ext: str, start: str, end: str = "") -> bytes:
+def trim_video(data: MediaInput, ext: str, start: str, end: str = "",
+               mode: str = "copy") -> bytes:
+    """Cut a video to [start, end].
+
+    mode "copy" stream-copies and snaps to keyframes; "smart" is frame
+    accurate at close to copy speed (see smart_trim_file).
+    """
+    if mode == "smart":
+        tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_trim_"))
+        try:
+            in_path = tmpdir / f"input.{ext}"
+            out_path = tmpdir / f"output.{ext}"
+            src = _media_path(data, str(in_path))
+            end_s = parse_timestamp(end) if end else None
+            smart_trim_file(src, str(out_path), parse_timestamp(start), end_s,
+                            key=media_key(data))
+            return out_path.read_bytes()
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
     # A pre-input -ss rebases output timestamps to zero, so -to would be measured
     # from the cut point and produce a clip of length `end` instead of
     # `end - start`. Convert the range to an explicit duration instead.
@@ -978,30 +1809,535 @@ def trim_video(data: bytes, ext: str, start: str, end: str = "") -> bytes:
     return run_ffmpeg(data, f".{ext}", f".{ext}", args, timeout=300, pre_input_args=pre)
 
 
-def compress_video(data: bytes, ext: str, quality: str = "medium") -> bytes:
+def keyframe_times(path: str) -> list[float]:
+    """Presentation times of the video keyframes in a file, in seconds.
+
+    ffprobe reads packet flags without decoding. Without it, ffmpeg decodes
+    only the keyframes (-skip_frame nokey) and showinfo reports their times.
+    """
+    probe = ffprobe_path()
+    if probe:
+        r = _run_tracked(
+            [probe, "-v", "error", "-select_streams", "v:0", "-show_entries",
+             "packet=pts_time,flags", "-of", "csv=p=0", path],
+            text=True, timeout=300,
+        )
+        if r.returncode == 0:
+            times = []
+            for line in r.stdout.splitlines():
+                pts, _, flags = line.partition(",")
+                if "K" in flags and _to_float(pts) is not None:
+                    times.append(float(pts))
+            if times:
+                return sorted(times)
+    r = _run_tracked(
+        [_ffmpeg_exe(), "-hide_banner", "-skip_frame", "nokey", "-i", path,
+         "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"],
+        text=True, timeout=300,
+    )
+    # Not every decoder honours skip_frame (vp9 decodes everything), so keep
+    # only the frames showinfo marks as keyframes.
+    found = re.findall(r"pts_time:\s*([\d.]+).*?iskey:(\d)", r.stderr or "")
+    return sorted(float(t) for t, key in found if key == "1")
+
+
+# Encoders that can re-create a matching bitstream for the re-encoded
+# head and tail of a smart cut, keyed by the source codec name. Repeating
+# the parameter sets in-band lets a re-encoded piece with its own SPS/PPS
+# sit next to stream-copied frames after concatenation.
+_SMART_CUT_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "fast", "-crf", "18",
+             "-x264-params", "repeat-headers=1"],
+    "hevc": ["-c:v", "libx265", "-preset", "fast", "-crf", "20",
+             "-x265-params", "repeat-headers=1"],
+    "vp9": ["-c:v", "libvpx-vp9", "-crf", "24", "-b:v", "0", "-row-mt", "1"],
+    "vp8": ["-c:v", "libvpx", "-crf", "8", "-b:v", "2M"],
+    "mpeg4": ["-c:v", "mpeg4", "-q:v", "2"],
+}
+_SMART_CUT_AUDIO = {"webm": ["-c:a", "libopus"], "avi": ["-c:a", "libmp3lame", "-q:a", "2"]}
+
+
+def smart_trim_file(in_path: str, out_path: str, start: float, end: float | None = None,
+                    timeout: int = 300, key: str | None = None):
+    """Frame-accurate cut that re-encodes only the partial GOPs at each end.
+
+    The video between the first keyframe after `start` and the last keyframe
+    before `end` is stream-copied. The partial GOP before it and the one after
+    it are re-encoded with the source codec, and the pieces are joined with
+    the concat demuxer. Audio is cheap, so it is re-encoded once over the
+    whole range. Falls back to a full re-encode when the range holds no
+    complete GOP or the source codec has no matching encoder.
+    """
+    exe = _ffmpeg_exe()
+    info = probe_media_file(in_path, key=key)
+    duration = info["duration"] or 0.0
+    end = duration if end is None or (duration and end > duration) else end
+    if end is not None and end <= start:
+        raise ValueError("End time must be after start time")
+    length = (end - start) if end else None
+    ext = Path(out_path).suffix.lstrip(".").lower()
+    audio_args = _SMART_CUT_AUDIO.get(ext, ["-c:a", "aac", "-b:a", "192k"])
+    encoder = _SMART_CUT_ENCODERS.get(info["video_codec"] or "")
+    span = ["-t", f"{length:.6f}"] if length else []
+
+    def full_reencode():
+        _ffmpeg_call([exe, "-y", "-ss", f"{start:.6f}", "-i", in_path] + span
+                     + ["-map", "0:v:0?", "-map", "0:a:0?"] + (encoder or [])
+                     + audio_args + [out_path], timeout)
+
+    if not info["has_video"] or not encoder or not length:
+        return full_reencode()
+
+    # A gap shorter than half a frame holds no frame to re-encode.
+    eps = 0.5 / info["fps"] if info["fps"] else 0.001
+    keys = keyframe_times(in_path)
+    inner = [t for t in keys if start - eps <= t <= end + eps]
+    if len(inner) < 2:
+        return full_reencode()
+    k_first, k_last = inner[0], inner[-1]
+
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_smart_"))
+    try:
+        part_ext = "mkv"
+        pix = ["-pix_fmt", "yuv420p"] if info["video_codec"] != "mpeg4" else []
+        parts = []
+        if k_first - start > eps:
+            head = tmpdir / f"head.{part_ext}"
+            _ffmpeg_call([exe, "-y", "-ss", f"{start:.6f}", "-i", in_path,
+                          "-t", f"{k_first - start:.6f}", "-map", "0:v:0", "-an"]
+                         + encoder + pix + [str(head)], timeout)
+            parts.append(head)
+        middle = tmpdir / f"middle.{part_ext}"
+        _ffmpeg_call([exe, "-y", "-ss", f"{k_first:.6f}", "-i", in_path,
+                      "-t", f"{k_last - k_first:.6f}", "-map", "0:v:0", "-an",
+                      "-c:v", "copy", str(middle)], timeout)
+        parts.append(middle)
+        if end - k_last > eps:
+            tail = tmpdir / f"tail.{part_ext}"
+            _ffmpeg_call([exe, "-y", "-ss", f"{k_last:.6f}", "-i", in_path,
+                          "-t", f"{end - k_last:.6f}", "-map", "0:v:0", "-an"]
+                         + encoder + pix + [str(tail)], timeout)
+            parts.append(tail)
+
+        list_path = tmpdir / "list.txt"
+        list_path.write_text("".join(f"file '{p.as_posix()}'\n" for p in parts))
+        _ffmpeg_call([exe, "-y", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                      "-ss", f"{start:.6f}", "-t", f"{length:.6f}", "-i", in_path,
+                      "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy"]
+                     + audio_args + [out_path], timeout)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _ffmpeg_call(cmd: list[str], timeout: int = 300):
+    """Run a prepared ffmpeg command, raising a readable error on failure."""
+    try:
+        result = _run_tracked(cmd, timeout=timeout)
+    except FileNotFoundError:
+        raise FFmpegMissingError("ffmpeg is not installed")
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        logger.error("ffmpeg failed: %s | stderr: %s", " ".join(cmd), stderr[-2000:])
+        raise RuntimeError(_friendly_ffmpeg_error(stderr))
+    return result
+
+
+# Inputs shorter than this encode in a single process. Below it the split,
+# the extra process start-up and the final concat cost more than they save.
+SEGMENT_PARALLEL_MIN_SECONDS = 180
+_SEGMENT_MIN_LENGTH = 10.0
+
+
+def _segment_workers() -> int:
+    """Parallel encodes to run, leaving each enough threads to stay efficient."""
+    cores = os.cpu_count() or 1
+    return max(1, min(cores // 2, 8))
+
+
+# ffmpeg options _split_av_args knows, by where they belong in a segmented
+# encode: the per-chunk video encodes, or the final mux that adds the audio.
+_VIDEO_VALUE_OPTIONS = {"-vcodec", "-c:v", "-codec:v", "-crf", "-preset", "-tune",
+                        "-profile:v", "-level", "-b:v", "-maxrate", "-bufsize", "-g",
+                        "-pix_fmt", "-deadline", "-cpu-used", "-row-mt", "-q:v",
+                        "-qscale:v", "-vf", "-filter:v", "-x264-params"}
+_MUX_VALUE_OPTIONS = {"-acodec", "-c:a", "-codec:a", "-b:a", "-q:a", "-ar", "-ac",
+                      "-af", "-filter:a", "-movflags"}
+_MUX_FLAGS = {"-an", "-sn", "-dn"}
+
+
+def _split_av_args(args: list[str]) -> tuple[list[str], list[str]] | None:
+    """Split a codec argument list into (video, audio/mux) options.
+
+    Returns None when it holds an option not listed above, since its arity
+    and target are unknown; the caller then encodes in one pass.
+    """
+    video, audio = [], []
+    i = 0
+    while i < len(args):
+        opt = args[i]
+        if opt in _MUX_FLAGS:
+            audio.append(opt)
+            i += 1
+        elif (opt in _VIDEO_VALUE_OPTIONS or opt in _MUX_VALUE_OPTIONS) and i + 1 < len(args):
+            (video if opt in _VIDEO_VALUE_OPTIONS else audio).extend(args[i:i + 2])
+            i += 2
+        else:
+            return None
+    return video, audio
+
+
+def _use_segments(duration: float, parallel: bool | None) -> bool:
+    """Whether encode_video splits this much video across several processes."""
+    if parallel is None:
+        return _segment_workers() > 1 and duration >= SEGMENT_PARALLEL_MIN_SECONDS
+    return bool(parallel) and duration > 0
+
+
+def _segment_processes(duration: float) -> int:
+    """How many chunk encodes _encode_segmented runs at once for duration seconds."""
+    workers = max(_segment_workers(), 1)
+    seg_time = max(_SEGMENT_MIN_LENGTH, duration / (workers * 2))
+    return max(1, min(workers, math.ceil(duration / seg_time)))
+
+
+def _encode_segmented(exe: str, in_path: str, out_path: str, video_args: list[str],
+                      audio_args: list[str], duration: float, workers: int,
+                      timeout: int = 300):
+    """Encode video in keyframe-aligned chunks on several ffmpeg processes.
+
+    The segment muxer cuts the video stream at the first keyframe after each
+    boundary without decoding. Chunks are encoded concurrently, then joined
+    with the concat demuxer. Audio is encoded once from the original input so
+    chunk boundaries cannot introduce gaps or priming clicks.
+    """
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_seg_"))
+    try:
+        seg_time = max(_SEGMENT_MIN_LENGTH, duration / (workers * 2))
+        _ffmpeg_call([exe, "-y", "-i", in_path, "-map", "0:v:0", "-c", "copy",
+                      "-f", "segment", "-segment_time", f"{seg_time:.3f}",
+                      "-segment_format", "matroska", "-reset_timestamps", "1",
+                      str(tmpdir / "src_%05d.mkv")], timeout)
+        sources = sorted(tmpdir.glob("src_*.mkv"))
+        if not sources:
+            raise RuntimeError("The video could not be split for parallel encoding.")
+        threads = str(_segment_threads())
+
+        def encode(src: Path) -> Path:
+            dst = src.with_name("enc_" + src.name[4:])
+            _ffmpeg_call([exe, "-y", "-i", str(src), "-an"] + video_args
+                         + ["-threads", threads, str(dst)], timeout)
+            return dst
+
+        with ContextThreadPool(max_workers=workers) as pool:
+            encoded = list(pool.map(encode, sources))
+
+        list_path = tmpdir / "list.txt"
+        list_path.write_text("".join(f"file '{p.as_posix()}'\n" for p in encoded))
+        _ffmpeg_call([exe, "-y", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                      "-i", in_path, "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy"]
+                     + audio_args + [out_path], timeout)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def encode_video(data: MediaInput, in_ext: str, out_fmt: str, codec_args: list[str],
+                 parallel: bool | None = None, timeout: int = 300) -> bytes:
+    """Transcode a video, splitting long inputs across CPU cores.
+
+    parallel=None picks segment-parallel mode for inputs at least
+    SEGMENT_PARALLEL_MIN_SECONDS long on a machine with spare cores;
+    True or False forces the choice.
+    """
+    exe = _ffmpeg_exe()
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_enc_"))
+    try:
+        in_path = str(tmpdir / f"input.{in_ext.lstrip('.')}")
+        out_path = str(tmpdir / f"output.{out_fmt}")
+        in_path = _media_path(data, in_path)
+
+        workers = _segment_workers()
+        duration = 0.0
+        if parallel is not False:
+            try:
+                info = probe_media_file(in_path, key=media_key(data))
+                duration = info["duration"] if info["has_video"] else 0.0
+            except ValueError:
+                duration = 0.0
+        split = _split_av_args(codec_args) if _use_segments(duration, parallel) else None
+        if split:
+            video_args, audio_args = split
+            _encode_segmented(exe, in_path, out_path, video_args, audio_args,
+                              duration, max(workers, 1), timeout)
+        else:
+            _ffmpeg_call([exe, "-y", "-i", in_path] + codec_args + [out_path], timeout)
+        return Path(out_path).read_bytes()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+# Encoder speed presets, fastest first, as (name, ffmpeg args).
+ENCODER_PRESETS = {
+    "libx264": [(p, ["-preset", p]) for p in
+                ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow")],
+    "libvpx-vp9": [("realtime-8", ["-deadline", "realtime", "-cpu-used", "8"]),
+                   ("good-5", ["-deadline", "good", "-cpu-used", "5"]),
+                   ("good-4", ["-deadline", "good", "-cpu-used", "4"]),
+                   ("good-3", ["-deadline", "good", "-cpu-used", "3"]),
+                   ("good-2", ["-deadline", "good", "-cpu-used", "2"])],
+}
+# Used until calibration has measured this machine.
+ENCODER_DEFAULT_PRESETS = {"libx264": "fast"}
+ENCODE_TIME_BUDGET = 300
+_BENCH_FILE = Path.home() / ".config" / "sdexe" / "encoder_bench.json"
+_BENCH_SIZE = (640, 360)
+_BENCH_FRAMES = {"libx264": 48, "libvpx-vp9": 16}
+_bench_lock = threading.Lock()
+_bench_results: dict | None = None
+_bench_thread: threading.Thread | None = None
+_bench_start_lock = threading.Lock()  # never held across an encode, unlike _bench_lock
+
+
+def _preset_args(codec: str, preset: str) -> list[str]:
+    for name, args in ENCODER_PRESETS.get(codec, []):
+        if name == preset:
+            return args
+    raise ValueError(f"Unknown {codec} preset: {preset}")
+
+
+def _segment_threads() -> int:
+    """Threads each chunk encode of _encode_segmented gets."""
+    return max(1, (os.cpu_count() or 1) // _segment_workers())
+
+
+def _bench_machine() -> dict:
+    return {"cpu_count": os.cpu_count(), "ffmpeg": _ffmpeg_exe(),
+            "segment_threads": _segment_threads()}
+
+
+def calibrate_encoders(force: bool = False) -> dict:
+    """Measured encode speed in frames/second for each preset at 640x360.
+
+    Runs a short synthetic encode per preset the first time and stores the
+    result next to the config, keyed by core count and ffmpeg binary so a new
+    machine or ffmpeg build recalibrates. On machines that encode long inputs
+    segment-parallel, each preset is also timed at the per-chunk thread
+    count, under "<codec>@<threads>".
+    """
+    global _bench_results
+    with _bench_lock:
+        exe = _ffmpeg_exe()
+        machine = _bench_machine()
+        if _bench_results is not None and not force:
+            return _bench_results
+        if not force:
+            try:
+                saved = json.loads(_BENCH_FILE.read_text())
+                if saved.get("machine") == machine:
+                    _bench_results = saved["fps"]
+                    return _bench_results
+            except (OSError, ValueError, KeyError):
+                pass
+        w, h = _BENCH_SIZE
+        runs = [("", [])]
+        if _segment_workers() > 1:
+            threads = str(machine["segment_threads"])
+            runs.append(("@" + threads, ["-threads", threads]))
+        results = {}
+        for codec, presets in ENCODER_PRESETS.items():
+            frames = _BENCH_FRAMES[codec]
+            for suffix, thread_args in runs:
+                speeds = results[codec + suffix] = {}
+                for name, args in presets:
+                    cmd = [exe, "-hide_banner", "-benchmark", "-f", "lavfi", "-i",
+                           f"testsrc2=size={w}x{h}:rate=25", "-frames:v", str(frames),
+                           "-c:v", codec] + args + thread_args + ["-f", "null", "-"]
+                    try:
+                        result = _ffmpeg_call(cmd, timeout=120)
+                    except JobCancelled:
+                        raise
+                    except (RuntimeError, subprocess.TimeoutExpired):
+                        continue  # encoder missing from this build
+                    m = re.search(r"rtime=([\d.]+)s", result.stderr.decode("utf-8", "replace"))
+                    if m and float(m.group(1)) > 0:
+                        speeds[name] = round(frames / float(m.group(1)), 2)
+        _bench_results = results
+        try:
+            _BENCH_FILE.parent.mkdir(parents=True, exist_ok=True)
+            _BENCH_FILE.write_text(json.dumps({"machine": machine, "fps": results}, indent=2))
+        except OSError:
+            pass
+        return results
+
+
+def _calibrate_in_background():
+    try:
+        calibrate_encoders()
+    except Exception as e:  # ffmpeg missing or broken; planning keeps its defaults
+        logger.warning("Encoder calibration failed: %s", e)
+
+
+def start_encoder_calibration():
+    """Start calibrate_encoders() on a daemon thread unless it has finished
+    or is running already.
+
+    Returns at once. A saved calibration for this machine is loaded inline,
+    since reading it is cheap.
+    """
+    global _bench_thread, _bench_results
+    with _bench_start_lock:
+        if _bench_results is not None or (_bench_thread and _bench_thread.is_alive()):
+            return
+        try:
+            saved = json.loads(_BENCH_FILE.read_text())
+            if saved.get("machine") == _bench_machine():
+                _bench_results = saved["fps"]
+                return
+        except (OSError, ValueError, KeyError, FFmpegMissingError):
+            pass
+        _bench_thread = threading.Thread(target=_calibrate_in_background,
+                                         name="encoder-calibration", daemon=True)
+        _bench_thread.start()
+
+
+def plan_video_encode(data: MediaInput, ext: str, codec: str,
+                      budget: float = ENCODE_TIME_BUDGET,
+                      parallel: bool | None = None) -> dict | None:
+    """Slowest preset of codec expected to finish within budget seconds.
+
+    The estimate scales the calibrated 640x360 speed by the input's pixel
+    count and multiplies out its frame count. When encode_video will run
+    segment-parallel, it uses the speed measured at the per-chunk thread
+    count, times the number of chunks encoded at once; a 20% margin absorbs
+    decode and audio work. When nothing fits, the fastest preset is chosen.
+    Returns {"codec", "preset", "estimated_seconds", "budget", "timeout"}, or
+    None for codecs without speed presets.
+
+    Never waits for calibration: until it has finished, the plan uses
+    ENCODER_DEFAULT_PRESETS with no estimate and a timeout sized from the
+    input's duration.
+    """
+    if codec not in ENCODER_PRESETS:
+        return None
+    start_encoder_calibration()
+    info = probe_media(data, ext)
+    duration = info["duration"] or 0.0
+    if _bench_results is None:
+        return {"codec": codec, "preset": ENCODER_DEFAULT_PRESETS.get(codec),
+                "estimated_seconds": None, "budget": budget,
+                "timeout": max(300, int(max(budget, duration) * 2) + 60)}
+    width, height = info["width"] or 1280, info["height"] or 720
+    frames = duration * (info["fps"] or 25.0)
+    scale = (_BENCH_SIZE[0] * _BENCH_SIZE[1]) / (width * height)
+    speeds = _bench_results.get(codec)
+    if info["has_video"] and _use_segments(duration, parallel) and _segment_workers() > 1:
+        speeds = _bench_results.get(f"{codec}@{_segment_threads()}")
+        frames /= _segment_processes(duration)
+    if not speeds:
+        return None
+    estimates = [(name, frames / (speeds[name] * scale))
+                 for name, _ in ENCODER_PRESETS[codec] if name in speeds]
+    chosen = estimates[0]
+    for name, est in estimates:
+        if est <= budget * 0.8:
+            chosen = (name, est)
+    est = round(chosen[1], 1)
+    return {"codec": codec, "preset": chosen[0], "estimated_seconds": est, "budget": budget,
+            "timeout": max(300, int(est * 2) + 60)}
+
+
+def compress_video(data: MediaInput, ext: str, quality: str = "medium",
+                   parallel: bool | None = None, preset: str = "fast",
+                   timeout: int = 300) -> bytes:
     crf_map = {"high": "18", "medium": "23", "low": "28"}
     crf = crf_map.get(quality, "23")
-    return run_ffmpeg(data, f".{ext}", ".mp4",
-                      ["-vcodec", "libx264", "-crf", crf, "-preset", "fast", "-acodec", "aac"],
-                      timeout=300)
+    return encode_video(data, ext, "mp4",
+                        ["-vcodec", "libx264", "-crf", crf] + _preset_args("libx264", preset)
+                        + ["-acodec", "aac"],
+                        parallel=parallel, timeout=timeout)
 
 
-def convert_video(data: bytes, in_ext: str, out_fmt: str) -> bytes:
+def convert_video(data: MediaInput, in_ext: str, out_fmt: str,
+                  parallel: bool | None = None, preset: str | None = None,
+                  timeout: int = 300) -> bytes:
     if out_fmt not in VIDEO_CODEC_MAP:
         raise ValueError(f"Unsupported video format: {out_fmt}")
-    return run_ffmpeg(data, f".{in_ext}", f".{out_fmt}",
-                      VIDEO_CODEC_MAP[out_fmt], timeout=300)
+    args = VIDEO_CODEC_MAP[out_fmt]
+    if preset:
+        args = args[:2] + _preset_args(args[1], preset) + args[2:]
+    return encode_video(data, in_ext, out_fmt, args, parallel=parallel, timeout=timeout)
 
 
 # ── Archive Tools ──
 
 def create_zip(files: list[tuple[str, bytes]]) -> bytes:
     """Create a ZIP from list of (filename, data) tuples."""
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for name, data in files:
-            zf.writestr(name, data)
-    return buf.getvalue()
+    return b"".join(iter_zip(files))
+
+
+class _ZipSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+# Members that are already compressed are stored: deflating video, audio,
+# images or other archives burns CPU to save next to nothing.
+ZIP_STORED_EXTS = frozenset({
+    "mp4", "m4v", "mov", "mkv", "webm", "avi", "mp3", "m4a", "aac", "ogg", "opus",
+    "flac", "jpg", "jpeg", "png", "gif", "webp", "avif", "heic", "ico",
+    "zip", "gz", "tgz", "bz2", "xz", "7z", "rar", "docx", "xlsx", "pptx", "epub",
+})
+
+
+def _zip_member(arcname: str, size: int, mtime: float | None = None) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(arcname, time.localtime(mtime)[:6])
+    info.compress_type = (zipfile.ZIP_STORED if arcname.rpartition(".")[2].lower() in ZIP_STORED_EXTS
+                          else zipfile.ZIP_DEFLATED)
+    info.external_attr = 0o644 << 16
+    # Known up front, so members past 4 GiB get ZIP64 headers.
+    info.file_size = size
+    return info
+
+
+def iter_zip(entries: Iterable[tuple[str, str | bytes]], chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """Yield a ZIP archive of (arcname, path or bytes) entries as it is written.
+
+    Entries are pulled lazily, so callers can feed files in as they become
+    available and the client starts receiving data before the last one exists.
+    Only one chunk of a file on disk is held at a time. Compressed media is
+    stored rather than deflated, and ZIP64 records are used where needed.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for arcname, source in entries:
+            if isinstance(source, (bytes, bytearray)):
+                src, info = io.BytesIO(source), _zip_member(arcname, len(source))
+            else:
+                src = open(source, "rb")
+                st = os.fstat(src.fileno())
+                info = _zip_member(arcname, st.st_size, st.st_mtime)
+            with src, zf.open(info, "w") as dst:
+                while chunk := src.read(chunk_size):
+                    dst.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            if data := sink.drain():
+                yield data
+    if data := sink.drain():
+        yield data
 
 
 def extract_zip(data: bytes) -> list[tuple[str, bytes]]:
@@ -1089,7 +2425,7 @@ def number_pdf_pages(stream: BinaryIO, start: int = 1,
 # ── Additional AV Tools ──
 
 def merge_audio_files(files_data: list[tuple[str, bytes]], out_fmt: str = "mp3") -> bytes:
-    """Merge multiple audio files into one using ffmpeg concat filter."""
+    """Merge multiple audio files into one. See merge_audio_paths."""
     if out_fmt not in AUDIO_CODEC_MAP:
         raise ValueError(f"Unsupported audio format: {out_fmt}")
 
@@ -1102,46 +2438,606 @@ def merge_audio_files(files_data: list[tuple[str, bytes]], out_fmt: str = "mp3")
             input_paths.append(str(path))
 
         out_path = str(Path(tmpdir) / f"output.{out_fmt}")
+        merge_audio_paths(input_paths, out_path, out_fmt)
+        return Path(out_path).read_bytes()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
-        cmd = [_ffmpeg_exe(), "-y"]
-        for p in input_paths:
-            cmd += ["-i", p]
 
-        n = len(input_paths)
-        filter_str = "".join(f"[{i}:a]" for i in range(n)) + f"concat=n={n}:v=0:a=1[out]"
-        cmd += ["-filter_complex", filter_str, "-map", "[out]"]
-        cmd += AUDIO_CODEC_MAP[out_fmt] + [out_path]
+# Codec each output format is written with, and the ones whose packets can be
+# joined by the concat demuxer without re-encoding. Vorbis and Opus carry
+# per-file setup headers, so they always take the filter path.
+_AUDIO_FMT_CODEC = {"mp3": "mp3", "wav": "pcm_s16le", "ogg": "vorbis",
+                    "flac": "flac", "aac": "aac", "m4a": "aac"}
+_CONCAT_COPY_CODECS = {"mp3", "pcm_s16le", "flac", "aac"}
+
+
+def _merge_audio_reencode(exe: str, input_paths: list[str], out_path: str, out_fmt: str):
+    """Decode every input and join them with the concat filter."""
+    cmd = [exe, "-y"]
+    for p in input_paths:
+        cmd += ["-i", p]
+    n = len(input_paths)
+    filter_str = "".join(f"[{i}:a]" for i in range(n)) + f"concat=n={n}:v=0:a=1[out]"
+    cmd += ["-filter_complex", filter_str, "-map", "[out]"]
+    cmd += AUDIO_CODEC_MAP[out_fmt] + [out_path]
+    _ffmpeg_call(cmd, timeout=300)
+
+
+def _audio_join_params(info: dict) -> tuple:
+    """Stream properties that must agree for audio packets to be joined as-is."""
+    return (info["audio_codec"], info["audio_profile"], info["sample_rate"],
+            info["channels"], info["channel_layout"])
+
+
+def merge_audio_paths(input_paths: list[str], out_path: str, out_fmt: str = "mp3"):
+    """Join audio files on disk into out_path.
+
+    Inputs are probed first. Those already in the output codec with the most
+    common profile, sample rate and channel layout are stream-copied through
+    the concat demuxer; only the others are re-encoded to match. When no input
+    can be copied, a re-encoded part still differs (a profile our encoder does
+    not produce), or the output codec cannot be joined packet-wise, every
+    input is decoded and joined with the concat filter instead.
+    """
+    if out_fmt not in AUDIO_CODEC_MAP:
+        raise ValueError(f"Unsupported audio format: {out_fmt}")
+    if len(input_paths) < 2:
+        raise ValueError("Need at least 2 audio files")
+    exe = _ffmpeg_exe()
+    target = _AUDIO_FMT_CODEC[out_fmt]
+    if target not in _CONCAT_COPY_CODECS:
+        return _merge_audio_reencode(exe, input_paths, out_path, out_fmt)
+
+    params = []
+    for p in input_paths:
+        try:
+            info = probe_media_file(p)
+        except ValueError:
+            raise ValueError(f"Could not read {Path(p).name} as audio")
+        if not info["has_audio"]:
+            raise ValueError(f"{Path(p).name} has no audio stream")
+        params.append(_audio_join_params(info))
+
+    matching = [prm for prm in params if prm[0] == target]
+    if not matching:
+        return _merge_audio_reencode(exe, input_paths, out_path, out_fmt)
+    reference = max(set(matching), key=matching.count)
+    _, _, rate, channels, layout = reference
+    layout_args = (["-af", f"aformat=channel_layouts={layout}"] if layout
+                   else ["-ac", str(channels)])
+
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_merge_"))
+    try:
+        parts = []
+        for i, (p, prm) in enumerate(zip(input_paths, params)):
+            if prm == reference:
+                parts.append(Path(p).resolve())
+                continue
+            fixed = tmpdir / f"norm_{i}.{out_fmt}"
+            _ffmpeg_call([exe, "-y", "-i", p, "-map", "0:a:0", "-ar", str(rate)] + layout_args
+                         + AUDIO_CODEC_MAP[out_fmt] + [str(fixed)])
+            if _audio_join_params(probe_media_file(str(fixed))) != reference:
+                return _merge_audio_reencode(exe, input_paths, out_path, out_fmt)
+            parts.append(fixed)
+        list_path = tmpdir / "list.txt"
+        list_path.write_text("".join(
+            "file '" + part.as_posix().replace("'", "'\\''") + "'\n" for part in parts
+        ))
+        try:
+            _ffmpeg_call([exe, "-y", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                          "-map", "0:a:0", "-c", "copy", out_path])
+        except JobCancelled:
+            raise
+        except RuntimeError:
+            logger.warning("concat copy merge failed, re-encoding all inputs")
+            _merge_audio_reencode(exe, input_paths, out_path, out_fmt)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
-        result = subprocess.run(cmd, capture_output=True, timeout=300)
-        if result.returncode != 0:
-            raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
 
+# First-pass loudnorm measurements keyed by content hash. The input_* values
+# describe the source alone, so one measurement serves every later target.
+_loudness_cache = _LRUCache(512)
+_LOUDNORM_JSON_RE = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}", re.S)
+
+
+def measure_loudness_file(path: str, key: str | None = None) -> dict:
+    """EBU R128 measurements of a file's first audio stream (loudnorm pass 1).
+
+    Returns input_i, input_tp, input_lra, input_thresh and target_offset as
+    floats plus duration and sample_rate. Results are cached by content hash.
+    """
+    key = key or file_hash(path)
+    cached = _loudness_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+    result = _ffmpeg_call([_ffmpeg_exe(), "-hide_banner", "-nostats", "-i", path,
+                           "-map", "0:a:0", "-af", "loudnorm=print_format=json",
+                           "-f", "null", "-"], timeout=600)
+    stderr = result.stderr.decode("utf-8", errors="replace")
+    m = _LOUDNORM_JSON_RE.search(stderr)
+    if not m:
+        raise RuntimeError("Could not measure loudness")
+    raw = json.loads(m.group(0))
+    measured = {k: float(raw[k]) for k in
+                ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")}
+    info = probe_media_file(path, key=key)
+    measured["duration"] = info["duration"] or 0.0
+    measured["sample_rate"] = info["sample_rate"]
+    _loudness_cache.put(key, measured)
+    return dict(measured)
+
+
+def _loudness_filter(measured: dict, target: float, true_peak: float, lra: float) -> str:
+    """Second-pass filter for a file measured by measure_loudness_file.
+
+    A plain volume change reaches the target exactly when it leaves headroom
+    under the true-peak ceiling. Otherwise linear loudnorm is fed the stored
+    measurements so it can limit peaks without measuring again.
+    """
+    if measured["input_i"] == float("-inf"):
+        return "anull"  # digital silence has no loudness to correct
+    gain = target - measured["input_i"]
+    if measured["input_tp"] + gain <= true_peak:
+        return f"volume={gain:.2f}dB"
+    return (f"loudnorm=I={target}:TP={true_peak}:LRA={lra}"
+            f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+            f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+            f":offset={measured['target_offset']}:linear=true")
+
+
+def _apply_loudness(in_path: str, out_path: str, audio_filter: str, sample_rate: int | None):
+    cmd = [_ffmpeg_exe(), "-y", "-i", in_path, "-map", "0:a", "-af", audio_filter]
+    if sample_rate:
+        # loudnorm resamples to 192 kHz internally; keep the source rate.
+        cmd += ["-ar", str(sample_rate)]
+    _ffmpeg_call(cmd + [out_path], timeout=600)
+
+
+def normalize_volume(data: MediaInput, ext: str, mode: str = "single", target: float = -16.0,
+                     true_peak: float = -1.5, lra: float = 11.0) -> bytes:
+    """Normalize audio volume with ffmpeg loudnorm.
+
+    mode "single" runs dynamic loudnorm in one pass. "two-pass" measures first
+    (or reuses a cached measurement of the same content) and then applies a
+    linear correction, which is both more accurate and cheaper to repeat.
+    """
+    if mode == "single":
+        return run_ffmpeg(data, f".{ext}", f".{ext}",
+                          ["-af", f"loudnorm=I={target}:TP={true_peak}:LRA={lra}", "-map", "0:a"])
+    if mode != "two-pass":
+        raise ValueError(f"Unknown normalize mode: {mode}")
+    tmpdir = tempfile.mkdtemp(prefix="sdexe_loud_")
+    try:
+        in_path = str(Path(tmpdir) / f"input.{ext}")
+        out_path = str(Path(tmpdir) / f"output.{ext}")
+        in_path = _media_path(data, in_path)
+        measured = measure_loudness_file(in_path, key=media_key(data))
+        _apply_loudness(in_path, out_path, _loudness_filter(measured, target, true_peak, lra),
+                        measured["sample_rate"])
         return Path(out_path).read_bytes()
     finally:
-        import shutil
         shutil.rmtree(tmpdir, ignore_errors=True)
 
 
-def normalize_volume(data: bytes, ext: str) -> bytes:
-    """Normalize audio volume using ffmpeg loudnorm filter."""
-    return run_ffmpeg(data, f".{ext}", f".{ext}",
-                      ["-af", "loudnorm=I=-16:TP=-1.5:LRA=11", "-map", "0:a"])
+def normalize_album_paths(in_paths: list[str], out_paths: list[str], target: float = -16.0,
+                          true_peak: float = -1.5) -> dict:
+    """Apply one shared gain to a set of tracks so their relative levels survive.
 
+    The album loudness is the duration-weighted energy mean of the tracks'
+    integrated loudness. The gain is capped so the loudest true peak stays
+    under true_peak. Returns {"album_i", "gain", "tracks": [measurements]}.
+    """
+    if not in_paths:
+        raise ValueError("No audio files provided")
+    with ContextThreadPool(max_workers=_segment_workers()) as pool:
+        tracks = list(pool.map(measure_loudness_file, in_paths))
+    audible = [t for t in tracks if t["input_i"] != float("-inf")]
+    if not audible:
+        raise ValueError("All tracks are silent")
+    weights = [max(t["duration"], 0.001) for t in audible]
+    energy = sum(w * 10 ** (t["input_i"] / 10) for w, t in zip(weights, audible))
+    album_i = 10 * math.log10(energy / sum(weights))
+    gain = min(target - album_i, true_peak - max(t["input_tp"] for t in audible))
+
+    def apply(args):
+        src, dst, measured = args
+        _apply_loudness(src, dst, f"volume={gain:.2f}dB", measured["sample_rate"])
+
+    with ContextThreadPool(max_workers=_segment_workers()) as pool:
+        list(pool.map(apply, zip(in_paths, out_paths, tracks)))
+    return {"album_i": round(album_i, 2), "gain": round(gain, 2), "tracks": tracks}
+
+
+# Waveform peaks are computed from mono PCM at this rate: plenty for a
+# drawn envelope and 1/5 of the data of a 44.1 kHz stereo decode.
+WAVEFORM_SAMPLE_RATE = 8000
+# Samples per min/max pair at each zoom level, finest first (32 ms to 2 s).
+WAVEFORM_LEVELS = (256, 1024, 4096, 16384)
+_waveform_cache = _LRUCache(64)
+
+
+def _peaks_numpy(np, buf: bytes, spp: int) -> tuple[list, list]:
+    a = np.frombuffer(buf, dtype="<i2")
+    blocks = a[: len(a) // spp * spp].reshape(-1, spp)
+    mins, maxs = blocks.min(axis=1), blocks.max(axis=1)
+    if len(a) % spp:
+        tail = a[len(a) // spp * spp:]
+        mins, maxs = np.append(mins, tail.min()), np.append(maxs, tail.max())
+    return (mins >> 8).astype(np.int8).tolist(), (maxs >> 8).astype(np.int8).tolist()
+
+
+def _peaks_python(buf: bytes, spp: int) -> tuple[list, list]:
+    import array
+    a = array.array("h")
+    a.frombytes(buf)
+    if sys.byteorder == "big":
+        a.byteswap()
+    mins = [min(a[i:i + spp]) >> 8 for i in range(0, len(a), spp)]
+    maxs = [max(a[i:i + spp]) >> 8 for i in range(0, len(a), spp)]
+    return mins, maxs
+
+
+def waveform_peaks_file(path: str, key: str | None = None) -> dict:
+    """Min/max peak pairs of a file's audio at each of WAVEFORM_LEVELS.
+
+    ffmpeg decodes to mono s16le on a pipe; the PCM is reduced chunk by chunk
+    so memory stays flat however long the input is, and the coarser levels are
+    folded from the finest one. Peaks are signed 8-bit values. NumPy does the
+    reduction when installed, with a slower pure-Python fallback.
+    Returns {"duration", "sample_rate", "levels": [{"samples_per_peak",
+    "seconds_per_peak", "min", "max"}]}, cached by content hash.
+    """
+    key = key or file_hash(path)
+    cached = _waveform_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    spp = WAVEFORM_LEVELS[0]
+    cmd = [_ffmpeg_exe(), "-v", "error", "-i", path, "-map", "0:a:0",
+           "-ac", "1", "-ar", str(WAVEFORM_SAMPLE_RATE), "-f", "s16le", "pipe:1"]
+    # stderr goes to a file: a damaged input can log per frame, and a full
+    # stderr pipe would stall ffmpeg while we block reading stdout.
+    errlog = tempfile.TemporaryFile()
+    try:
+        proc = _popen_tracked(cmd, stdout=subprocess.PIPE, stderr=errlog)
+    except FileNotFoundError:
+        errlog.close()
+        raise FFmpegMissingError("ffmpeg is not installed")
+    mins, maxs, samples = [], [], 0
+    chunk_bytes = spp * 2 * 512
+    pending = b""
+    try:
+        while True:
+            data = proc.stdout.read(chunk_bytes)
+            if not data:
+                break
+            pending += data
+            whole = len(pending) // (spp * 2) * (spp * 2)
+            if whole:
+                lo, hi = (_peaks_numpy(np, pending[:whole], spp) if np is not None
+                          else _peaks_python(pending[:whole], spp))
+                mins += lo
+                maxs += hi
+                samples += whole // 2
+                pending = pending[whole:]
+        if len(pending) >= 2:
+            pending = pending[: len(pending) // 2 * 2]
+            lo, hi = (_peaks_numpy(np, pending, spp) if np is not None
+                      else _peaks_python(pending, spp))
+            mins += lo
+            maxs += hi
+            samples += len(pending) // 2
+        _reap(proc, timeout=60)
+        errlog.seek(0)
+        stderr = errlog.read().decode("utf-8", errors="replace").strip()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            _reap(proc)
+        _untrack(proc)
+        proc.stdout.close()
+        errlog.close()
+    reason = job_cancelled()
+    if reason:
+        raise JobCancelled(reason)
+    if proc.returncode != 0 or not samples:
+        logger.error("waveform decode failed: %s | stderr: %s", " ".join(cmd), stderr[-2000:])
+        raise ValueError(_friendly_ffmpeg_error(stderr) if stderr else "File has no audio")
+
+    levels = []
+    for level_spp in WAVEFORM_LEVELS:
+        factor = level_spp // spp
+        lo = [min(mins[i:i + factor]) for i in range(0, len(mins), factor)]
+        hi = [max(maxs[i:i + factor]) for i in range(0, len(maxs), factor)]
+        levels.append({"samples_per_peak": level_spp,
+                       "seconds_per_peak": level_spp / WAVEFORM_SAMPLE_RATE,
+                       "min": lo, "max": hi})
+    result = {"duration": round(samples / WAVEFORM_SAMPLE_RATE, 3),
+              "sample_rate": WAVEFORM_SAMPLE_RATE, "levels": levels}
+    _waveform_cache.put(key, result)
+    return copy.deepcopy(result)
+
+
+def waveform_peaks(data: MediaInput, ext: str) -> dict:
+    """waveform_peaks_file() for an in-memory blob or a local file."""
+    key = media_key(data)
+    cached = _waveform_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+    if isinstance(data, os.PathLike):
+        return waveform_peaks_file(os.fspath(data), key=key)
+    tmp = tempfile.NamedTemporaryFile(suffix=f".{ext.lstrip('.')}", delete=False)
+    try:
+        tmp.write(data)
+        tmp.close()
+        return waveform_peaks_file(tmp.name, key=key)
+    finally:
+        Path(tmp.name).unlink(missing_ok=True)
+
+
+# Sprite sheets keyed by "<content hash prefix>-<count>-<width>", so the
+# sheet a VTT file points at can be served by id after the upload is gone.
+_thumb_cache = _LRUCache(32)
+THUMB_MAX_COUNT = 200
+_THUMB_COLUMNS = 10
+
+
+def _keyframe_thumb(exe: str, path: str, at: float, width: int) -> Image.Image | None:
+    """Decode the keyframe at or before `at` only, scaled to width."""
+    cmd = [exe, "-v", "error", "-noaccurate_seek", "-ss", f"{at:.3f}",
+           "-skip_frame", "nokey", "-i", path, "-map", "0:v:0", "-frames:v", "1",
+           "-vf", f"scale={width}:-2", "-f", "image2pipe", "-c:v", "png", "pipe:1"]
+    try:
+        result = _run_tracked(cmd, timeout=60)
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return Image.open(io.BytesIO(result.stdout)).convert("RGB")
+
+
+def _vtt_time(t: float) -> str:
+    ms = int(round(t * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def thumbnail_sheet_file(path: str, count: int = 20, width: int = 160,
+                         key: str | None = None) -> dict:
+    """Sprite sheet of `count` evenly spaced keyframe thumbnails.
+
+    Each thumbnail is one ffmpeg run that seeks the input and decodes a single
+    keyframe, so cost depends on count rather than on the video's length. The
+    runs go in parallel. Returns {"id", "count", "columns", "rows",
+    "tile_width", "tile_height", "times", "cues"}; the JPEG is fetched with
+    thumbnail_sprite(id).
+    """
+    if not 1 <= count <= THUMB_MAX_COUNT:
+        raise ValueError(f"Thumbnail count must be 1-{THUMB_MAX_COUNT}")
+    if not 32 <= width <= 640:
+        raise ValueError("Thumbnail width must be 32-640")
+    key = key or file_hash(path)
+    sheet_id = f"{key[:16]}-{count}-{width}"
+    cached = _thumb_cache.get(sheet_id)
+    if cached is not None:
+        return copy.deepcopy(cached["info"])
+    info = probe_media_file(path, key=key)
+    if not info["has_video"]:
+        raise ValueError("File has no video stream")
+    duration = info["duration"] or 0.0
+    span = duration / count if duration else 0.0
+    times = [round(span * (i + 0.5), 3) for i in range(count)]
+
+    exe = _ffmpeg_exe()
+    workers = min(count, max(2, os.cpu_count() or 1), 8)
+    with ContextThreadPool(max_workers=workers) as pool:
+        thumbs = list(pool.map(lambda t: _keyframe_thumb(exe, path, t, width), times))
+    first = next((t for t in thumbs if t is not None), None)
+    if first is None:
+        raise ValueError("Could not decode any frames from this video")
+    tile_w, tile_h = first.size
+    columns = min(count, _THUMB_COLUMNS)
+    rows = -(-count // columns)
+    sheet = Image.new("RGB", (columns * tile_w, rows * tile_h))
+    cues = []
+    for i, thumb in enumerate(thumbs):
+        x, y = i % columns * tile_w, i // columns * tile_h
+        if thumb is not None:
+            if thumb.size != (tile_w, tile_h):
+                thumb = thumb.resize((tile_w, tile_h), Image.LANCZOS)
+            sheet.paste(thumb, (x, y))
+        cues.append({"start": round(span * i, 3), "end": round(span * (i + 1), 3),
+                     "x": x, "y": y, "w": tile_w, "h": tile_h})
+    buf = io.BytesIO()
+    sheet.save(buf, "JPEG", quality=80)
+    result = {"id": sheet_id, "count": count, "columns": columns, "rows": rows,
+              "tile_width": tile_w, "tile_height": tile_h, "times": times, "cues": cues}
+    _thumb_cache.put(sheet_id, {"info": result, "sprite": buf.getvalue()})
+    return copy.deepcopy(result)
+
+
+def thumbnail_sheet(data: MediaInput, ext: str, count: int = 20, width: int = 160) -> dict:
+    """thumbnail_sheet_file() for an in-memory blob or a local file."""
+    key = media_key(data)
+    cached = _thumb_cache.get(f"{key[:16]}-{count}-{width}")
+    if cached is not None:
+        return copy.deepcopy(cached["info"])
+    if isinstance(data, os.PathLike):
+        return thumbnail_sheet_file(os.fspath(data), count, width, key=key)
+    tmp = tempfile.NamedTemporaryFile(suffix=f".{ext.lstrip('.')}", delete=False)
+    try:
+        tmp.write(data)
+        tmp.close()
+        return thumbnail_sheet_file(tmp.name, count, width, key=key)
+    finally:
+        Path(tmp.name).unlink(missing_ok=True)
+
+
+def thumbnail_sprite(sheet_id: str) -> bytes | None:
+    """JPEG sprite of a cached sheet, or None once it has been evicted."""
+    cached = _thumb_cache.get(sheet_id)
+    return cached["sprite"] if cached is not None else None
+
+
+def thumbnails_vtt(sheet: dict, sprite_url: str) -> str:
+    """WebVTT thumbnail track pointing each cue at its tile in the sprite."""
+    lines = ["WEBVTT", ""]
+    for cue in sheet["cues"]:
+        lines.append(f"{_vtt_time(cue['start'])} --> {_vtt_time(cue['end'])}")
+        lines.append(f"{sprite_url}#xywh={cue['x']},{cue['y']},{cue['w']},{cue['h']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+# Browser preview proxies: small enough to encode faster than real time on a
+# laptop, fragmented so the first seconds play while the rest is encoding.
+PROXY_HEIGHT = 360
+PROXY_FRAGMENT_SECONDS = 2
 
-def video_to_gif(data: bytes, ext: str, fps: int = 10, width: int = 480) -> bytes:
-    """Convert a video to animated GIF."""
-    return run_ffmpeg(data, f".{ext}", ".gif",
-                      ["-vf", f"fps={fps},scale={width}:-1:flags=lanczos", "-loop", "0"],
-                      timeout=300)
+
+def proxy_preview_cmd(in_path: str, out_path: str) -> list[str]:
+    """ffmpeg command for a 360p H.264/AAC fragmented-MP4 preview of in_path."""
+    return [_ffmpeg_exe(), "-y", "-v", "error", "-i", in_path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:'min({PROXY_HEIGHT},ih)'",
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode",
+            "-crf", "30", "-maxrate", "800k", "-bufsize", "1600k", "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{PROXY_FRAGMENT_SECONDS})",
+            "-c:a", "aac", "-b:a", "96k", "-ac", "2",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            "-frag_duration", str(PROXY_FRAGMENT_SECONDS * 1_000_000),
+            "-f", "mp4", out_path]
+
+
+def start_proxy_preview(in_path: str, out_path: str, log_path: str, job: str) -> subprocess.Popen:
+    """Start encoding a preview proxy in the background; stderr goes to log_path.
+
+    The encoder is tracked under job; call finish_process() once it exits.
+    """
+    with open(log_path, "wb") as log:
+        try:
+            return _popen_tracked(proxy_preview_cmd(in_path, out_path), job=job,
+                                  stdout=subprocess.DEVNULL, stderr=log)
+        except FileNotFoundError:
+            raise FFmpegMissingError("ffmpeg is not installed")
+
+
+def finish_process(proc: subprocess.Popen) -> int:
+    """Wait for a child started by a start_* helper and stop tracking it."""
+    try:
+        return _reap(proc)
+    finally:
+        _untrack(proc)
 
 
-def reverse_audio(data: bytes, ext: str) -> bytes:
+GIF_DITHERS = ("sierra2_4a", "floyd_steinberg", "bayer", "none")
+
+# Fallback ladder for a GIF size budget, best first: (width scale, fps scale,
+# max colors). Width dominates size, so it shrinks before fps and colors.
+_GIF_LADDER = [(1.0, 1.0, 256), (1.0, 1.0, 128), (0.85, 1.0, 128), (0.85, 0.8, 96),
+               (0.7, 0.8, 96), (0.7, 0.6, 64), (0.55, 0.6, 64), (0.45, 0.5, 48),
+               (0.35, 0.5, 32), (0.25, 0.4, 32)]
+
+
+def _gif_palette_encode(exe: str, in_path: str, out_path: str, fps: float, width: int,
+                        colors: int, dither: str) -> int:
+    """One-pass palettegen/paletteuse encode. Returns the output size in bytes.
+
+    stats_mode=diff builds the palette from what changes between frames, and
+    diff_mode=rectangle re-dithers only the changed rectangle, which keeps the
+    static background identical from frame to frame so the GIF encoder can
+    skip it.
+    """
+    graph = (f"fps={fps:g},scale={width}:-1:flags=lanczos,split[a][b];"
+             f"[a]palettegen=max_colors={colors}:stats_mode=diff[p];"
+             f"[b][p]paletteuse=dither={dither}:diff_mode=rectangle")
+    _ffmpeg_call([exe, "-y", "-i", in_path, "-filter_complex", graph, "-loop", "0", out_path])
+    return Path(out_path).stat().st_size
+
+
+def _check_gif_palette_args(colors: int, dither: str):
+    if dither not in GIF_DITHERS:
+        raise ValueError(f"Dither must be one of: {', '.join(GIF_DITHERS)}")
+    if not 2 <= colors <= 256:
+        raise ValueError("Colors must be 2-256")
+
+
+def video_to_gif(data: MediaInput, ext: str, fps: int = 10, width: int = 480,
+                 mode: str = "fast", colors: int = 256, dither: str = "sierra2_4a") -> bytes:
+    """Convert a video to animated GIF.
+
+    mode "fast" is a single scale pass with ffmpeg's default palette;
+    "optimized" builds a palette for this clip (see _gif_palette_encode).
+    """
+    if mode == "fast":
+        return run_ffmpeg(data, f".{ext}", ".gif",
+                          ["-vf", f"fps={fps},scale={width}:-1:flags=lanczos", "-loop", "0"],
+                          timeout=300)
+    if mode != "optimized":
+        raise ValueError(f"Unknown GIF mode: {mode}")
+    _check_gif_palette_args(colors, dither)
+    exe = _ffmpeg_exe()
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_gif_"))
+    try:
+        in_path = _media_path(data, str(tmpdir / f"input.{ext}"))
+        out = str(tmpdir / "out.gif")
+        _gif_palette_encode(exe, in_path, out, fps, width, colors, dither)
+        return Path(out).read_bytes()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def video_to_gif_within(data: MediaInput, ext: str, max_bytes: int, fps: int = 10, width: int = 480,
+                        colors: int = 256, dither: str = "sierra2_4a") -> tuple[bytes, dict]:
+    """Optimized GIF no larger than max_bytes. Returns (gif, settings used).
+
+    Walks _GIF_LADDER from the requested settings down, encoding several
+    candidates in parallel per round; the first round with any fit decides,
+    and within it the highest-quality fit wins.
+    """
+    _check_gif_palette_args(colors, dither)
+    candidates = []
+    for w_scale, f_scale, max_colors in _GIF_LADDER:
+        cand = (max(2, round(fps * f_scale, 1)), max(64, int(width * w_scale) // 2 * 2),
+                min(colors, max_colors))
+        if cand not in candidates:
+            candidates.append(cand)
+    exe = _ffmpeg_exe()
+    workers = max(2, _segment_workers())
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_gif_"))
+    try:
+        in_path = _media_path(data, str(tmpdir / f"input.{ext}"))
+
+        def encode(i):
+            c_fps, c_width, c_colors = candidates[i]
+            out = str(tmpdir / f"cand_{i}.gif")
+            return _gif_palette_encode(exe, in_path, out, c_fps, c_width, c_colors, dither)
+
+        with ContextThreadPool(max_workers=workers) as pool:
+            for start in range(0, len(candidates), workers):
+                idx = list(range(start, min(start + workers, len(candidates))))
+                sizes = list(pool.map(encode, idx))
+                fits = [i for i, size in zip(idx, sizes) if size <= max_bytes]
+                if fits:
+                    c_fps, c_width, c_colors = candidates[fits[0]]
+                    return (tmpdir / f"cand_{fits[0]}.gif").read_bytes(), {
+                        "fps": c_fps, "width": c_width, "colors": c_colors}
+        raise ValueError(f"Could not fit the GIF under {max_bytes // 1024} KB; "
+                         "try a shorter clip")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def reverse_audio(data: MediaInput, ext: str) -> bytes:
     """Reverse audio using ffmpeg areverse filter. Returns audio bytes."""
-    return run_ffmpeg(data, f".{ext}", f".{ext}",
-                      ["-map", "0:a", "-af", "areverse"])
+    return _reverse_media(data, ext, video=False)
 
 
-def change_pitch(data: bytes, ext: str, semitones: float) -> bytes:
+def change_pitch(data: MediaInput, ext: str, semitones: float) -> bytes:
     """Change audio pitch without changing speed.
 
     semitones: -12 to 12 (negative = lower, positive = higher).
@@ -1159,7 +3055,7 @@ def change_pitch(data: bytes, ext: str, semitones: float) -> bytes:
                       ["-map", "0:a", "-af", af])
 
 
-def audio_equalizer(data: bytes, ext: str, bass: float = 0,
+def audio_equalizer(data: MediaInput, ext: str, bass: float = 0,
                     mid: float = 0, treble: float = 0) -> bytes:
     """Apply 3-band equalizer to audio.
 
@@ -1175,7 +3071,7 @@ def audio_equalizer(data: bytes, ext: str, bass: float = 0,
                       ["-map", "0:a", "-af", af])
 
 
-def audio_fade(data: bytes, ext: str, fade_in: float = 0,
+def audio_fade(data: MediaInput, ext: str, fade_in: float = 0,
                fade_out: float = 0, duration: float = 0) -> bytes:
     """Add fade-in and/or fade-out to audio.
 
@@ -1202,7 +3098,7 @@ def audio_fade(data: bytes, ext: str, fade_in: float = 0,
                       ["-map", "0:a", "-af", af])
 
 
-def crop_video(data: bytes, ext: str, width: int, height: int,
+def crop_video(data: MediaInput, ext: str, width: int, height: int,
                x: int = 0, y: int = 0) -> bytes:
     """Crop video to specified dimensions.
 
@@ -1219,7 +3115,7 @@ def crop_video(data: bytes, ext: str, width: int, height: int,
                       ["-vf", vf, "-c:a", "copy"], timeout=300)
 
 
-def rotate_video(data: bytes, ext: str, angle: int) -> bytes:
+def rotate_video(data: MediaInput, ext: str, angle: int) -> bytes:
     """Rotate video by 90, 180, or 270 degrees.
 
     Uses ffmpeg transpose filter:
@@ -1239,7 +3135,7 @@ def rotate_video(data: bytes, ext: str, angle: int) -> bytes:
                       ["-vf", vf, "-c:a", "copy"], timeout=300)
 
 
-def resize_video(data: bytes, ext: str, width: int, height: int = -1) -> bytes:
+def resize_video(data: MediaInput, ext: str, width: int, height: int = -1) -> bytes:
     """Resize video to specified dimensions.
 
     width/height: target dimensions. Use -1 for either to auto-calculate
@@ -1254,13 +3150,107 @@ def resize_video(data: bytes, ext: str, width: int, height: int = -1) -> bytes:
                       ["-vf", vf, "-c:a", "copy"], timeout=300)
 
 
-def reverse_video(data: bytes, ext: str) -> bytes:
+def reverse_video(data: MediaInput, ext: str) -> bytes:
     """Reverse video and audio using ffmpeg reverse and areverse filters."""
-    return run_ffmpeg(data, f".{ext}", f".{ext}",
-                      ["-vf", "reverse", "-af", "areverse"], timeout=300)
+    return _reverse_media(data, ext, video=True)
+
+
+# Decoded-frame budget for one reverse chunk. The reverse filters hold every
+# frame they are given, so this bounds memory rather than the input length.
+_REVERSE_CHUNK_BYTES = 256 * 1024 * 1024
+_REVERSE_AUDIO_CHUNK_SECONDS = 60.0
 
 
-def loop_video(data: bytes, ext: str, count: int = 2) -> bytes:
+def _reverse_chunk_seconds(info: dict, video: bool) -> float:
+    if video and info["has_video"] and info["width"] and info["height"]:
+        frame_bytes = info["width"] * info["height"] * 1.5  # yuv420p
+        per_second = frame_bytes * (info["fps"] or 30)
+        return max(1.0, min(30.0, _REVERSE_CHUNK_BYTES / per_second))
+    return _REVERSE_AUDIO_CHUNK_SECONDS
+
+
+def _reverse_media(data: MediaInput, ext: str, video: bool, timeout: int = 300) -> bytes:
+    """Reverse a file in fixed-length chunks so memory does not grow with length.
+
+    Chunk boundaries fall on whole frames (video) or samples (audio). Each
+    chunk is decoded from a seek a little before its start, trimmed to its
+    boundaries on the original timestamps, reversed on its own (several at
+    once where cores allow), and the chunks are joined last to first.
+    Neighbouring chunks share each boundary value, so no frame or sample is
+    lost or repeated. Inputs that fit in one chunk, and output formats
+    without a known codec, take the single-pass filter path.
+    """
+    exe = _ffmpeg_exe()
+    tmpdir = Path(tempfile.mkdtemp(prefix="sdexe_rev_"))
+    try:
+        in_path = _media_path(data, str(tmpdir / f"input.{ext}"))
+        out_path = str(tmpdir / f"output.{ext}")
+        if video:
+            filters = ["-vf", "reverse", "-af", "areverse"]
+            maps = []
+            codec_args = VIDEO_CODEC_MAP.get(ext)
+        else:
+            filters = ["-af", "areverse"]
+            maps = ["-map", "0:a"]
+            codec_args = AUDIO_CODEC_MAP.get(ext)
+
+        try:
+            info = probe_media_file(in_path, key=media_key(data))
+        except ValueError:
+            info = None
+        chunk = _reverse_chunk_seconds(info, video) if info else 0.0
+        duration = info["duration"] if info else 0.0
+        rate = (info["fps"] or 25.0) if video else (info and info["sample_rate"])
+        if not codec_args or not duration or not rate or duration <= chunk * 1.5:
+            _ffmpeg_call([exe, "-y", "-i", in_path] + maps + filters + [out_path], timeout)
+            return Path(out_path).read_bytes()
+
+        # Chunk length in whole frames or samples, and the cut before each
+        # chunk after the first: half a frame ahead of its first frame, or on
+        # its first sample counted in the 1/sample_rate timebase of decoded audio.
+        step = max(1, round(chunk * rate))
+        chunk = step / rate
+        count = math.ceil((duration - 0.05) / chunk)
+        origin = info.get("start_time") or 0.0
+        if video:
+            cuts = [f"{origin + (k * step - 0.5) / rate:.9f}" for k in range(1, count)]
+        else:
+            cuts = [str(round(origin * rate) + k * step) for k in range(1, count)]
+        if video:
+            maps = ["-map", "0:v:0", "-map", "0:a:0?"]
+
+        def trim(name: str, unit: str, i: int) -> str:
+            bounds = ([f"start{unit}={cuts[i - 1]}"] if i > 0 else []) + \
+                     ([f"end{unit}={cuts[i]}"] if i < len(cuts) else [])
+            return f"{name}={':'.join(bounds)}," if bounds else ""
+
+        def reverse_chunk(i: int) -> Path:
+            part = tmpdir / f"part_{i:05d}.mkv"
+            seek = max(0.0, i * chunk - 1.0)
+            if video:
+                chunk_filters = ["-vf", trim("trim", "", i) + "setpts=PTS-STARTPTS,reverse"]
+                if info["has_audio"]:
+                    chunk_filters += ["-af", trim("atrim", "", i) + "asetpts=PTS-STARTPTS,areverse"]
+            else:
+                chunk_filters = ["-af", trim("atrim", "_pts", i) + "asetpts=PTS-STARTPTS,areverse"]
+            _ffmpeg_call([exe, "-y", "-copyts", "-ss", f"{seek:.6f}", "-t", f"{chunk + 2.0:.6f}",
+                          "-i", in_path] + maps + chunk_filters + codec_args + [str(part)],
+                         timeout)
+            return part
+
+        with ContextThreadPool(max_workers=min(_segment_workers(), 4)) as pool:
+            parts = list(pool.map(reverse_chunk, range(count)))
+
+        list_path = tmpdir / "list.txt"
+        list_path.write_text("".join(f"file '{p.as_posix()}'\n" for p in reversed(parts)))
+        _ffmpeg_call([exe, "-y", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                      "-map", "0", "-c", "copy", out_path], timeout)
+        return Path(out_path).read_bytes()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def loop_video(data: MediaInput, ext: str, count: int = 2) -> bytes:
     """Loop video N times using ffmpeg stream_loop.
 
     count: number of total plays (e.g. 2 = play twice).
@@ -1268,31 +3258,36 @@ def loop_video(data: bytes, ext: str, count: int = 2) -> bytes:
     if count < 1:
         raise ValueError("Loop count must be at least 1")
     # stream_loop takes number of additional loops (0 = play once, 1 = play twice)
-    with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as inf:
-        inf.write(data)
-        inf_path = inf.name
+    local = isinstance(data, os.PathLike)
+    if local:
+        inf_path = os.fspath(data)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as inf:
+            inf.write(data)
+            inf_path = inf.name
     with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as outf:
         out_path = outf.name
     try:
         cmd = [_ffmpeg_exe(), "-y", "-stream_loop", str(count - 1),
                "-i", inf_path, "-c", "copy", out_path]
-        result = subprocess.run(cmd, capture_output=True, timeout=300)
+        result = _run_tracked(cmd, timeout=300)
         if result.returncode != 0:
             raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
         return Path(out_path).read_bytes()
     finally:
-        Path(inf_path).unlink(missing_ok=True)
+        if not local:
+            Path(inf_path).unlink(missing_ok=True)
         Path(out_path).unlink(missing_ok=True)
 
 
-def mute_video(data: bytes, ext: str) -> bytes:
+def mute_video(data: MediaInput, ext: str) -> bytes:
     """Strip audio track from video."""
     return run_ffmpeg(data, f".{ext}", f".{ext}",
                       ["-an", "-c:v", "copy"], timeout=300)
 
 
-def add_audio_to_video(video_data: bytes, video_ext: str,
-                       audio_data: bytes, audio_ext: str) -> bytes:
+def add_audio_to_video(video_data: MediaInput, video_ext: str,
+                       audio_data: MediaInput, audio_ext: str) -> bytes:
     """Replace audio in a video with a separate audio file.
 
     Uses two input files: the video (video track only) and the audio.
@@ -1304,8 +3299,8 @@ def add_audio_to_video(video_data: bytes, video_ext: str,
         audio_path = str(Path(tmpdir) / f"audio.{audio_ext}")
         out_path = str(Path(tmpdir) / f"output.{video_ext}")
 
-        Path(video_path).write_bytes(video_data)
-        Path(audio_path).write_bytes(audio_data)
+        video_path = _media_path(video_data, video_path)
+        audio_path = _media_path(audio_data, audio_path)
 
         cmd = [
             _ffmpeg_exe(), "-y",
@@ -1318,7 +3313,7 @@ def add_audio_to_video(video_data: bytes, video_ext: str,
             "-shortest",
             out_path,
         ]
-        result = subprocess.run(cmd, capture_output=True, timeout=300)
+        result = _run_tracked(cmd, timeout=300)
         if result.returncode != 0:
             raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
 
@@ -1328,7 +3323,7 @@ def add_audio_to_video(video_data: bytes, video_ext: str,
         shutil.rmtree(tmpdir, ignore_errors=True)
 
 
-def burn_subtitles(video_data: bytes, video_ext: str, srt_data: bytes) -> bytes:
+def burn_subtitles(video_data: MediaInput, video_ext: str, srt_data: bytes) -> bytes:
     """Burn SRT subtitles into a video using the ffmpeg subtitles filter.
 
     Renders subtitle text permanently onto video frames.
@@ -1339,7 +3334,7 @@ def burn_subtitles(video_data: bytes, video_ext: str, srt_data: bytes) -> bytes:
         srt_path = str(Path(tmpdir) / "subs.srt")
         out_path = str(Path(tmpdir) / f"output.{video_ext}")
 
-        Path(video_path).write_bytes(video_data)
+        video_path = _media_path(video_data, video_path)
         Path(srt_path).write_bytes(srt_data)
 
         exe = ffmpeg_exe_with_filter("subtitles")
@@ -1359,7 +3354,7 @@ def burn_subtitles(video_data: bytes, video_ext: str, srt_data: bytes) -> bytes:
             "-c:a", "copy",
             out_path,
         ]
-        result = subprocess.run(cmd, capture_output=True, timeout=300)
+        result = _run_tracked(cmd, timeout=300)
         if result.returncode != 0:
             stderr = result.stderr.decode("utf-8", errors="replace").strip()
             logger.error("burn_subtitles failed: %s", stderr[-2000:])
@@ -1594,7 +3589,7 @@ def extract_audio_for_transcription(input_path: str, output_path: str):
         "-ar", "16000", "-ac", "1",
         output_path
     ]
-    result = subprocess.run(cmd, capture_output=True, timeout=300)
+    result = _run_tracked(cmd, timeout=300)
     if result.returncode != 0:
         raise RuntimeError(f"Audio extraction failed: {result.stderr.decode('utf-8', errors='replace')[:500]}")
 
@@ -17,9 +17,13 @@ Pass criteria:
 """
 
 import io
+import re
+import gzip
 import sys
+import time
 import subprocess
 import tempfile
+import zipfile
 from pathlib import Path
 
 # Allow running from the repo root without installing.
@@ -152,6 +156,33 @@ def test_images():
     check(g, "watermark", client.post("/api/images/watermark", data={"file": fp(PNG, "i.png"), "text": "X"}, content_type="multipart/form-data"))
     check(g, "qr-generate", client.post("/api/images/qr-generate", json={"text": "hello"}))
     check(g, "placeholder", client.post("/api/images/placeholder", json={"width": 120, "height": 80}))
+    r = client.post("/api/assets", data={"file": fp(PNG, "i.png")}, content_type="multipart/form-data")
+    check(g, "asset upload", r)
+    if r.status_code == 200:
+        asset_id = r.get_json()["assets"][0]["id"]
+        r = client.get(f"/api/assets/{asset_id}/file", headers={"Range": "bytes=0-9"})
+        ok = r.status_code == 206 and len(r.data) == 10 and \
+            client.get(f"/api/assets/{asset_id}/file", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+        results.append((g, "asset file (range, etag)", "PASS" if ok else "FAIL", f"{r.status_code}"))
+        r = client.post("/api/images/rotate", data={"asset_id": asset_id, "angle": "90"}, content_type="multipart/form-data")
+        ok = r.status_code == 200 and client.get(f"/api/assets/{r.headers.get('X-Asset-Id')}").status_code == 200
+        results.append((g, "rotate (asset in, asset out)", "PASS" if ok else "FAIL", f"{r.status_code}"))
+    r = client.post("/api/uploads", headers={"Upload-Length": str(len(PNG))})
+    results.append((g, "upload (create)", "PASS" if r.status_code == 201 else "FAIL", f"{r.status_code}"))
+    if r.status_code == 201:
+        loc = r.headers["Location"]
+        hdrs = {"Content-Type": "application/offset+octet-stream", "Upload-Offset": "0"}
+        check(g, "upload (reject bad checksum)", client.patch(loc, data=PNG, headers={**hdrs, "Upload-Checksum": "sha256 AAAA"}), "reject")
+        r = client.patch(loc, data=PNG, headers=hdrs)
+        ok = r.status_code == 204 and client.get(f"/api/assets/{r.headers.get('X-Asset-Id')}").status_code == 200
+        results.append((g, "upload (complete -> asset)", "PASS" if ok else "FAIL", f"{r.status_code}"))
+        asset_id = r.headers.get("X-Asset-Id")
+        # A client retrying the last PATCH after losing its 204.
+        r = client.patch(loc, data=b"", headers={**hdrs, "Upload-Offset": str(len(PNG))})
+        ok = (r.status_code == 204 and r.headers.get("X-Asset-Id") == asset_id
+              and r.headers.get("Upload-Offset") == str(len(PNG)))
+        results.append((g, "upload (final chunk resent)", "PASS" if ok else "FAIL", f"{r.status_code}"))
+    check(g, "rotate (reject unknown asset)", client.post("/api/images/rotate", data={"asset_id": "0" * 32}, content_type="multipart/form-data"), "reject")
 
 
 # ── Convert ──
@@ -181,8 +212,8 @@ def test_convert():
 def test_av():
     g = "av"
     if not tools.ffmpeg_available():
-        for name in ["convert-audio", "trim-audio", "audio-speed", "extract-audio", "trim-video",
-                     "compress-video", "convert-video", "merge-audio", "normalize-volume", "video-to-gif",
+        for name in ["info", "waveform", "thumbnails", "preview", "convert-audio", "trim-audio", "audio-speed", "extract-audio", "trim-video",
+                     "compress-video", "convert-video", "merge-audio", "batch", "normalize-volume", "normalize-album", "video-to-gif",
                      "reverse-audio", "change-pitch", "audio-equalizer", "audio-fade", "crop-video",
                      "rotate-video", "resize-video", "reverse-video", "loop-video", "mute-video",
                      "add-audio", "burn-subtitles"]:
@@ -190,6 +221,7 @@ def test_av():
         return
     try:
         audio = _ffmpeg_make(["-f", "lavfi", "-i", "sine=frequency=440:duration=0.5", "-c:a", "libmp3lame"], ".mp3")
+        wav = _ffmpeg_make(["-f", "lavfi", "-i", "sine=frequency=220:duration=0.5:sample_rate=22050"], ".wav")
         video = _ffmpeg_make(["-f", "lavfi", "-i", "testsrc2=size=320x240:rate=15", "-f", "lavfi",
                               "-i", "sine=frequency=440:duration=0.5", "-t", "0.5", "-pix_fmt", "yuv420p",
                               "-c:v", "libx264", "-c:a", "aac"], ".mp4")
@@ -198,16 +230,154 @@ def test_av():
         return
 
     mp = "multipart/form-data"
+    check(g, "info", client.post("/api/av/info", data={"file": fp(video, "v.mp4")}, content_type=mp))
+    check(g, "info (reject non-media)", client.post("/api/av/info", data={"file": fp(b"not media", "x.mp4")}, content_type=mp), expect="reject")
+    check(g, "waveform", client.post("/api/av/waveform", data={"file": fp(audio, "a.mp3")}, content_type=mp))
+    check(g, "waveform (bin)", client.post("/api/av/waveform", data={"file": fp(video, "v.mp4"), "format": "bin", "level": "1"}, content_type=mp))
+    r = client.post("/api/av/thumbnails", data={"file": fp(video, "v.mp4"), "count": "4", "width": "80"}, content_type=mp)
+    check(g, "thumbnails", r)
+    if r.status_code == 200:
+        check(g, "thumbnails (sprite)", client.get(r.get_json()["sprite_url"]))
+    check(g, "thumbnails (reject audio)", client.post("/api/av/thumbnails", data={"file": fp(audio, "a.mp3")}, content_type=mp), expect="reject")
+    r = client.post("/api/av/preview", data={"file": fp(video, "v.mp4")}, content_type=mp)
+    check(g, "preview", r)
+    if r.status_code == 200:
+        check(g, "preview (stream)", client.get(r.get_json()["url"]))
     check(g, "convert-audio", client.post("/api/av/convert-audio", data={"file": fp(audio, "a.mp3"), "format": "wav"}, content_type=mp))
+    check(g, "convert-audio (background)", client.post("/api/av/convert-audio", data={"file": fp(audio, "a.mp3"), "format": "wav", "priority": "background"}, content_type=mp))
+    check(g, "convert-audio (streamed)", client.post("/api/av/convert-audio?format=ogg&filename=a.wav", data=wav, content_type="application/octet-stream"))
+    # Cancelling while the body streams must still reach the running ffmpeg.
+    import threading
+    release = threading.Event()
+    head = _ffmpeg_make(["-f", "lavfi", "-i", "sine=frequency=220:duration=10:sample_rate=22050"], ".wav")
+
+    class StalledUpload(io.RawIOBase):
+        """Ten seconds of wav (past ffmpeg's probe window), then a client that goes quiet."""
+        sent = 0
+        pos = 0  # the test client sizes the body by seeking; report a long upload
+
+        def readable(self):
+            return True
+
+        def tell(self):
+            return self.pos
+
+        def seek(self, offset, whence=0):
+            self.pos = len(head) * 100 if whence == 2 else offset
+            return self.pos
+
+        def readinto(self, b):
+            if self.sent < len(head):
+                n = min(len(b), len(head) - self.sent)
+                b[:n] = head[self.sent:self.sent + n]
+                self.sent += n
+                return n
+            release.wait(30)
+            return 0
+    r = client.post("/api/av/convert-audio?format=wav&filename=a.wav", input_stream=StalledUpload(),
+                    content_type="application/octet-stream",
+                    headers={"X-Job-Id": "smoke-stream"}, buffered=False)
+    body = iter(r.response)
+    next(body, None)
+    with tools._procs_lock:
+        running = list(tools._job_procs.get("smoke-stream", ()))
+    tools.cancel_job("smoke-stream")
+    try:
+        for _ in body:
+            pass
+    except tools.JobCancelled:
+        pass
+    r.close()
+    release.set()
+    ok = r.status_code == 200 and len(running) == 1 and running[0].returncode is not None \
+        and "smoke-stream" not in tools._job_procs
+    results.append((g, "convert-audio (cancel mid-stream)", "PASS" if ok else "FAIL",
+                    f"{len(running)} proc, rc {running[0].returncode if running else None}"))
+    check(g, "convert-audio (reject streamed mp4)", client.post("/api/av/convert-audio?format=ogg&filename=a.mp4", data=wav, content_type="application/octet-stream"), "reject")
+    check(g, "bad priority", client.post("/api/av/convert-audio", data={"file": fp(audio, "a.mp3"), "format": "wav", "priority": "urgent"}, content_type=mp), "reject")
+    check(g, "bad save_to", client.post("/api/av/convert-audio", data={"file": fp(audio, "a.mp3"), "format": "wav", "save_to": "desktop"}, content_type=mp), "reject")
+    check(g, "local path outside input folder", client.post("/api/av/convert-audio", data={"path": "/etc/hostname", "format": "wav"}), "reject")
     check(g, "trim-audio", client.post("/api/av/trim-audio", data={"file": fp(audio, "a.mp3"), "start": "0", "end": "0.3"}, content_type=mp))
+    check(g, "trim-audio (smart)", client.post("/api/av/trim-audio", data={"file": fp(audio, "a.mp3"), "start": "0.1", "end": "0.3", "mode": "smart"}, content_type=mp))
     check(g, "audio-speed", client.post("/api/av/audio-speed", data={"file": fp(audio, "a.mp3"), "speed": "1.5"}, content_type=mp))
     check(g, "extract-audio", client.post("/api/av/extract-audio", data={"file": fp(video, "v.mp4"), "format": "mp3"}, content_type=mp))
     check(g, "trim-video", client.post("/api/av/trim-video", data={"file": fp(video, "v.mp4"), "start": "0", "end": "0.3"}, content_type=mp))
+    check(g, "trim-video (smart)", client.post("/api/av/trim-video", data={"file": fp(video, "v.mp4"), "start": "0.1", "end": "0.4", "mode": "smart"}, content_type=mp))
     check(g, "compress-video", client.post("/api/av/compress-video", data={"file": fp(video, "v.mp4"), "quality": "medium"}, content_type=mp))
+    check(g, "compress-video (parallel)", client.post("/api/av/compress-video", data={"file": fp(video, "v.mp4"), "quality": "medium", "parallel": "on"}, content_type=mp))
     check(g, "convert-video", client.post("/api/av/convert-video", data={"file": fp(video, "v.mp4"), "format": "mov"}, content_type=mp))
+    check(g, "compress-video (bad budget)", client.post("/api/av/compress-video", data={"file": fp(video, "v.mp4"), "time_budget": "-5"}, content_type=mp), expect="reject")
     check(g, "merge-audio", client.post("/api/av/merge-audio", data={"files": [fp(audio, "a.mp3"), fp(audio, "b.mp3")], "format": "mp3"}, content_type=mp))
+    check(g, "merge-audio (mixed)", client.post("/api/av/merge-audio", data={"files": [fp(audio, "a.mp3"), fp(audio, "b.mp3"), fp(wav, "c.wav")], "format": "mp3"}, content_type=mp))
+    r = client.post("/api/av/batch", data={"op": "convert-audio", "format": "ogg", "files": [fp(audio, "a.mp3"), fp(wav, "a.wav"), fp(b"junk", "bad.mp3")]}, content_type=mp)
+    check(g, "batch (start)", r)
+    if r.status_code == 200:
+        z = client.get(f"/api/av/batch/{r.get_json()['id']}/zip")
+        names = sorted(zipfile.ZipFile(io.BytesIO(z.data)).namelist()) if z.status_code == 200 else []
+        ok = names == ["a.ogg", "a_2.ogg"]
+        results.append((g, "batch (zip)", "PASS" if ok else "FAIL", f"{z.status_code}, {names}"))
+    r = client.get("/api/stats")
+    ok = r.status_code == 200 and r.get_json()["kinds"].get("av:convert-audio", {}).get("child_processes", 0) > 0
+    results.append((g, "stats", "PASS" if ok else "FAIL", f"{r.status_code}"))
+    check(g, "cancel (unknown job)", client.post("/api/av/cancel/nope"))
+    convert_audio = tools.convert_audio
+
+    def cancelled_midway(*args):
+        tools.cancel_job("smoke-cancel", "Cancelled by user")
+        return convert_audio(*args)
+    tools.convert_audio = cancelled_midway
+    try:
+        r = client.post("/api/av/convert-audio", data={"file": fp(audio, "a.mp3"), "format": "wav"},
+                        content_type=mp, headers={"X-Job-Id": "smoke-cancel"})
+    finally:
+        tools.convert_audio = convert_audio
+    ok = r.status_code == 499 and r.get_json().get("cancelled") and tools.job_usage("smoke-cancel")["cancelled"]
+    results.append((g, "cancel (distinct outcome)", "PASS" if ok else "FAIL", f"{r.status_code}"))
+    # Every ffmpeg child, from any caller, waits for one of FFMPEG_MAX_JOBS slots.
+    import threading
+    peak, done = [0], threading.Event()
+
+    def watch():
+        while not done.is_set():
+            with tools._procs_lock:
+                peak[0] = max(peak[0], sum(len(p) for p in tools._job_procs.values()))
+            time.sleep(0.005)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    cmd = [tools._ffmpeg_exe(), "-v", "error", "-f", "lavfi", "-i", "anullsrc",
+           "-af", "arealtime", "-t", "0.3", "-f", "null", "-"]
+    with tools.ContextThreadPool(max_workers=tools.FFMPEG_MAX_JOBS + 2) as pool:
+        list(pool.map(lambda _: tools._run_tracked(cmd), range(tools.FFMPEG_MAX_JOBS + 2)))
+    done.set()
+    watcher.join()
+    ok = 0 < peak[0] <= tools.FFMPEG_MAX_JOBS
+    results.append((g, "ffmpeg slots (global cap)", "PASS" if ok else "FAIL", f"peak {peak[0]} of {tools.FFMPEG_MAX_JOBS}"))
+    r = client.post("/api/assets", data={"file": fp(audio, "a.mp3")}, content_type=mp)
+    if r.status_code == 200:
+        import flask
+        asset_id = r.get_json()["assets"][0]["id"]
+        seen = []
+        convert_audio = tools.convert_audio
+
+        def spy(data, *args):
+            # The asset's path, with nothing read from its stream.
+            seen.append((data, flask.request.files["file"].stream.tell()))
+            return convert_audio(data, *args)
+        tools.convert_audio = spy
+        try:
+            r = client.post("/api/av/convert-audio", data={"asset_id": asset_id, "format": "wav"}, content_type=mp)
+        finally:
+            tools.convert_audio = convert_audio
+        from sdexe.app import ASSET_DIR
+        ok = r.status_code == 200 and seen == [(ASSET_DIR / asset_id, 0)]
+        results.append((g, "convert-audio (asset read in place)", "PASS" if ok else "FAIL", f"{r.status_code} {seen}"))
+    check(g, "batch (bad op)", client.post("/api/av/batch", data={"op": "nope", "files": [fp(audio, "a.mp3")]}, content_type=mp), expect="reject")
     check(g, "normalize-volume", client.post("/api/av/normalize-volume", data={"file": fp(audio, "a.mp3")}, content_type=mp))
+    check(g, "normalize-volume (two-pass)", client.post("/api/av/normalize-volume", data={"file": fp(audio, "a.mp3"), "mode": "two-pass", "target": "-20"}, content_type=mp))
+    check(g, "normalize-album", client.post("/api/av/normalize-album", data={"files": [fp(audio, "a.mp3"), fp(wav, "b.wav")]}, content_type=mp))
     check(g, "video-to-gif", client.post("/api/av/video-to-gif", data={"file": fp(video, "v.mp4"), "fps": "5", "width": "120"}, content_type=mp))
+    check(g, "video-to-gif (optimized)", client.post("/api/av/video-to-gif", data={"file": fp(video, "v.mp4"), "fps": "5", "width": "160", "mode": "optimized", "dither": "bayer"}, content_type=mp))
+    check(g, "video-to-gif (max size)", client.post("/api/av/video-to-gif", data={"file": fp(video, "v.mp4"), "fps": "10", "width": "320", "mode": "optimized", "max_size_kb": "40"}, content_type=mp))
     check(g, "reverse-audio", client.post("/api/av/reverse-audio", data={"file": fp(audio, "a.mp3")}, content_type=mp))
     check(g, "change-pitch", client.post("/api/av/change-pitch", data={"file": fp(audio, "a.mp3"), "semitones": "2"}, content_type=mp))
     check(g, "audio-equalizer", client.post("/api/av/audio-equalizer", data={"file": fp(audio, "a.mp3"), "bass": "2", "mid": "0", "treble": "1"}, content_type=mp))
@@ -229,6 +399,7 @@ def test_media():
     check(g, "info (reject empty)", client.post("/api/info", json={}), expect="reject")
     check(g, "info (reject non-http)", client.post("/api/info", json={"url": "ftp://x"}), expect="reject")
     check(g, "download (reject empty)", client.post("/api/download", json={}), expect="reject")
+    check(g, "cancel (reject unknown)", client.post("/api/cancel/nope"), expect="reject")
     check(g, "deps probe", client.get("/api/deps"))
 
 
@@ -238,10 +409,74 @@ def test_pages():
     g = "pages"
     for path in ["/", "/media", "/pdf", "/images", "/convert", "/av", "/text", "/transcribe", "/about", "/settings"]:
         check(g, f"GET {path}", client.get(path))
-
+    plain = client.get("/static/app.js").data
+    r = client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+    ok = r.headers.get("Content-Encoding") == "gzip" and gzip.decompress(r.data) == plain
+    results.append((g, "gzip static", "PASS" if ok else "FAIL", f"{len(plain)}B -> {len(r.data)}B"))
+    url = re.search(r'src="(/static/shared\.[0-9a-f]{12}\.js)"', client.get("/").get_data(as_text=True))
+    r = client.get(url.group(1), headers={"Accept-Encoding": "gzip"}) if url else None
+    ok = (r is not None and "immutable" in r.headers.get("Cache-Control", "")
+          and gzip.decompress(r.data) == client.get("/static/shared.js").data)
+    results.append((g, "fingerprinted static", "PASS" if ok else "FAIL", url.group(1) if url else "no url"))
+    import sdexe.app as sdexe_app
+    stale = sdexe_app.CONFIG_DIR / "static-cache" / "000000000000.gz"
+    stale.parent.mkdir(parents=True, exist_ok=True)
+    stale.write_bytes(b"old release")
+    sdexe_app._static_assets_cache = None
+    sdexe_app._static_assets()
+    results.append((g, "static cache pruned", "FAIL" if stale.exists() else "PASS", stale.name))
+    # Cleanup runs on a schedule, not only when something is downloaded.
+    import os
+    old = sdexe_app.DOWNLOAD_DIR / "old_result.bin"
+    old.write_bytes(b"x")
+    os.utime(old, (time.time() - 7200, time.time() - 7200))
+    sdexe_app._last_cleanup = 0.0
+    client.get("/about")
+    deadline = time.time() + 5
+    while old.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    results.append((g, "scheduled cleanup", "FAIL" if old.exists() else "PASS", old.name))
+
+
+# ── multi-worker (shared job store on) ──
+
+def test_workers():
+    """Run last: from here on job state lives on disk, as under --workers N."""
+    g = "workers"
+    import sdexe.app as sdexe_app
+    sdexe_app.share_job_state(Path(tempfile.mkdtemp(prefix="sdexe_smoke_")))
+    if not tools.ffmpeg_available():
+        skip(g, "(all)", "ffmpeg not available")
+        return
+    mp = "multipart/form-data"
+    video = _ffmpeg_make(["-f", "lavfi", "-i", "testsrc2=size=320x240:rate=15", "-t", "0.5",
+                          "-pix_fmt", "yuv420p", "-c:v", "libx264"], ".mp4")
+    r = client.post("/api/av/thumbnails", data={"file": fp(video, "v.mp4"), "count": "4", "width": "80"}, content_type=mp)
+    check(g, "thumbnails", r)
+    if r.status_code == 200:
+        # Another worker has none of this process's in-memory caches.
+        tools._thumb_cache.clear()
+        check(g, "thumbnails (sprite, other worker)", client.get(r.get_json()["sprite_url"]))
+        check(g, "thumbnails (vtt, other worker)", client.get(r.get_json()["sprite_url"][:-4] + ".vtt"))
+    audio = _ffmpeg_make(["-f", "lavfi", "-i", "sine=frequency=440:duration=120", "-c:a", "libmp3lame"], ".mp3")
+    r = client.post("/api/av/batch", data={"op": "convert-audio", "format": "ogg",
+                                           "files": [fp(audio, "a.mp3"), fp(b"junk", "bad.mp3")]}, content_type=mp)
+    check(g, "batch (start)", r)
+    if r.status_code == 200:
+        b_id = r.get_json()["id"]
+        # What a worker that does not run the batch sees, while it runs.
+        seen = set()
+        for _ in range(1000):
+            shared = sdexe_app.av_batches._read(b_id) or {}
+            seen.update(item["status"] for item in shared.get("files", []))
+            if shared.get("status") != "running":
+                break
+            time.sleep(0.01)
+        ok = "running" in seen
+        results.append((g, "batch (item status, other worker)", "PASS" if ok else "FAIL", f"{sorted(seen)}"))
 
 def main():
-    for fn in (test_pages, test_pdf, test_images, test_convert, test_av, test_media):
+    for fn in (test_pages, test_pdf, test_images, test_convert, test_av, test_media, test_workers):
         try:
             fn()
         except Exception as e: